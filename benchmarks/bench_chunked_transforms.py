@@ -0,0 +1,90 @@
+"""
+    Benchmark of the silver transforms (1_unify_data.py and 2_data_enrichment.py) on synthetic catalogues of growing
+    size, loading the whole files in memory vs processing the titles in batches (--batch-size). Every run is a separate
+    process in a temporary data folder, so its peak memory (RSS) is measured on its own. Both modes must write the
+    same silver files, the benchmark fails otherwise.
+
+    Run from the root of the project:
+
+        python benchmarks/bench_chunked_transforms.py
+        python benchmarks/bench_chunked_transforms.py --titles 100000 1000000 --batch-size 50000
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SCRIPTS = [BASE_DIR / "scripts" / "2_transform" / "1_unify_data.py", BASE_DIR / "scripts" / "2_transform" / "2_data_enrichment.py"]
+SILVER_FILES = ["base_movies_and_shows", "enriched_result_movies_shows"]
+
+from fake_api import synthetic_catalogue
+from bench_pipeline import write_bronze
+
+
+def run_transforms(data_dir, batch_size=None):
+    """
+        Runs both transforms, returns the seconds and the peak memory (MB) of each one.
+    """
+    results = []
+    for script in SCRIPTS:
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            env = dict(os.environ, DATA_DIR=str(data_dir), METRICS_DIR=metrics_dir)
+            command = [sys.executable, str(script)] + (["--batch-size", str(batch_size)] if batch_size else [])
+
+            start = time.perf_counter()
+            subprocess.run(command, env=env, check=True)
+            elapsed = time.perf_counter() - start
+
+            report = json.loads(next(Path(metrics_dir).glob("*.json")).read_text(encoding="utf-8"))
+            results.append((elapsed, report["peak_memory_mb"]))
+    return results
+
+
+def silver_outputs(data_dir):
+    """
+        Silver files written by the transforms, sorted by title (the batches may write them in another order) and with
+        the lists as tuples, so the frames of both modes can be compared.
+    """
+    outputs = {}
+    for name in SILVER_FILES:
+        # Read with the declared types, not the pandas ones saved in the file (they depend on the mode)
+        data = pq.read_table(Path(data_dir) / "2_silver" / f"{name}.parquet").to_pandas(
+            types_mapper=lambda arrow_type: pd.Int64Dtype() if pa.types.is_integer(arrow_type) else None, ignore_metadata=True)
+        for column in ["genre", "watch_providers"]:
+            if column in data:
+                data[column] = data[column].map(tuple, na_action="ignore")
+        outputs[name] = data.sort_values(["type", "id"], kind="stable").reset_index(drop=True)
+    return outputs
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Benchmark of the silver transforms, in memory vs in batches")
+    parser.add_argument("--titles", type=int, nargs="+", default=[50_000, 200_000, 500_000], help="Movies (and shows) of the catalogue")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"{'titles':>9} {'mode':>9} {'unify (s)':>10} {'unify (MB)':>11} {'enrich (s)':>11} {'enrich (MB)':>12}")
+    for num_titles in args.titles:
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_bronze(synthetic_catalogue(num_titles), Path(data_dir))
+
+            outputs = {}
+            for mode, batch_size in [("memory", None), ("batches", args.batch_size)]:
+                (unify_time, unify_memory), (enrich_time, enrich_memory) = run_transforms(data_dir, batch_size)
+                outputs[mode] = silver_outputs(data_dir)
+                print(f"{num_titles * 2:>9} {mode:>9} {unify_time:>10.2f} {unify_memory:>11.0f} {enrich_time:>11.2f} {enrich_memory:>12.0f}")
+
+            # A faster mode is only valid if it gives the same result
+            for name in SILVER_FILES:
+                pd.testing.assert_frame_equal(outputs["memory"][name], outputs["batches"][name], obj=name)
@@ -0,0 +1,78 @@
+"""
+    Benchmark of the column transformations of 2_data_enrichment.py (and the year of OMDB_api.py), comparing the
+    previous row by row implementation with the vectorised one while the number of rows grows. Both versions are
+    checked to give the same output.
+    
+    Run from the root of the project:
+    
+        python benchmarks/bench_enrichment_transforms.py
+"""
+
+import datetime
+import importlib.util
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ROW_COUNTS = [10_000, 100_000, 500_000]
+
+
+def load_functions():
+    # Module name starts with a digit, it is loaded from its path
+    path = BASE_DIR / "scripts" / "2_transform" / "2_data_enrichment.py"
+    spec = importlib.util.spec_from_file_location("data_enrichment", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return vars(module)
+
+
+def synthetic_data(num_rows, random_generator):
+    dates = pd.to_datetime("1950-01-01") + pd.to_timedelta(random_generator.integers(0, 27000, num_rows), unit="D")
+    release_date = pd.Series(dates.strftime("%Y-%m-%d"))
+    release_date[random_generator.random(num_rows) < 0.01] = "1111-11-11"
+    return pd.DataFrame({
+        "release_date": release_date,
+        "tmdb_count": random_generator.integers(0, 40000, num_rows),
+        "imdb_count": random_generator.integers(-1, 3000000, num_rows)
+    })
+
+
+def row_by_row(data):
+    result = pd.DataFrame(index=data.index)
+    result["release_date"] = data["release_date"].apply(lambda x: datetime.datetime.strptime(x, '%Y-%m-%d').strftime('%d/%m/%Y'))
+    result["is_popular"] = data.apply(lambda row: (row['tmdb_count'] > 10000) or (row['imdb_count'] > 10000), axis=1)
+    result["year"] = data["release_date"].apply(lambda x: datetime.datetime.strptime(x, "%Y-%m-%d").date().year)
+    return result
+
+
+def vectorised(data, functions):
+    result = pd.DataFrame(index=data.index)
+    result["release_date"] = functions["to_spanish_date"](data["release_date"])
+    result["is_popular"] = functions["is_popular"](data["tmdb_count"], data["imdb_count"])
+    result["year"] = data["release_date"].str.slice(0, 4).astype(int)
+    return result
+
+
+if __name__ == '__main__':
+
+    functions = load_functions()
+    random_generator = np.random.default_rng(42)
+
+    print(f"{'rows':>8} {'row by row (s)':>15} {'vectorised (s)':>15} {'speedup':>8}")
+    for num_rows in ROW_COUNTS:
+        data = synthetic_data(num_rows, random_generator)
+
+        start = time.perf_counter()
+        expected = row_by_row(data)
+        row_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = vectorised(data, functions)
+        vectorised_time = time.perf_counter() - start
+
+        for column in expected.columns:
+            assert expected[column].astype(str).tolist() == result[column].astype(str).tolist(), column
+        print(f"{num_rows:>8} {row_time:>15.3f} {vectorised_time:>15.3f} {row_time / vectorised_time:>7.1f}x")
@@ -0,0 +1,89 @@
+"""
+    Benchmark of the paginated extraction of TMDB top rated movies, varying the number of pages.
+    
+    Compares the previous accumulations (pd.concat of every page over the accumulated result, then a list with the dict
+    of every record) with the PageCollector (columns with only the fields used). Every page is decoded from JSON when
+    it is added, as it happens when it arrives from the API, so the memory of the records that are kept is measured.
+    The pages are served by a local fake of the TMDB API with a synthetic catalogue. Run from the root of the project:
+    
+        python benchmarks/bench_page_collector.py
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR / "scripts" / "1_extract"))
+
+from fake_api import start_server, synthetic_catalogue, PAGE_SIZE
+
+PAGE_COUNTS = [50, 100, 200, 500]
+
+
+def concat_accumulation(pages):
+    total_result = pd.DataFrame(json.loads(pages[0]))
+    for page in pages[1:]:
+        total_result = pd.concat([total_result, pd.DataFrame(json.loads(page))], ignore_index=True)
+    return total_result
+
+
+def records_accumulation(pages):
+    records = []
+    for page in pages:
+        records.extend(json.loads(page))
+    return pd.DataFrame.from_records(records)
+
+
+def collector_accumulation(pages):
+    from page_collector import PageCollector, MOVIES_FIELDS
+
+    collector = PageCollector(MOVIES_FIELDS)
+    for page in pages:
+        collector.add(json.loads(page))
+    return collector.to_frame()
+
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 ** 2
+
+
+if __name__ == '__main__':
+
+    print("In-memory accumulation (no HTTP)")
+    print(f"{'pages':>6} {'concat (s)':>11} {'concat (MB)':>12} {'records (s)':>12} {'records (MB)':>13} {'columns (s)':>12} {'columns (MB)':>13}")
+    for num_pages in PAGE_COUNTS:
+        catalogue = synthetic_catalogue(num_pages * PAGE_SIZE)
+        pages = [json.dumps(catalogue.page("movie", page, "en-US"), default=str) for page in range(1, num_pages + 1)]
+        concat_result, concat_time, concat_peak = measure(concat_accumulation, pages)
+        records_result, records_time, records_peak = measure(records_accumulation, pages)
+        collector_result, collector_time, collector_peak = measure(collector_accumulation, pages)
+        assert len(concat_result) == len(records_result) == len(collector_result)
+        print(f"{num_pages:>6} {concat_time:>11.3f} {concat_peak:>12.1f} {records_time:>12.3f} {records_peak:>13.1f} "
+              f"{collector_time:>12.3f} {collector_peak:>13.1f}")
+
+    print("\nExtraction against the fake TMDB API")
+    print(f"{'pages':>6} {'records':>8} {'time (s)':>9}")
+    for num_pages in PAGE_COUNTS:
+        server, url = start_server(synthetic_catalogue(num_pages * PAGE_SIZE))
+        os.environ["TMDB_URL"] = url
+        os.environ["TMDB_RATE_LIMIT"] = "10000" # The fake API has no quota
+        sys.modules.pop("TMDB_api", None)
+        import TMDB_api
+
+        start = time.perf_counter()
+        movies, errors = TMDB_api.get_top_rated_movies({}, max_workers=8)
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        print(f"{num_pages:>6} {len(movies):>8} {elapsed:>9.3f}")
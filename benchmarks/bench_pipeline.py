@@ -0,0 +1,208 @@
+"""
+    End to end benchmark of the pipeline (scripts/pipeline.py) against the local fake APIs, without API keys or network.
+    Every run happens in a temporary copy of the data folder, so the real data, caches and logs are never touched.
+
+    - api: extraction from the fake TMDB/OMDB APIs, then transform and load
+    - offline: the catalogue is written directly as bronze files, only transform and load are measured (useful for big
+      catalogues, 1M titles would need millions of requests)
+
+    With --source bronze the titles of the bronze folder are replayed instead of a synthetic catalogue. The movies or
+    shows whose bronze files are missing are skipped (the run says which ones, and only the replayed kinds are saved
+    in its parameters).
+
+    The results (time per stage, extraction throughput, export time per format, peak memory) are appended to
+    benchmarks/results/history.jsonl, and every run is compared with the previous one with the same parameters.
+
+    Run from the root of the project:
+
+        python benchmarks/bench_pipeline.py --mode api --titles 2000 --latency 0.02 --error-rate 0.01 --throttle-rate 0.01
+        python benchmarks/bench_pipeline.py --mode offline --titles 10000 100000 1000000 --formats parquet csv
+        python benchmarks/bench_pipeline.py --mode api --source bronze
+"""
+
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_PATH = BASE_DIR / "benchmarks" / "results" / "history.jsonl"
+sys.path.append(str(BASE_DIR / "scripts"))
+
+from fake_api import start_server, synthetic_catalogue, bronze_catalogue
+from common.storage import SCHEMAS, to_table
+
+FORMATS = ["csv", "parquet", "json", "xlsx", "sqlite"]
+EXTRACT_STAGES = ["top_rated_movies", "top_rated_shows", "locales_movies", "locales_shows", "tmdb_movies", "tmdb_shows",
+                  "movies_genres", "shows_genres", "watch_providers_movies", "watch_providers_shows", "imdb_ratings",
+                  "imdb_movies", "imdb_shows"]
+
+
+def write_bronze(catalogue, data_dir):
+    """
+        Saves the catalogue as the bronze files the extraction would have written.
+    """
+    bronze_dir = data_dir / "1_bronze"
+    bronze_dir.mkdir(parents=True)
+
+    datasets = {}
+    for kind, name, date_column in [("movie", "movies", "release_date"), ("tv", "shows", "first_air_date")]:
+        titles = catalogue.titles[kind].rename(columns={"date": date_column})
+        titles["type"] = "movie" if kind == "movie" else "show"
+
+        datasets[f"TMDB_top_rated_{name}"] = titles
+        datasets[f"TMDB_watch_providers_{name}"] = titles[["id", "watch_providers"]]
+        datasets[f"OMDB_imdb_rating_{name}"] = titles[["id", "imdb_rating", "imdb_votes"]].rename(columns={"id": "tmdb_id"})
+        datasets[f"TMDB_{name}_genres"] = catalogue.genres[kind]
+
+    for name, data in datasets.items():
+        pq.write_table(to_table(data, SCHEMAS[("bronze", name)]), bronze_dir / f"{name}.parquet")
+
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or None
+
+
+def run_pipeline(params, catalogue):
+    """
+        Runs the pipeline in a subprocess (own peak memory) with a temporary data folder. Returns the metrics report.
+    """
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+        metrics_path = work_dir / "metrics.json"
+
+        env = dict(os.environ, DATA_DIR=str(work_dir / "data"), LOGS_DIR=str(work_dir / "logs"), API_CACHE="0", TMDB_TOKEN="fake",
+                   OMDB_API_KEY="fake", TMDB_RATE_LIMIT="100000", OMDB_DAILY_LIMIT="100000000", API_BACKOFF_FACTOR="0.01")
+        command = [sys.executable, str(BASE_DIR / "scripts" / "pipeline.py"), "--no-cache", "--metrics", str(metrics_path),
+                   "--formats", *params["formats"]]
+
+        server = None
+        if params["mode"] == "offline":
+            write_bronze(catalogue, work_dir / "data")
+            command.append("--from-bronze")
+        else:
+            server, url = start_server(catalogue, params["latency"], params["error_rate"], params["throttle_rate"])
+            env.update(TMDB_URL=url, OMDB_URL=url)
+
+        try:
+            start = time.perf_counter()
+            subprocess.run(command, cwd=work_dir, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            elapsed = time.perf_counter() - start
+        finally:
+            if server is not None:
+                server.shutdown()
+
+        report = json.loads(metrics_path.read_text(encoding="utf-8"))
+        report["wall_time"] = elapsed
+        return report
+
+
+def summarise(report):
+    timers = report["timers"]
+    counters = report["counters"]
+    total = lambda name: timers.get(name, {}).get("total", 0.0)
+
+    requests = sum(value for name, value in counters.items() if name.startswith("http.requests "))
+    extract_time = sum(total(f"stage {stage}") for stage in EXTRACT_STAGES)
+    titles = sum((report["rows"].get(stage) or {}).get("out") or 0 for stage in ["tmdb_movies", "tmdb_shows"])
+
+    return {
+        "wall_time": report["wall_time"],
+        "peak_memory_mb": report["peak_memory_mb"],
+        "stages": {name[len("stage "):]: summary["total"] for name, summary in timers.items() if name.startswith("stage ")},
+        "exports": {name[len("write_"):]: summary["total"] for name, summary in timers.items() if name.startswith("write_")},
+        "requests": requests,
+        "retries": sum(value for name, value in counters.items() if name.startswith("http.retries ")),
+        "requests_per_second": requests / extract_time if requests and extract_time else None,
+        "titles": titles
+    }
+
+
+def load_history():
+    if not RESULTS_PATH.exists():
+        return []
+    with open(RESULTS_PATH, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def save_result(result):
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with open(RESULTS_PATH, "a", encoding="utf-8") as file:
+        file.write(json.dumps(result) + "\n")
+
+
+def print_comparison(result, previous):
+    print(f"\n{result['params']}")
+    print(f"{'measure':<32} {'this run':>10} {'previous':>10} {'change':>8}")
+
+    rows = [("wall time (s)", result["summary"]["wall_time"], previous and previous["summary"]["wall_time"]),
+            ("peak memory (MB)", result["summary"]["peak_memory_mb"], previous and previous["summary"]["peak_memory_mb"]),
+            ("requests per second", result["summary"]["requests_per_second"], previous and previous["summary"]["requests_per_second"]),
+            ("retries", result["summary"]["retries"], previous and previous["summary"]["retries"])]
+    for group in ["stages", "exports"]:
+        for name, seconds in result["summary"][group].items():
+            rows.append((f"{group[:-1]} {name} (s)", seconds, previous and previous["summary"][group].get(name)))
+
+    for name, value, previous_value in rows:
+        if value is None:
+            continue
+        change = f"{(value - previous_value) / previous_value:+.0%}" if previous_value else ""
+        previous_text = f"{previous_value:>10.3f}" if previous_value is not None else f"{'-':>10}"
+        print(f"{name:<32} {value:>10.3f} {previous_text} {change:>8}")
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Benchmark of the pipeline against local fake APIs")
+    parser.add_argument("--mode", choices=["api", "offline"], default="api")
+    parser.add_argument("--source", choices=["synthetic", "bronze"], default="synthetic",
+                        help="Synthetic catalogue or the titles of the bronze files")
+    parser.add_argument("--titles", type=int, nargs="+", default=[2000], help="Movies (and shows) of the synthetic catalogue")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean seconds of every API response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS, help="Gold formats to export")
+    parser.add_argument("--label", default="", help="Free text saved with the results (e.g. the change being measured)")
+    args = parser.parse_args()
+
+    history = load_history()
+    sizes = [None] if args.source == "bronze" else args.titles
+
+    for num_titles in sizes:
+        if args.source == "bronze":
+            catalogue, replayed = bronze_catalogue()
+        else:
+            catalogue, replayed = synthetic_catalogue(num_titles), None
+        params = {
+            "mode": args.mode,
+            "source": args.source,
+            "titles": num_titles,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "throttle_rate": args.throttle_rate,
+            "formats": sorted(args.formats)
+        }
+        if replayed is not None:
+            params["kinds"] = replayed # Only the kinds with bronze files, runs with other kinds are not compared
+
+        report = run_pipeline(params, catalogue)
+        result = {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "label": args.label,
+            "params": params,
+            "summary": summarise(report)
+        }
+
+        previous = next((run for run in reversed(history) if run["params"] == params), None)
+        print_comparison(result, previous)
+        save_result(result)
+        history.append(result)
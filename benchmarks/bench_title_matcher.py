@@ -0,0 +1,119 @@
+"""
+    Benchmark of the title matching used to validate OMDB results, against the previous difflib.SequenceMatcher.
+    
+    1. Pairs: the (TMDB title, OMDB title) pairs recorded in logs/api_extraction.log are scored with both methods to
+       compare the speed per call and how often they agree on accepting/rejecting the match (threshold 0.6).
+    2. Bulk: TMDB shows with their year are used as candidates and slightly modified titles as queries. The best
+       candidate of each query is searched with difflib over the candidates of the same year and with TitleMatcher.
+    
+    Run from the root of the project:
+    
+        python benchmarks/bench_title_matcher.py
+"""
+
+import difflib
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR / "scripts" / "1_extract"))
+
+from title_matcher import TitleMatcher, title_similarity
+
+THRESHOLD = 0.6
+LOG_PATTERN = re.compile(r"(?:Match acepted|Low similarity): '(.*)' vs '(.*)' \(\d\.\d\d\)$")
+
+
+def difflib_similarity(title, other_title):
+    return difflib.SequenceMatcher(None, title.lower(), other_title.lower()).ratio()
+
+
+def load_pairs():
+    pairs = []
+    with open(BASE_DIR / "logs" / "api_extraction.log", encoding="utf-8", errors="replace") as file:
+        for line in file:
+            match = LOG_PATTERN.search(line.strip())
+            if match:
+                pairs.append(match.groups())
+    return pairs
+
+
+def distort(title, random_generator):
+    # Typical differences between catalogues: case, punctuation, articles and a typo
+    title = title.upper() if random_generator.random() < 0.3 else title
+    title = title.replace(":", "") if random_generator.random() < 0.5 else title
+    title = f"The {title}" if random_generator.random() < 0.2 else title
+    if len(title) > 4 and random_generator.random() < 0.5:
+        position = random_generator.randrange(len(title))
+        title = title[:position] + title[position + 1:]
+    return title
+
+
+def difflib_best_match(queries, candidates):
+    by_year = {year: group for year, group in candidates.groupby("year")}
+    results = []
+    for title, year in zip(queries["title"], queries["year"]):
+        group = by_year.get(year)
+        best_id, best_score = None, 0.0
+        if group is not None:
+            for candidate_id, candidate_title in zip(group["id"], group["title"]):
+                score = difflib_similarity(title, candidate_title)
+                if score > best_score:
+                    best_id, best_score = candidate_id, score
+        results.append(best_id if best_score >= THRESHOLD else None)
+    return results
+
+
+if __name__ == '__main__':
+
+    pairs = load_pairs()
+    print(f"Pairs from the log: {len(pairs)}")
+
+    start = time.perf_counter()
+    difflib_accepted = [difflib_similarity(title, other) >= THRESHOLD for title, other in pairs]
+    difflib_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    accepted = [title_similarity(title, other) >= THRESHOLD for title, other in pairs]
+    matcher_time = time.perf_counter() - start
+
+    agreement = sum(a == b for a, b in zip(difflib_accepted, accepted)) / max(len(pairs), 1)
+    print(f"\tdifflib: {difflib_time * 1e6 / max(len(pairs), 1):.1f} us/pair")
+    print(f"\ttitle_similarity: {matcher_time * 1e6 / max(len(pairs), 1):.1f} us/pair")
+    print(f"\tAgreement on accept/reject: {agreement:.1%}")
+    for (title, other), a, b in zip(pairs, difflib_accepted, accepted):
+        if a != b:
+            print(f"\t\tdifflib={'accept' if a else 'reject'}: '{title}' vs '{other}'")
+
+    shows = pd.read_csv(BASE_DIR / "data" / "1_bronze" / "TMDB_top_rated_shows.csv", sep=';', index_col=0)
+    candidates = shows[["id", "title_EN", "first_air_date"]].dropna().rename(columns={"title_EN": "title"})
+    candidates["year"] = candidates.pop("first_air_date").str[:4].astype(int)
+
+    random_generator = random.Random(42)
+    queries = candidates.sample(frac=1.0, random_state=42)
+    queries = queries.assign(title=[distort(title, random_generator) for title in queries["title"]])
+
+    print(f"\nBulk matching of {len(queries)} titles against {len(candidates)} candidates (blocking by year)")
+
+    start = time.perf_counter()
+    difflib_ids = difflib_best_match(queries, candidates)
+    difflib_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matches = TitleMatcher(candidates).match(queries, threshold=THRESHOLD)
+    matcher_time = time.perf_counter() - start
+
+    matcher_ids = matches["candidate_id"].where(matches["accepted"]).tolist()
+    agreement = sum((a == b) or (a is None and pd.isna(b)) for a, b in zip(difflib_ids, matcher_ids)) / len(queries)
+    correct = (matches["candidate_id"].where(matches["accepted"]) == queries["id"]).mean()
+    difflib_correct = sum(a == b for a, b in zip(difflib_ids, queries["id"])) / len(queries)
+
+    print(f"\tdifflib: {difflib_time:.3f} s ({difflib_correct:.1%} correct)")
+    print(f"\tTitleMatcher: {matcher_time:.3f} s ({correct:.1%} correct)")
+    print(f"\tAgreement on the chosen candidate: {agreement:.1%}")
+    print(f"\tReasons: {matches['reason'].value_counts().to_dict()}")
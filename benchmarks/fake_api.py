@@ -0,0 +1,371 @@
+"""
+    Local fake of the TMDB and OMDB APIs used by the benchmarks, so the extraction can be measured without API keys or
+    network. Both APIs are served from a `Catalogue` of titles, which is either synthetic (any number of titles, always
+    the same for the same seed) or the recorded bronze files of the project.
+
+    TMDB: top rated movies/shows (20 records per page, title in the requested language), genres, details (with
+    `append_to_response`) and watch providers of every title. OMDB: search by title, year and type.
+
+    The server can simulate the behaviour of the real APIs under load: latency of every response, transient server
+    errors (500) and rate limiting (429 with `Retry-After`).
+"""
+
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR / "scripts"))
+
+PAGE_SIZE = 20
+KINDS = ["movie", "tv"]
+
+MOVIES_GENRES = [(28, "Acción"), (12, "Aventura"), (16, "Animación"), (35, "Comedia"), (80, "Crimen"), (99, "Documental"),
+                 (18, "Drama"), (10751, "Familia"), (14, "Fantasía"), (36, "Historia"), (27, "Terror"), (10402, "Música"),
+                 (9648, "Misterio"), (10749, "Romance"), (878, "Ciencia ficción"), (53, "Suspense"), (37, "Western")]
+SHOWS_GENRES = [(10759, "Action & Adventure"), (16, "Animación"), (35, "Comedia"), (80, "Crimen"), (99, "Documental"),
+                (18, "Drama"), (10751, "Familia"), (10762, "Kids"), (9648, "Misterio"), (10765, "Sci-Fi & Fantasy"),
+                (10768, "War & Politics"), (37, "Western")]
+PROVIDERS = ["Netflix", "Disney Plus", "Amazon Prime Video", "Max", "Movistar Plus+", "Crunchyroll", "SkyShowtime",
+             "Apple TV+", "Filmin", "Atres Player"]
+WORDS = ["Night", "City", "Dream", "Shadow", "River", "Empire", "Secret", "Last", "Lost", "Golden", "Silent", "Dark",
+         "Wild", "Broken", "Hidden", "Crimson", "Winter", "Summer", "Ocean", "Fire", "Stone", "Glass", "Iron", "Paper",
+         "Heart", "Road", "House", "Garden", "Storm", "Star", "Moon", "Sun", "Ghost", "King", "Queen", "Soldier",
+         "Doctor", "Detective", "Stranger", "Family", "Journey", "Return", "Escape", "Promise", "Memory", "Island",
+         "Mountain", "Forest", "Desert", "Kingdom"]
+
+
+def json_default(value):
+    # numpy values (e.g. list columns read from Parquet) to plain Python
+    return value.tolist() if hasattr(value, "tolist") else str(value)
+
+
+def is_list(value):
+    # Lists are numpy arrays when read from Parquet and NaN when missing after a merge
+    return isinstance(value, (list, np.ndarray))
+
+
+class Catalogue:
+    """
+        Titles served by the fake APIs. For every kind ('movie', 'tv') a DataFrame in top rated order with the columns
+        of the TMDB bronze files plus 'watch_providers', 'omdb_title', 'imdb_rating' and 'imdb_votes' (NaN if the
+        title is not found in OMDB).
+    """
+
+    def __init__(self, titles, genres):
+        self.titles = titles
+        self.genres = genres
+        self.positions = {kind: pd.Index(frame["id"]) for kind, frame in titles.items()}
+        self.omdb = {}
+        for kind, frame in titles.items():
+            found = frame[frame["imdb_rating"].notna()]
+            years = found["date"].str.slice(0, 4)
+            self.omdb.update({(kind, title.lower(), year): position for title, year, position
+                              in zip(found["title_EN"], years, found.index)})
+
+    def num_titles(self, kind):
+        return len(self.titles[kind])
+
+    def page(self, kind, page, language):
+        records = self.titles[kind].iloc[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+        return [self.tmdb_record(kind, record, language) for record in records.to_dict("records")]
+
+    def record(self, kind, record_id, language="es-ES"):
+        position = self.positions[kind].get_indexer([record_id])[0]
+        if position == -1:
+            return None
+        return self.tmdb_record(kind, self.titles[kind].iloc[position].to_dict(), language)
+
+    def tmdb_record(self, kind, record, language):
+        title = record["title_ES"] if language.startswith("es") else record["title_EN"]
+        result = {
+            "adult": False,
+            "backdrop_path": record.get("backdrop_path"),
+            "genre_ids": list(record["genre_ids"]) if is_list(record["genre_ids"]) else [],
+            "id": int(record["id"]),
+            "original_language": record.get("original_language"),
+            "overview": record["overview"],
+            "popularity": record["popularity"],
+            "poster_path": record.get("poster_path"),
+            "vote_average": record["vote_average"],
+            "vote_count": int(record["vote_count"])
+        }
+        if kind == "movie":
+            result.update({"original_title": record["title_EN"], "title": title, "release_date": record["date"], "video": False})
+        else:
+            result.update({"original_name": record["title_EN"], "name": title, "first_air_date": record["date"],
+                           "origin_country": ["US"]})
+        return result
+
+    def watch_providers(self, kind, record_id):
+        position = self.positions[kind].get_indexer([record_id])[0]
+        if position == -1:
+            return None
+        providers = self.titles[kind]["watch_providers"].iloc[position]
+        results = {"US": {"link": "", "flatrate": [{"provider_name": "Netflix"}]}}
+        if is_list(providers) and len(providers):
+            results["ES"] = {"link": "", "flatrate": [{"provider_name": name} for name in providers]}
+        return {"id": record_id, "results": results}
+
+    def translations(self, kind, record_id):
+        position = self.positions[kind].get_indexer([record_id])[0]
+        if position == -1:
+            return None
+        record = self.titles[kind].iloc[position]
+        title_key = "title" if kind == "movie" else "name"
+        translations = [("es", "ES", record["title_ES"]), ("en", "US", record["title_EN"]), ("es", "MX", record["title_ES"])]
+        return {"id": record_id, "translations": [
+            {"iso_3166_1": region, "iso_639_1": language, "data": {title_key: title, "overview": record["overview"]}}
+            for language, region, title in translations
+        ]}
+
+    def search_omdb(self, data_type, title, year):
+        kind = "movie" if data_type == "movie" else "tv"
+        position = self.omdb.get((kind, str(title).lower(), str(year)))
+        if position is None:
+            return {"Response": "False", "Error": "Movie not found!" if kind == "movie" else "Series not found!"}
+
+        record = self.titles[kind].loc[position]
+        return {
+            "Title": record["omdb_title"],
+            "Year": str(year),
+            "Type": data_type,
+            "imdbRating": f"{record['imdb_rating']:.1f}",
+            "imdbVotes": f"{int(record['imdb_votes']):,}",
+            "imdbID": f"tt{int(record['id']):07d}",
+            "Response": "True"
+        }
+
+
+def synthetic_titles(kind, num_titles, seed=0):
+    random_generator = np.random.default_rng(seed + KINDS.index(kind))
+    genres = MOVIES_GENRES if kind == "movie" else SHOWS_GENRES
+
+    words = np.array(WORDS)
+    title_EN = pd.Series(words[random_generator.integers(0, len(WORDS), num_titles)])
+    for _ in range(2):
+        title_EN = title_EN + " " + words[random_generator.integers(0, len(WORDS), num_titles)]
+
+    years = random_generator.integers(1950, 2025, num_titles)
+    months = random_generator.integers(1, 13, num_titles)
+    days = random_generator.integers(1, 29, num_titles)
+    dates = pd.Series([f"{year}-{month:02d}-{day:02d}" for year, month, day in zip(years, months, days)])
+
+    # Top rated order: best rating first
+    vote_average = np.round(np.sort(random_generator.uniform(5, 9.5, num_titles))[::-1], 3)
+    vote_count = random_generator.integers(200, 40000, num_titles)
+
+    genre_ids = np.array([genre_id for genre_id, _ in genres])
+    num_genres = random_generator.integers(1, 4, num_titles)
+    genre_choices = random_generator.integers(0, len(genre_ids), (num_titles, 3))
+    num_providers = random_generator.integers(0, 4, num_titles)
+    provider_choices = random_generator.integers(0, len(PROVIDERS), (num_titles, 3))
+
+    # ~10% of the titles are not in OMDB, ~5% have a different title there (rejected by the title similarity)
+    imdb_rating = np.round(np.clip(vote_average + random_generator.normal(0, 0.4, num_titles), 1, 10), 1)
+    imdb_rating[random_generator.random(num_titles) < 0.10] = np.nan
+    omdb_title = title_EN.copy()
+    renamed = random_generator.random(num_titles) < 0.05
+    omdb_title[renamed] = title_EN.sample(frac=1, random_state=seed).values[renamed]
+
+    ids = np.arange(1, num_titles + 1) * 7 + KINDS.index(kind)
+    return pd.DataFrame({
+        "id": ids,
+        "title_EN": title_EN,
+        "title_ES": "El " + title_EN,
+        "original_language": "en",
+        "overview": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " + title_EN,
+        "date": dates,
+        "genre_ids": [list(dict.fromkeys(choice[:count])) for choice, count in zip(genre_ids[genre_choices].tolist(), num_genres)],
+        "popularity": np.round(random_generator.gamma(2, 20, num_titles), 3),
+        "vote_average": vote_average,
+        "vote_count": vote_count,
+        "backdrop_path": [f"/backdrop_{record_id}.jpg" for record_id in ids],
+        "poster_path": [f"/poster_{record_id}.jpg" for record_id in ids],
+        "watch_providers": [sorted({PROVIDERS[index] for index in choice[:count]}) for choice, count in zip(provider_choices.tolist(), num_providers)],
+        "omdb_title": omdb_title,
+        "imdb_rating": imdb_rating,
+        "imdb_votes": (vote_count * random_generator.uniform(5, 50, num_titles)).astype(int)
+    })
+
+
+def synthetic_catalogue(num_titles, seed=0):
+    """
+        Catalogue of `num_titles` movies and `num_titles` shows, always the same for the same seed.
+    """
+    titles = {kind: synthetic_titles(kind, num_titles, seed) for kind in KINDS}
+    genres = {"movie": pd.DataFrame(MOVIES_GENRES, columns=["id", "name"]), "tv": pd.DataFrame(SHOWS_GENRES, columns=["id", "name"])}
+    return Catalogue(titles, genres)
+
+
+def bronze_catalogue():
+    """
+        Catalogue with the titles recorded in the bronze files (TMDB, watch providers and OMDB ratings). A kind whose
+        files are not all in the bronze folder has no titles. Returns the catalogue and the kinds replayed.
+    """
+    from common.storage import exists, layer_path, read_layer
+
+    titles, replayed = {}, []
+    names = {"movie": ("movies", "release_date"), "tv": ("shows", "first_air_date")}
+    for kind, (name, date_column) in names.items():
+        missing = [file_name for file_name in [f"TMDB_top_rated_{name}", f"TMDB_watch_providers_{name}", f"OMDB_imdb_rating_{name}"]
+                   if not exists("bronze", file_name)]
+        if missing:
+            print(f"Bench - Bronze {name} not replayed, missing: {', '.join(str(layer_path('bronze', file_name, 'csv')) for file_name in missing)}")
+            titles[kind] = synthetic_titles(kind, 0).astype({"genre_ids": object, "watch_providers": object})
+            continue
+
+        frame = read_layer("bronze", f"TMDB_top_rated_{name}").rename(columns={date_column: "date"})
+        frame = frame.drop_duplicates("id").sort_values(["vote_average", "vote_count"], ascending=False, ignore_index=True)
+        frame["title_EN"] = frame["title_EN"].fillna(frame["title_ES"])
+
+        providers = read_layer("bronze", f"TMDB_watch_providers_{name}").drop_duplicates("id")
+        ratings = read_layer("bronze", f"OMDB_imdb_rating_{name}").drop_duplicates("tmdb_id").rename(columns={"tmdb_id": "id"})
+        frame = frame.merge(providers, on="id", how="left").merge(ratings, on="id", how="left")
+
+        frame["omdb_title"] = frame["title_EN"]
+        frame["imdb_rating"] = frame["imdb_rating"].astype(float)
+        frame["date"] = frame["date"].fillna("1111-11-11")
+        # Missing texts are served as null, like TMDB does (NaN is not valid JSON)
+        for column in frame.select_dtypes(["object", "string"]).columns:
+            frame[column] = frame[column].astype(object).where(frame[column].notna(), None)
+        titles[kind] = frame
+        replayed.append(kind)
+
+    if not replayed:
+        raise FileNotFoundError(f"No TMDB titles to replay in {layer_path('bronze', '')}")
+
+    genres = {"movie": read_layer("bronze", "TMDB_movies_genres"), "tv": read_layer("bronze", "TMDB_shows_genres")}
+    return Catalogue(titles, genres), replayed
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive, like the real APIs
+    disable_nagle_algorithm = True # Headers and body are written separately, avoid the delayed ACK of every response
+
+    catalogue = None
+    latency = 0
+    error_rate = 0
+    throttle_rate = 0
+    omdb_limit = None
+    omdb_requests = 0
+    random_generator = random.Random(0)
+    random_lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        with self.random_lock:
+            draw = self.random_generator.random()
+            delay = self.latency * self.random_generator.uniform(0.5, 1.5)
+
+        if delay:
+            time.sleep(delay)
+        if draw < self.throttle_rate:
+            return self.send_json(429, {"status_message": "Your request count is over the allowed limit."}, {"Retry-After": "0"})
+        if draw < self.throttle_rate + self.error_rate:
+            return self.send_json(500, {"status_message": "Internal error."})
+
+        if url.path in ("", "/"):
+            return self.send_omdb(params)
+        self.send_tmdb(url.path, params)
+
+    def send_tmdb(self, path, params):
+        language = params.get("language", "en-US")
+        kind = "movie" if path.startswith("/movie") else "tv"
+
+        if path == "/authentication":
+            self.send_json(200, {"success": True})
+        elif path in ("/movie/top_rated", "/tv/top_rated"):
+            page = int(params.get("page", 1))
+            num_titles = self.catalogue.num_titles(kind)
+            self.send_json(200, {
+                "page": page,
+                "results": self.catalogue.page(kind, page, language),
+                "total_pages": math.ceil(num_titles / PAGE_SIZE),
+                "total_results": num_titles
+            })
+        elif path in ("/genre/movie/list", "/genre/tv/list"):
+            genres = self.catalogue.genres["movie" if "movie" in path else "tv"]
+            self.send_json(200, {"genres": genres[["id", "name"]].to_dict("records")})
+        elif re.fullmatch(r"/(movie|tv)/\d+/watch/providers", path):
+            self.send_found(self.catalogue.watch_providers(kind, int(path.split("/")[2])))
+        elif re.fullmatch(r"/(movie|tv)/\d+", path):
+            record_id = int(path.split("/")[2])
+            body = self.catalogue.record(kind, record_id, language)
+            appended = params.get("append_to_response", "").split(",")
+            if body is not None and "watch/providers" in appended:
+                body["watch/providers"] = self.catalogue.watch_providers(kind, record_id)
+            if body is not None and "translations" in appended:
+                body["translations"] = self.catalogue.translations(kind, record_id)
+            if body is not None and "external_ids" in appended:
+                body["external_ids"] = {"imdb_id": f"tt{record_id:07d}"}
+            self.send_found(body)
+        else:
+            self.send_found(None)
+
+    def send_omdb(self, params):
+        if "t" not in params:
+            return self.send_json(200, {"Response": "False", "Error": "Incorrect IMDb ID."})
+
+        # Daily limit of the key, shared by all the handlers of the server
+        with self.random_lock:
+            type(self).omdb_requests += 1
+            over_limit = self.omdb_limit is not None and type(self).omdb_requests > self.omdb_limit
+        if over_limit:
+            return self.send_json(401, {"Response": "False", "Error": "Request limit reached!"})
+        self.send_json(200, self.catalogue.search_omdb(params.get("type", "movie"), params["t"], params.get("y")))
+
+    def send_found(self, body):
+        if body is None:
+            self.send_json(404, {"status_message": "The resource you requested could not be found."})
+        else:
+            self.send_json(200, body)
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body, default=json_default).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(catalogue, latency=0, error_rate=0, throttle_rate=0, seed=0, omdb_limit=None):
+    """
+        Starts the fake APIs on a free local port in a background thread. Returns the server and its base URL (the
+        same URL is used as TMDB_URL and OMDB_URL).
+
+        - latency: mean seconds before every response (uniform between 50% and 150% of it)
+        - error_rate / throttle_rate: fraction of the requests answered with 500 / 429
+        - omdb_limit: OMDB requests answered before 'Request limit reached!' (no limit by default)
+    """
+    handler = type("Handler", (FakeAPIHandler,), {
+        "catalogue": catalogue,
+        "latency": latency,
+        "error_rate": error_rate,
+        "throttle_rate": throttle_rate,
+        "omdb_limit": omdb_limit,
+        "random_generator": random.Random(seed),
+        "random_lock": threading.Lock()
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -1,53 +1,112 @@
-import requests
 from dotenv import load_dotenv
 import os
-import difflib
+import sys
+import threading
 import pandas as pd
 from pathlib import Path
-import datetime
-from tqdm import tqdm
 import logging
 import time
+import argparse
+import requests
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.storage import DATA_DIR, read_layer, write_layer, layer_path
+from common.event_log import EventLog, setup_logging
+from common.metrics import METRICS
+from api_client import ApiClient
+from concurrency import fetch_in_order
+from quota import QuotaExceeded, QuotaLedger
+from response_cache import ResponseCache, DAY
+from state_store import StateStore, upsert_bronze
+from title_matcher import title_similarity
 
 load_dotenv()
 
 OMDB_API_KEY = os.getenv("OMDB_API_KEY")
-OMDB_URL = "http://www.omdbapi.com/"
+OMDB_URL = os.getenv("OMDB_URL", "http://www.omdbapi.com/")
+
+# OMDB has a limit of 1000 API requests per day for Free accounts (more with a paid key)
+OMDB_REQUEST_LIMIT = int(os.getenv("OMDB_DAILY_LIMIT", 1000))
+OMDB_MAX_WORKERS = int(os.getenv("OMDB_MAX_WORKERS", 4))
 
-logging.basicConfig(
-    filename="movie-rating/logs/api_extraction.log",   
-    level=logging.INFO,             
-    format="%(asctime)s - %(levelname)s - %(message)s" 
-)
+CACHE_DIR = DATA_DIR / "cache"
+STATE_PATH = CACHE_DIR / "extraction_state.sqlite"
+
+# Entities of the extraction state (see StateStore) for each OMDB type
+STATE_ENTITIES = {"movie": "omdb_movie", "series": "omdb_show"}
+
+def get_cache():
+    if os.getenv("API_CACHE", "1") == "0":
+        return None
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return ResponseCache(CACHE_DIR / "http_cache.sqlite", default_ttl=7 * DAY)
+
+# Requests made today, shared by all the runs
+CACHE_DIR.mkdir(parents=True, exist_ok=True)
+QUOTA = QuotaLedger(STATE_PATH, "omdb", OMDB_REQUEST_LIMIT)
+
+# Pooled HTTP session with retries and on-disk cache shared by all the calls to OMDB. Every request sent (retries
+# included, not the cached responses) is charged to the daily quota
+CLIENT = ApiClient(pool_size=OMDB_MAX_WORKERS, cache=get_cache(), limiter=QUOTA.charge)
+
+
+class SearchFailed(Exception):
+    """
+        OMDB answered a search with an error (after the retries), the title has to be searched again.
+    """
+
+# Structured logs (logs/api_extraction.jsonl), the matches are counted and only a sample is written
+EVENTS = EventLog("omdb")
+
+
+def log_match(data_type, outcome, query, result=None, similarity=None, threshold=0.6):
+    """
+        Counts the result of a search by type, outcome ('accepted', 'low_similarity' or 'not_found') and similarity 
+        bucket of 0.1 (the histogram of the match-quality report), writing the titles of a sample of them. The matches 
+        close to the threshold are always written, they are the examples that matter to adjust it.
+    """
+    bucket = None if similarity is None else f"{min(int(similarity * 10), 9) / 10:.1f}"
+    borderline = similarity is not None and abs(similarity - threshold) < 0.1
+    EVENTS.sample("omdb.match", {"type": data_type, "outcome": outcome, "bucket": bucket}, rate=1 if borderline else None,
+                  query=query, result=result, similarity=None if similarity is None else round(similarity, 4))
 
-tqdm.pandas() # Bar progress on pandas
 
 def check_authentication():
     params = {
         "apikey" : {OMDB_API_KEY}
     }
-    response = requests.get(OMDB_URL, params=params)
+    try:
+        response = CLIENT.get(OMDB_URL, params=params, use_cache=False)
+    except QuotaExceeded:
+        return True # Nothing can be requested today, the cached responses are still served
     
     return response.status_code == 200
 
 
+def get_params(data_type, original_title, release_year=None):
+    return {
+        "apikey" : OMDB_API_KEY,
+        "type": data_type,
+        "t" : original_title,
+        "y" : release_year,
+        "r" : "json"
+    }
+
+
+@METRICS.timed()
 def get_data(data_type, original_title, release_year=None, threshold=0.6):
     """
         Calls OMDB API to retrieve information about a movie/show. If the name of the movie/show recieved doesn't match 
         enough with the name of the result movie/show, then it is not considered the same movie/show.
         
+        Raises SearchFailed if OMDB answers with an error, and QuotaExceeded if the daily quota is spent.
+        
         - Type can be 'movie' or 'series'
     """
     
-    params = {
-        "apikey" : OMDB_API_KEY,
-        "type": data_type,
-        "t" : original_title,
-        "y" : release_year,
-        "r" : "json"
-    }
-    
-    response = requests.get(OMDB_URL, params=params)
+    params = get_params(data_type, original_title, release_year)
+    response = CLIENT.get(OMDB_URL, params=params)
     
     if response.status_code == 200:
         
@@ -56,21 +115,24 @@ def get_data(data_type, original_title, release_year=None, threshold=0.6):
             data_title = data.get("Title").lower()
             input_title = original_title.lower()
             
-            similarity = difflib.SequenceMatcher(None, input_title, data_title).ratio()
+            similarity = title_similarity(input_title, data_title)
             
             if similarity >= threshold:
-                logging.info(f"OMDB API - Match acepted: '{input_title}' vs '{data_title}' ({similarity:.2f})")
+                log_match(data_type, "accepted", input_title, data_title, similarity, threshold)
                 return data
             else:
-                logging.info(f"OMDB API - Low similarity: '{input_title}' vs '{data_title}' ({similarity:.2f})")
+                log_match(data_type, "low_similarity", input_title, data_title, similarity, threshold)
                 return None
         else:
-            logging.info(f"OMDB API - No match found for: '{data_type}' - '{original_title}' - '{release_year}'")
+            log_match(data_type, "not_found", original_title)
             return None
     else:
-        logging.info(f"OMDB API - {data_type} - {original_title} - Error: {response.status_code}")
-        return None
-    
+        if "limit reached" in response.text.lower(): # 401 - {"Response": "False", "Error": "Request limit reached!"}
+            raise QuotaExceeded(response.text)
+        EVENTS.event("omdb.error", level=logging.WARNING, type=data_type, query=original_title, year=release_year,
+                     status=response.status_code)
+        raise SearchFailed(f"{data_type} - {original_title} - Error: {response.status_code}")
+
 
 def get_rating_and_votes(data_type, title, release_year=None):
     result = get_data(data_type, title, release_year)
@@ -88,66 +150,193 @@ def get_rating_and_votes(data_type, title, release_year=None):
         }
 
 
-if __name__ == '__main__':
-    
-    if check_authentication():        
-        BASE_DIR = Path(__file__).resolve().parent.parent.parent
-        RAW_DIR = BASE_DIR / "data" / "1_raw"
+def add_year(titles, date_column):
+    # Year of the release date (missing or empty dates are filled with '1111-11-11')
+    titles = titles.copy()
+    dates = titles[date_column]
+    titles["year"] = dates.mask(dates == "").fillna('1111-11-11').str.slice(0, 4).astype(int)
+    return titles
+
+
+def enrichment_titles(movies, shows):
+    """
+        TMDB movies and shows (with their 'release_date' / 'first_air_date') as a single DataFrame with the columns 
+        'id', 'data_type', 'title_EN', 'year', 'vote_count' and 'popularity', to queue them together.
+    """
+    columns = ["id", "data_type", "title_EN", "year", "vote_count", "popularity"]
+    movies = add_year(movies, "release_date").assign(data_type="movie")
+    shows = add_year(shows, "first_air_date").assign(data_type="series")
+    return pd.concat([movies[columns], shows[columns]], ignore_index=True)
 
-        movies_absolute_path = f"{RAW_DIR}\\TMDB_top_rated_movies.csv"
-        shows_absolute_path = f"{RAW_DIR}\\TMDB_top_rated_shows.csv"
 
+def enrichment_queue(titles, state=None):
+    """
+        Titles to request to OMDB (DataFrame with the columns 'id', 'data_type', 'title_EN', 'year', 'vote_count' and
+        'popularity') in priority order:
+        
+        1. Titles never enriched, the most voted and popular first
+        2. Titles whose rating is outdated (votes or popularity changed, or fetched long ago), the oldest first
+        
+        Without `state` (StateStore) all the titles are considered never enriched. Titles without title in English
+        can't be searched and are left out.
+    """
+    queue = []
+    for data_type, group in titles[titles["title_EN"].notna()].groupby("data_type"):
+        group = group.copy()
+        group["fetched_at"] = float("nan")
+        if state is not None:
+            entity = STATE_ENTITIES[data_type]
+            group = group[state.changed(entity, group)]
+            fetched_at = group[["id"]].merge(state.load(entity), on="id", how="left")["fetched_at"]
+            group["fetched_at"] = fetched_at.to_numpy()
+        queue.append(group)
+    
+    if not queue:
+        return titles.iloc[:0].assign(fetched_at=float("nan"))
+    queue = pd.concat(queue, ignore_index=True)
+    queue["outdated"] = queue["fetched_at"].notna()
+    return queue.sort_values(["outdated", "fetched_at", "vote_count", "popularity"], ascending=[True, True, False, False],
+                             ignore_index=True).drop(columns="outdated")
 
-        TMDB_movies = pd.read_csv(movies_absolute_path, sep=';', index_col=0)
-        TMDB_shows = pd.read_csv(shows_absolute_path, sep=';', index_col=0)
 
-        # Fill NAs on date
-        TMDB_movies.fillna({"release_date":'1111-11-11'}, inplace=True) 
-        TMDB_shows.fillna({"first_air_date":'1111-11-11'}, inplace=True)
+def ratings_frame(results):
+    enrichment = pd.DataFrame.from_records(results, columns=["tmdb_id", "data_type", "imdb_rating", "imdb_votes"])
+    
+    # IMDb values are strings ('N/A' if missing and votes with thousands separators: '3,042,120')
+    enrichment['imdb_rating'] = pd.to_numeric(enrichment['imdb_rating'], errors='coerce')
+    enrichment['imdb_votes'] = pd.to_numeric(enrichment['imdb_votes'].astype("string").str.replace(",", ""), errors='coerce')
+    return enrichment
 
-        # Extract year from the date
-        TMDB_movies["year"] = TMDB_movies["release_date"].apply(lambda x: datetime.datetime.strptime(x, "%Y-%m-%d").date().year)
-        TMDB_shows["year"] = TMDB_shows["first_air_date"].apply(lambda x: datetime.datetime.strptime(x, "%Y-%m-%d").date().year)
 
-        # OMDB has a limit of 1000 API requests for Free accounts
-        movies_enrichment = TMDB_movies[["id", "title_EN", "year"]][:1000]
-        shows_enrichment = TMDB_shows[["id", "title_EN", "year"]][:1000]
+@METRICS.timed()
+def request_ratings(queue, max_workers=OMDB_MAX_WORKERS, batch_size=100, on_batch=None):
+    """
+        Gets the IMDb rating and votes of the titles of the queue (see 'enrichment_queue'), in its order, while the 
+        daily quota lasts. Cached responses don't count: once the quota is spent, the rest of the queue is only 
+        served from the cache. The titles left are requested by the next runs, when there is quota again, as the
+        titles whose search failed (OMDB or connection errors after the retries).
+        
+        If `on_batch` is given, it is called with the result of every batch as soon as it is processed (e.g. to save
+        it), so the requests already made are not lost if the run is stopped.
         
+        Returns a DataFrame with the columns 'tmdb_id', 'data_type', 'imdb_rating' and 'imdb_votes' of the titles
+        processed.
+    """
+    spent = threading.Event()
+    
+    def fetch(row):
+        data_id, data_type, title, year = row
+        cached = CLIENT.cache is not None and CLIENT.cache.is_fresh(OMDB_URL, get_params(data_type, title, year))
+        if not cached and spent.is_set():
+            return None
+        try:
+            return (data_id, data_type, *get_rating_and_votes(data_type, title, year).values())
+        except QuotaExceeded:
+            # Spent in the ledger or, if OMDB says so, by requests made from somewhere else
+            if not spent.is_set():
+                EVENTS.event("omdb.quota_reached", level=logging.WARNING, used=QUOTA.used(), limit=QUOTA.limit)
+            QUOTA.exhaust()
+            spent.set()
+        except (SearchFailed, requests.RequestException):
+            METRICS.count("omdb.failed")
+        return None
+    
+    rows = list(queue[["id", "data_type", "title_EN", "year"]].itertuples(index=False, name=None))
+    enrichments = []
+    for start in range(0, len(rows), batch_size):
+        batch = fetch_in_order(fetch, rows[start:start + batch_size], max_workers=max_workers)
+        enrichment = ratings_frame([result for result in batch if result is not None])
+        if on_batch is not None and not enrichment.empty:
+            on_batch(enrichment)
+        enrichments.append(enrichment)
+    
+    enrichment = pd.concat(enrichments, ignore_index=True) if enrichments else ratings_frame([])
+    METRICS.count("omdb.pending", len(rows) - len(enrichment))
+    return enrichment
+
+
+@METRICS.timed()
+def get_imdb_ratings(movies, shows):
+    """
+        Gets the IMDb rating and votes of TMDB movies and shows while the daily quota of OMDB lasts. Both are in a 
+        single queue (see 'enrichment_queue'), so the movies can't spend the quota of the shows.
         
-        """ 
-        # With progress bar
+        Returns a DataFrame with the columns 'tmdb_id', 'data_type' ('movie' or 'series'), 'imdb_rating' and 
+        'imdb_votes'.
+    """
+    return request_ratings(enrichment_queue(enrichment_titles(movies, shows)))
+
+
+def save_ratings(enrichment, incremental):
+    # Movies and shows are saved in different files
+    for data_type, name in [("movie", "OMDB_imdb_rating_movies"), ("series", "OMDB_imdb_rating_shows")]:
+        ratings = enrichment[enrichment["data_type"] == data_type].drop(columns="data_type")
+        if incremental:
+            upsert_bronze(name, ratings, key="tmdb_id")
+        else:
+            write_layer(ratings, "bronze", name)
+
+
+if __name__ == '__main__':
+    
+    parser = argparse.ArgumentParser(description="Enrichment of TMDB movies and shows with IMDb ratings from OMDB")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Request ratings only for new or changed titles and upsert the bronze files")
+    parser.add_argument("--wait", action="store_true",
+                        help="When the daily quota is spent, wait for the next day and continue until all the titles are enriched")
+    args = parser.parse_args()
+    setup_logging()
+    
+    if check_authentication():        
+        # Only the columns needed for the enrichment are read
+        TMDB_movies = read_layer("bronze", "TMDB_top_rated_movies", columns=["id", "title_EN", "release_date", "vote_count", "popularity"])
+        TMDB_shows = read_layer("bronze", "TMDB_top_rated_shows", columns=["id", "title_EN", "first_air_date", "vote_count", "popularity"])
+
+        titles = enrichment_titles(TMDB_movies, TMDB_shows)
+
+        # Movies and shows share the quota, in a single queue. In incremental mode only new titles or titles that 
+        # changed since the last run are queued
+        state = None
+        if args.incremental:
+            state = StateStore(STATE_PATH)
+        queue = enrichment_queue(titles, state)
         
-        movies_enrichment['imdb_rating'] = movies_enrichment.progress_apply(lambda x: get_rating("movie", x.loc["title_EN"], x.loc["year"]), axis=1)
-        time.sleep(60) # Reset API timing
-        shows_enrichment['imdb_rating'] = shows_enrichment.progress_apply(lambda x: get_rating("series", x.loc["title_EN"], x.loc["year"]), axis=1)
-        """
+        enrichments = []
         
-        # Without progress bar
-        print("-> Processing...")
-        movies_ratings_votes = movies_enrichment.apply(lambda x: get_rating_and_votes("movie", x["title_EN"], x["year"]), axis=1, result_type='expand')
-        movies_enrichment = pd.concat([movies_enrichment, movies_ratings_votes], axis=1)
-        print("\tPart 1 finished")
-        time.sleep(60) # Reset API timing
-        shows_ratings_votes = shows_enrichment.apply(lambda x: get_rating_and_votes("series", x["title_EN"], x["year"]), axis=1, result_type='expand')
-        shows_enrichment = pd.concat([shows_enrichment, shows_ratings_votes], axis=1)
-        print("\tPart 2 finished \n-> Done!")
+        def save_batch(enrichment):
+            # Every batch the files are saved with all the titles enriched so far
+            enrichments.append(enrichment)
+            save_ratings(enrichment if args.incremental else pd.concat(enrichments, ignore_index=True), args.incremental)
+            if args.incremental:
+                # Save the state only once the bronze files are updated
+                for data_type, entity in STATE_ENTITIES.items():
+                    done = enrichment.loc[enrichment["data_type"] == data_type, "tmdb_id"]
+                    state.update(entity, titles[(titles["data_type"] == data_type) & titles["id"].isin(done)])
         
-        movies_enrichment = movies_enrichment[['id', 'imdb_rating', 'imdb_votes']].rename(columns={"id": "tmdb_id"})
-        shows_enrichment = shows_enrichment[['id', 'imdb_rating', 'imdb_votes']].rename(columns={"id": "tmdb_id"})
+        while True:
+            print(f"OMDB - {len(queue)} titles to enrich, {QUOTA.remaining()} requests left today")
+            enrichment = request_ratings(queue, on_batch=save_batch)
+            
+            processed = pd.MultiIndex.from_frame(enrichment[["tmdb_id", "data_type"]])
+            queue = queue[~pd.MultiIndex.from_frame(queue[["id", "data_type"]]).isin(processed)]
+            print(f"OMDB - {len(enrichment)} titles enriched, {len(queue)} left")
+            
+            # With quota left, the titles left are the ones that failed: they are requested by the next run
+            if queue.empty or not args.wait or QUOTA.remaining() > 0:
+                break
+            print(f"OMDB - Daily quota spent, waiting {QUOTA.seconds_to_reset() / 3600:.1f} hours for the next one...")
+            time.sleep(QUOTA.seconds_to_reset() + 60)
         
-        # Save files
-        BASE_DIR = Path(__file__).resolve().parent.parent.parent
-        RAW_DIR = BASE_DIR / "data" / "1_raw"
-
-        movies_absolute_path = f"{RAW_DIR}\\OMDB_imdb_rating_movies.csv"
-        shows_absolute_path = f"{RAW_DIR}\\OMDB_imdb_rating_shows.csv"
-
-        # Movies and shows have different columns, need to be merged later
-        movies_enrichment.to_csv(movies_absolute_path, sep=';')
-        shows_enrichment.to_csv(shows_absolute_path, sep=';')
+        if state is not None:
+            state.close()
 
-        print(f"OMDB - Movies file saved on: {movies_absolute_path}")
-        print(f"OMDB - Shows file saved on: {shows_absolute_path}")
+        print(f"OMDB - Movies file saved on: {layer_path('bronze', 'OMDB_imdb_rating_movies')}")
+        print(f"OMDB - Shows file saved on: {layer_path('bronze', 'OMDB_imdb_rating_shows')}")
+        
+        if CLIENT.cache is not None:
+            print(f"OMDB - Cache stats: {CLIENT.cache.stats}")
+        
+        print(f"OMDB - Metrics saved on: {METRICS.write_report('OMDB_api')}")
         
     else:
         print('ERROR: Connection to API failed')
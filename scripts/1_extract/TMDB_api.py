@@ -1,42 +1,89 @@
-import requests
 import os
+import sys
 from dotenv import load_dotenv   
 import pandas as pd
 from tqdm import tqdm
 from pathlib import Path
 import logging
+import argparse
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.storage import DATA_DIR, write_layer, layer_path
+from common.event_log import EventLog, setup_logging
+from common.metrics import METRICS
+from api_client import ApiClient
+from checkpoint import Checkpoint
+from concurrency import TokenBucket, fetch_in_order
+from page_collector import PageCollector, MOVIES_FIELDS, SHOWS_FIELDS
+from response_cache import ResponseCache, DAY
+from state_store import StateStore, upsert_bronze
 
 load_dotenv()
 
 TMDB_TOKEN = os.getenv("TMDB_TOKEN")
+TMDB_URL = os.getenv("TMDB_URL", "https://api.themoviedb.org/3")
+
+# Concurrent extraction: max requests in flight and TMDB quota (~50 requests/second per IP)
+MAX_WORKERS = int(os.getenv("TMDB_MAX_WORKERS", 8))
+TMDB_LIMITER = TokenBucket(rate=float(os.getenv("TMDB_RATE_LIMIT", 40)))
+
+# Locales (language-region) extracted for every title. The first one is the main locale of the dataset: language of
+# the top rated pages and region of the watch providers used by the transforms. en-US is always extracted, its titles
+# are used to search in OMDB
+TITLE_EN_LOCALE = "en-US"
+LOCALES = [locale.strip() for locale in os.getenv("TMDB_LOCALES", "es-ES,en-US").split(",") if locale.strip()]
+LOCALES = list(dict.fromkeys(LOCALES + [TITLE_EN_LOCALE]))
+MAIN_LOCALE = LOCALES[0]
+
+CACHE_DIR = DATA_DIR / "cache"
+STATE_PATH = CACHE_DIR / "extraction_state.sqlite"
+
+# How long each endpoint is served from the local cache before asking TMDB again (the URLs include the query string,
+# the providers are appended to the details requested by `get_locales`)
+TMDB_CACHE_TTLS = [
+    ("*/top_rated*", DAY),
+    ("*append_to_response=*watch/providers*", 7 * DAY),
+    ("*/watch/providers*", 7 * DAY),
+    ("*/genre/*", 30 * DAY)
+]
+
+def get_cache():
+    if os.getenv("API_CACHE", "1") == "0":
+        return None
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    return ResponseCache(CACHE_DIR / "http_cache.sqlite", ttls=TMDB_CACHE_TTLS)
+
+# Pooled HTTP session with retries, on-disk cache and rate limiter shared by all the calls to TMDB
+CLIENT = ApiClient(pool_size=MAX_WORKERS, cache=get_cache(), limiter=TMDB_LIMITER.acquire)
 
 HEADERS = {
     "accept": "application/json",
     "Authorization": "Bearer " + str(TMDB_TOKEN)
 }
 
-logging.basicConfig(
-    filename="logs/api_extraction.log",   
-    level=logging.INFO,             
-    format="%(asctime)s - %(levelname)s - %(message)s" 
-)
+# Structured logs (logs/api_extraction.jsonl), the titles without providers are only counted
+EVENTS = EventLog("tmdb")
 
 def check_authentication(headers):
-    url = "https://api.themoviedb.org/3/authentication"
-    response = requests.get(url, headers=headers)
+    url = f"{TMDB_URL}/authentication"
+    response = CLIENT.get(url, headers=headers, use_cache=False)
     return response.status_code == 200
 
 
+@METRICS.timed()
 def get_movies_on_page(headers, language, getNumPages = False, page=1):
     """
         Used to get a specific page of records from the movies API in TMDB. To avoid overload when calling the API, the 
         list of movies/shows are splitted in pages you have to iterate over. 
         This function is used to iterate over all the pages in the method "get_top_rated_movies".
+        
+        Returns the raw list of records of the page (JSON `results`), the DataFrame is built once all pages are collected.
     """
     
     errors = []
-    url = f"https://api.themoviedb.org/3/movie/top_rated?language={language}&page={page}"
-    response = requests.get(url, headers=headers)
+    url = f"{TMDB_URL}/movie/top_rated?language={language}&page={page}"
+    response = CLIENT.get(url, headers=headers)
     
     if response.status_code == 200:
         data = response.json()
@@ -44,39 +91,53 @@ def get_movies_on_page(headers, language, getNumPages = False, page=1):
         
         if getNumPages:
             num_pages = data.get("total_pages", [])
-            return pd.DataFrame(results), num_pages, errors
+            return results, num_pages, errors
         else:
-            return pd.DataFrame(results), errors
+            return results, errors
     
     else: 
         errors.append(f"TMDB - Movies - Error {response.status_code} on page {page}")
-        return pd.DataFrame(), errors
+        return [], errors
 
 
-def get_top_rated_movies(headers, language='es-ES'):
-    total_result, num_pages, errors = get_movies_on_page(headers, language, getNumPages = True, page=1)
+@METRICS.timed()
+def get_top_rated_movies(headers, language='es-ES', max_workers=MAX_WORKERS):
+    """
+        Retrieves all the pages of top rated movies. The first page is requested alone to know the number of pages, the
+        rest are requested concurrently (at most `max_workers` in flight) and returned in page order.
+    """
     
-    for i in tqdm(range(2, num_pages), desc=f"TMDB - Retrieving movies [{language}] "):
-        page_result, errors = get_movies_on_page(headers, language, page=i)
-        
-        total_result = pd.concat([total_result, page_result], ignore_index=True)
+    first_page, num_pages, errors = get_movies_on_page(headers, language, getNumPages = True, page=1)
+    
+    pages = fetch_in_order(lambda page: get_movies_on_page(headers, language, page=page), range(2, num_pages + 1),
+                           max_workers=max_workers, desc=f"TMDB - Retrieving movies [{language}] ")
     
+    collector = PageCollector(MOVIES_FIELDS)
+    collector.add(first_page)
+    for page_result, page_errors in pages:
+        collector.add(page_result)
+        errors += page_errors
+    
+    total_result = collector.to_frame()
     total_result["type"] = 'movie'
     
     return total_result, errors
 
 
+@METRICS.timed()
 def get_shows_on_page(headers, language, getNumPages = False, page=1):
     """
         Used to get a specific page of records from the shows API in TMDB. To avoid overload when calling the API, the 
         list of movies/shows are splitted in pages you have to iterate over. 
         This function is used to iterate over all the pages in the method "get_top_rated_shows".
+        
+        Returns the raw list of records of the page (JSON `results`), the DataFrame is built once all pages are collected.
     """
     
     errors = []
-    url = f"https://api.themoviedb.org/3/tv/top_rated?language={language}&page={page}"
+    url = f"{TMDB_URL}/tv/top_rated?language={language}&page={page}"
 
-    response = requests.get(url, headers=headers)
+    response = CLIENT.get(url, headers=headers)
     
     if response.status_code == 200:
         data = response.json()
@@ -84,31 +145,57 @@ def get_shows_on_page(headers, language, getNumPages = False, page=1):
         
         if getNumPages:
             num_pages = data.get("total_pages", [])
-            return pd.DataFrame(results), num_pages, errors
+            return results, num_pages, errors
         else:
-            return pd.DataFrame(results), errors
+            return results, errors
     
     else: 
         errors.append(f"TMDB - Shows - Error {response.status_code} on page {page}")
-        return pd.DataFrame(), errors
+        return [], errors
 
 
-def get_top_rated_shows(headers, language='es-ES'):
-    total_result, num_pages, errors = get_shows_on_page(headers, language, getNumPages = True, page=1)
+@METRICS.timed()
+def get_top_rated_shows(headers, language='es-ES', max_workers=MAX_WORKERS):
+    """
+        Retrieves all the pages of top rated shows. The first page is requested alone to know the number of pages, the
+        rest are requested concurrently (at most `max_workers` in flight) and returned in page order.
+    """
     
-    for i in tqdm(range(2, num_pages), desc=f"TMDB - Retrieving shows  [{language}] "):
-        page_result, errors = get_shows_on_page(headers, language, page=i)
-        
-        total_result = pd.concat([total_result, page_result], ignore_index=True)
+    first_page, num_pages, errors = get_shows_on_page(headers, language, getNumPages = True, page=1)
+    
+    pages = fetch_in_order(lambda page: get_shows_on_page(headers, language, page=page), range(2, num_pages + 1),
+                           max_workers=max_workers, desc=f"TMDB - Retrieving shows  [{language}] ")
     
+    collector = PageCollector(SHOWS_FIELDS)
+    collector.add(first_page)
+    for page_result, page_errors in pages:
+        collector.add(page_result)
+        errors += page_errors
+    
+    total_result = collector.to_frame()
     total_result["type"] = 'show'
     
     return total_result, errors
 
+def add_title_EN(titles, locales_data, type):
+    """
+        Adds to the top rated movies/shows the titles in en-US (later needed to search in OMDB) as 'title_EN', taken 
+        from the locales data (see 'enrich_locales'). Returns the DataFrame sorted by rating.
+        
+        - Type can be 'movie' or 'show'
+    """
+    title_column = "title" if type == 'movie' else "name"
+    
+    titles_EN = locale_view(locales_data, TITLE_EN_LOCALE, ["title"]).rename(columns={"title": "title_EN"})
+    result = titles.merge(titles_EN, on='id', how='left').rename(columns={title_column: "title_ES"}).sort_values(by=['vote_average', 'vote_count'], ascending=False)
+    return result
+
+
+@METRICS.timed()
 def get_movie_genres(headers, language='es-ES'):
-    url = f"https://api.themoviedb.org/3/genre/movie/list?language={language}"
+    url = f"{TMDB_URL}/genre/movie/list?language={language}"
     
-    response = requests.get(url, headers=headers)
+    response = CLIENT.get(url, headers=headers)
     
     if response.status_code == 200:
         data = response.json()
@@ -117,10 +204,11 @@ def get_movie_genres(headers, language='es-ES'):
     else:
         return f"Error getting MOVIE genres - Status Code: {response.status_code}"
     
+@METRICS.timed()
 def get_shows_genres(headers, language='es-ES'):
-    url = f"https://api.themoviedb.org/3/genre/tv/list?language={language}"
+    url = f"{TMDB_URL}/genre/tv/list?language={language}"
     
-    response = requests.get(url, headers=headers)
+    response = CLIENT.get(url, headers=headers)
     
     if response.status_code == 200:
         data = response.json()
@@ -129,54 +217,138 @@ def get_shows_genres(headers, language='es-ES'):
     else:
         return f"Error getting SHOWS genres - Status Code: {response.status_code}"
 
-def get_watch_providers(headers, data_id, type, selected_language = 'ES'):
+def parse_watch_providers(data, data_id, type, selected_language='ES'):
     """
-     - Type can be 'movie' or 'tv' (for shows)
+        Gets the names of the flatrate providers of a region from the JSON of the endpoint `/watch/providers`.
+    """
+    filter_language = data.get("results", {}).get(selected_language)
+    if filter_language: 
+        flatrate_options = filter_language.get("flatrate") # Only interested in the ones that are included in subscriptions (flatrate)
+        if flatrate_options: 
+            return [sys.intern(provider.get('provider_name')) for provider in flatrate_options] # Same names for many titles
+        else: 
+            EVENTS.count("tmdb.providers_missing", type=type, region=selected_language, reason="no_flatrate")
+            return []
+    else: 
+        EVENTS.count("tmdb.providers_missing", type=type, region=selected_language, reason="no_region")
+        return []
+
+
+def parse_translations(data, locales, original_title):
+    """
+        Gets the title and overview of every locale from the JSON of `translations`, which has all the translations of
+        the movie/show. A locale without translation for its region uses the one of its language, and the original 
+        title if there is none (as TMDB does with the `language` parameter).
     """
-    if type not in ['movie', 'tv']:
-        logging.info(f"TMDB API - Type {type} is not an option")
-        pass
+    translations = {}
+    for translation in data.get("translations", []):
+        values = translation.get("data", {})
+        title = values.get("title") or values.get("name")
+        if title or values.get("overview"):
+            translations[f"{translation.get('iso_639_1')}-{translation.get('iso_3166_1')}"] = (title, values.get("overview"))
     
-    url = f"https://api.themoviedb.org/3/{type}/{data_id}/watch/providers"
+    result = {}
+    for locale in locales:
+        language = locale.split("-")[0]
+        same_language = [value for key, value in translations.items() if key.split("-")[0] == language]
+        title, overview = translations.get(locale) or (same_language[0] if same_language else (None, None))
+        result[locale] = (title or original_title, overview or None)
+    return result
 
-    response = requests.get(url, headers=headers)
+
+@METRICS.timed()
+def get_locales(headers, data_id, type, locales=LOCALES, with_details=False):
+    """
+        Gets everything of a movie/show that depends on the locale in a single request, appending its translations and
+        watch providers to the details (`append_to_response`). Both have the values of all the languages/regions at 
+        once, so they are fanned out to every locale without more requests.
+        
+        Returns a record with the id, the title, overview and providers of every locale and, if `with_details` is True, 
+        the IMDb id of the movie/show (from its external ids). If the request fails, the record has no locales and its
+        'error' is the status code.
+        
+     - Type can be 'movie' or 'tv' (for shows)
+    """
+    appended = "watch/providers,translations" + (",external_ids" if with_details else "")
+    url = f"{TMDB_URL}/{type}/{data_id}?language={locales[0]}&append_to_response={appended}"
+    
+    response = CLIENT.get(url, headers=headers)
+    record = {"id": int(data_id), "locales": {}, "imdb_id": None}
     
     if response.status_code == 200:
         data = response.json()
-        filter_language = data.get("results").get(selected_language)
-        if filter_language: 
-            flatrate_options = filter_language.get("flatrate") # Only interested in the ones that are included in subscriptions (flatrate)
-            if flatrate_options: 
-                providers_list = [provider.get('provider_name') for provider in flatrate_options]
-                return (data_id, providers_list)
-            else: 
-                logging.info(f"TMDB API - Flatrate option for {type}: {data_id} not found")
-                return (data_id, [])
-        else: 
-            logging.info(f"TMDB API - Language '{selected_language}' for the {type}: {data_id} not found")
-            return (data_id, [])
+        translations = parse_translations(data.get("translations", {}), locales, data.get("original_title") or data.get("original_name"))
+        for locale in locales:
+            title, overview = translations[locale]
+            providers_list = parse_watch_providers(data.get("watch/providers", {}), data_id, type, locale.split("-")[-1])
+            record["locales"][locale] = {"title": title, "overview": overview, "watch_providers": providers_list}
+        if with_details:
+            record["imdb_id"] = data.get("external_ids", {}).get("imdb_id") or data.get("imdb_id")
     else:
-        logging.info("TMDB API - Error getting watch provider")
-        return (data_id, [])
+        record["error"] = response.status_code
+        EVENTS.event("tmdb.locales_error", level=logging.WARNING, type=type, id=int(data_id), status=response.status_code)
+    return record
+
+
+@METRICS.timed()
+def enrich_locales(headers, ids, type, checkpoint_path, locales=LOCALES, with_details=False, batch_size=500, max_workers=MAX_WORKERS):
+    """
+        Gets the locale data (see 'get_locales') of all the given ids, one request per id whatever the number of 
+        locales. The ids are requested concurrently in batches, and every batch is saved in a checkpoint file, so if 
+        the process crashes the next run continues from the last saved batch (the ids that failed are requested again).
+        The checkpoint is only reused if it was saved with the same locales and `with_details`.
+        
+        Returns a DataFrame with a row per id and locale (in the order of the ids received) with the columns 'id', 
+        'locale', 'title', 'overview', 'watch_providers' and 'imdb_id' (only requested if `with_details` is True). The 
+        ids whose request failed have no rows, so they are not taken as extracted.
+        
+     - Type can be 'movie' or 'tv' (for shows)
+    """
+    checkpoint = Checkpoint(checkpoint_path, params={"locales": list(locales), "with_details": with_details})
+    done = checkpoint.done()
+    pending = [data_id for data_id in ids if int(data_id) not in done]
+    
+    fetch = lambda data_id: get_locales(headers, data_id, type, locales, with_details)
+    
+    for start in tqdm(range(0, len(pending), batch_size), desc=f"TMDB - Retrieving locales [{type}] "):
+        checkpoint.save(fetch_in_order(fetch, pending[start:start + batch_size], max_workers=max_workers))
+    
+    records = checkpoint.latest()
+    rows = []
+    for data_id in ids:
+        record = records.get(int(data_id), {})
+        if "locales" not in record or record.get("error"):
+            continue
+        for locale in locales:
+            values = record.get("locales", {}).get(locale, {})
+            rows.append((int(data_id), locale, values.get("title"), values.get("overview"), values.get("watch_providers", []), record.get("imdb_id")))
+    
+    return pd.DataFrame.from_records(rows, columns=["id", "locale", "title", "overview", "watch_providers", "imdb_id"])
+
+
+def locale_view(locales_data, locale, columns):
+    # Rows of a single locale (one per title) with the given columns
+    return locales_data.loc[locales_data["locale"] == locale, ["id"] + columns].reset_index(drop=True)
     
 if __name__ == '__main__':
     
+    parser = argparse.ArgumentParser(description="Extraction of top rated movies and shows from TMDB")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Request the locales only for new or changed titles and upsert the bronze files")
+    parser.add_argument("--with-details", action="store_true",
+                        help="Request the external ids with the locales (append_to_response) and save the IMDb ids")
+    parser.add_argument("--locales", nargs="+", default=LOCALES,
+                        help="Locales (language-region) to extract, the first one is the main one (TMDB_LOCALES by default)")
+    args = parser.parse_args()
+    setup_logging()
+    
+    locales = list(dict.fromkeys(args.locales + [TITLE_EN_LOCALE]))
+    
     if check_authentication(HEADERS):
         
-        # Extraction in es-ES
-        movies_ES, movies_errors = get_top_rated_movies(HEADERS)
-        shows_ES, shows_errors = get_top_rated_shows(HEADERS)
-        
-        # Extraction in en-US (later needed to search in OMDB)
-        movies_EN, movies_errors = get_top_rated_movies(HEADERS, language='en-US')
-        shows_EN, shows_errors = get_top_rated_shows(HEADERS, language='en-US')
-        
-        # Merge all of es-ES with titles in en-US
-        movies_titles_EN = movies_EN[["id", "title"]].rename(columns={"title": "title_EN"})
-        result_movies = movies_ES.merge(movies_titles_EN, on='id', how='left').rename(columns={"title": "title_ES"}).sort_values(by=['vote_average', 'vote_count'], ascending=False)
-        
-        shows_titles_EN = shows_EN[["id", "name"]].rename(columns={"name": "title_EN"})
-        result_shows = shows_ES.merge(shows_titles_EN, on='id', how='left').rename(columns={"name": "title_ES"}).sort_values(by=['vote_average', 'vote_count'], ascending=False)
+        # Top rated pages are requested only once, in the main locale
+        movies, movies_errors = get_top_rated_movies(HEADERS, language=locales[0])
+        shows, shows_errors = get_top_rated_shows(HEADERS, language=locales[0])
         
         # Show errors during process
         print("Errors during the extraction: ", movies_errors + shows_errors)
@@ -185,41 +357,79 @@ if __name__ == '__main__':
         movie_genres = get_movie_genres(HEADERS)
         shows_genres = get_shows_genres(HEADERS)
         
-        # Extraction of watch providers for the first 2k records to simplify
+        # Extraction of the locales (titles, overviews and watch providers) for the whole catalogue
+        movies_to_enrich = movies
+        shows_to_enrich = shows
+        
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        
+        # In incremental mode only new titles or titles that changed since the last run are requested again
+        if args.incremental:
+            state = StateStore(STATE_PATH)
+            movies_to_enrich = movies_to_enrich[state.changed("tmdb_locales_movie", movies_to_enrich)]
+            shows_to_enrich = shows_to_enrich[state.changed("tmdb_locales_show", shows_to_enrich)]
+        
+        print(f"TMDB - Retrieving {len(locales)} locales of {len(movies_to_enrich)} movies and {len(shows_to_enrich)} shows...")
+        locales_movies = enrich_locales(HEADERS, movies_to_enrich["id"].tolist(), 'movie', CACHE_DIR / "checkpoint_locales_movies.jsonl",
+                                        locales, with_details=args.with_details)
+        locales_shows = enrich_locales(HEADERS, shows_to_enrich["id"].tolist(), 'tv', CACHE_DIR / "checkpoint_locales_shows.jsonl",
+                                       locales, with_details=args.with_details)
+        failed = len(movies_to_enrich) - locales_movies["id"].nunique() + len(shows_to_enrich) - locales_shows["id"].nunique()
+        print(f"TMDB - Retrieving locales done ({failed} titles failed, they are requested again by the next run)")
         
-        print("TMDB - Retrieving watch providers...")
-        watch_providers_movies = movies_ES["id"][:2000].apply(lambda movie_id: get_watch_providers(HEADERS, movie_id, 'movie'))
-        watch_providers_movies = pd.DataFrame(watch_providers_movies.tolist(), columns=["id", "watch_providers"])
+        # Only the titles whose locales were extracted are saved in the state
+        movies_extracted = movies_to_enrich[movies_to_enrich["id"].isin(locales_movies["id"])]
+        shows_extracted = shows_to_enrich[shows_to_enrich["id"].isin(locales_shows["id"])]
         
-        watch_providers_shows = shows_ES["id"][:2000].apply(lambda movie_id: get_watch_providers(HEADERS, movie_id, 'tv'))
-        watch_providers_shows = pd.DataFrame(watch_providers_shows.tolist(), columns=["id", "watch_providers"])
-        print("TMDB - Retrieving watch providers done")
+        # The IMDb ids (only requested with details) are saved in their own files
+        if args.with_details:
+            external_ids_movies = locale_view(locales_movies, locales[0], ["imdb_id"])
+            external_ids_shows = locale_view(locales_shows, locales[0], ["imdb_id"])
          
-        # Save files
-        BASE_DIR = Path(__file__).resolve().parent.parent.parent
-        RAW_DIR = BASE_DIR / "data" / "1_raw"
-
-        movies_absolute_path = f"{RAW_DIR}\\TMDB_top_rated_movies.csv"
-        shows_absolute_path = f"{RAW_DIR}\\TMDB_top_rated_shows.csv"
+        # Save files (movies and shows have different columns, need to be merged later)
+        write_layer(movie_genres, "bronze", "TMDB_movies_genres")
+        write_layer(shows_genres, "bronze", "TMDB_shows_genres")
+        
+        if args.incremental:
+            # Locales of the titles not requested again are the ones saved by the previous runs
+            locales_movies = upsert_bronze("TMDB_locales_movies", locales_movies, key=["id", "locale"])
+            locales_shows = upsert_bronze("TMDB_locales_shows", locales_shows, key=["id", "locale"])
+            
+            upsert_bronze("TMDB_top_rated_movies", add_title_EN(movies, locales_movies, 'movie'))
+            upsert_bronze("TMDB_top_rated_shows", add_title_EN(shows, locales_shows, 'show'))
+        else:
+            write_layer(locales_movies, "bronze", "TMDB_locales_movies")
+            write_layer(locales_shows, "bronze", "TMDB_locales_shows")
+            
+            write_layer(add_title_EN(movies, locales_movies, 'movie'), "bronze", "TMDB_top_rated_movies")
+            write_layer(add_title_EN(shows, locales_shows, 'show'), "bronze", "TMDB_top_rated_shows")
+        
+        # Watch providers of the main locale, used by the transforms
+        write_layer(locale_view(locales_movies, locales[0], ["watch_providers"]), "bronze", "TMDB_watch_providers_movies")
+        write_layer(locale_view(locales_shows, locales[0], ["watch_providers"]), "bronze", "TMDB_watch_providers_shows")
         
-        movies_genres_path = f"{RAW_DIR}\\TMDB_movies_genres.csv"
-        shows_genres_path = f"{RAW_DIR}\\TMDB_shows_genres.csv"
+        if args.incremental:
+            # Save the state only once the bronze files are updated
+            state.update("tmdb_locales_movie", movies_extracted)
+            state.update("tmdb_locales_show", shows_extracted)
+            state.close()
         
-        watch_providers_movies_path = f"{RAW_DIR}\\TMDB_watch_providers_movies.csv"
-        watch_providers_shows_path = f"{RAW_DIR}\\TMDB_watch_providers_shows.csv"
+        if args.with_details:
+            upsert_bronze("TMDB_external_ids_movies", external_ids_movies)
+            upsert_bronze("TMDB_external_ids_shows", external_ids_shows)
         
-        # Movies and shows have different columns, need to be merged later
-        result_movies.to_csv(movies_absolute_path, sep=';')
-        result_shows.to_csv(shows_absolute_path, sep=';')
+        # Progress of the locales is saved in the bronze files, the checkpoints are no longer needed
+        Checkpoint(CACHE_DIR / "checkpoint_locales_movies.jsonl").clear()
+        Checkpoint(CACHE_DIR / "checkpoint_locales_shows.jsonl").clear()
         
-        movie_genres.to_csv(movies_genres_path, sep=';')
-        shows_genres.to_csv(shows_genres_path, sep=';')
+        print(f"TMDB - Movies file saved on: {layer_path('bronze', 'TMDB_top_rated_movies')}")
+        print(f"TMDB - Shows file saved on: {layer_path('bronze', 'TMDB_top_rated_shows')}")
+        print(f"TMDB - Locales ({', '.join(locales)}) saved on: {layer_path('bronze', 'TMDB_locales_movies')} and {layer_path('bronze', 'TMDB_locales_shows')}")
         
-        watch_providers_movies.to_csv(watch_providers_movies_path, sep=';')
-        watch_providers_shows.to_csv(watch_providers_shows_path, sep=';')
+        if CLIENT.cache is not None:
+            print(f"TMDB - Cache stats: {CLIENT.cache.stats}")
         
-        print(f"TMDB - Movies file saved on: {movies_absolute_path}")
-        print(f"TMDB - Shows file saved on: {shows_absolute_path}")
+        print(f"TMDB - Metrics saved on: {METRICS.write_report('TMDB_api')}")
          
     else: 
         print('ERROR: Connection to API failed')
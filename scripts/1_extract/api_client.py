@@ -0,0 +1,122 @@
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from common.metrics import METRICS, endpoint_name
+
+# Defaults of the HTTP clients, can be overridden from the environment
+POOL_SIZE = int(os.getenv("API_POOL_SIZE", 10))
+TIMEOUT = float(os.getenv("API_TIMEOUT", 10))
+RETRIES = int(os.getenv("API_RETRIES", 5))
+BACKOFF_FACTOR = float(os.getenv("API_BACKOFF_FACTOR", 0.5))
+
+# Rate limit and transient server errors are retried, the rest are returned to the caller
+RETRY_STATUS = [429, 500, 502, 503, 504]
+
+
+class CountingRetry(Retry):
+    # Retry policy that counts every retry in the metrics of the run. If it has a `limiter`, every retry waits for it
+    # after the backoff, as any other request sent to the API
+    limiter = None
+
+    def new(self, **kw):
+        retry = super().new(**kw)
+        retry.limiter = self.limiter
+        return retry
+
+    def increment(self, method=None, url=None, *args, **kwargs):
+        METRICS.count(f"http.retries {endpoint_name(url or '')}")
+        return super().increment(method, url, *args, **kwargs)
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        if self.limiter is not None:
+            self.limiter()
+
+
+class ApiClient:
+    """
+        HTTP client shared by all the calls to an API. It keeps a pooled `requests.Session`, so the TCP/TLS connections
+        are reused between requests (keep-alive) instead of opening a new one on every call.
+
+        Requests that fail with a connection error or with a status in RETRY_STATUS are retried with exponential
+        backoff (`backoff_factor * 2 ** retry` seconds, or the `Retry-After` header of the response if present).
+
+        If a `cache` (ResponseCache) is given, fresh responses are served from disk without calling the API and stale
+        ones are revalidated with a conditional request when the API allows it.
+
+        If a `limiter` is given (e.g. `TokenBucket.acquire`), it is called before every request sent to the API, retries
+        included. Responses served from the cache don't call it.
+
+        - pool_size should be at least the number of threads using the client at the same time
+    """
+
+    def __init__(self, headers=None, pool_size=POOL_SIZE, timeout=TIMEOUT, retries=RETRIES, backoff_factor=BACKOFF_FACTOR,
+                 cache=None, limiter=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.limiter = limiter
+
+        retry = CountingRetry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS,
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+            raise_on_status=False # After the last retry the response is returned and the caller checks the status
+        )
+        retry.limiter = limiter
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url, params=None, headers=None, use_cache=True):
+        """
+            GET request (served from the cache if possible). Latency, status codes and cache hits are recorded per
+            endpoint in the metrics of the run.
+        """
+        endpoint = endpoint_name(url)
+        with METRICS.timer(f"http {endpoint}"):
+            response, cache_status = self._get(url, params, headers, use_cache)
+
+        METRICS.count(f"http.requests {endpoint}")
+        METRICS.count(f"http.status_{response.status_code} {endpoint}")
+        METRICS.count(f"http.cache_{cache_status} {endpoint}")
+        return response
+
+    def _send(self, url, params, headers):
+        # Only the requests that reach the API wait for the limiter
+        if self.limiter is not None:
+            self.limiter()
+        return self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+
+    def _get(self, url, params, headers, use_cache):
+        if self.cache is None or not use_cache:
+            return self._send(url, params, headers), "disabled"
+
+        entry = self.cache.get(url, params)
+        if entry is not None and entry.fresh:
+            return entry.to_response(), "hit"
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(entry.validators())
+
+        response = self._send(url, params, request_headers)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.revalidated(entry)
+            return entry.to_response(), "revalidated"
+        if response.status_code == 200:
+            self.cache.put(url, params, response)
+
+        return response, "miss"
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -0,0 +1,71 @@
+import json
+import os
+
+# Field of the first line of the file, with the parameters the records were produced with
+HEADER = "checkpoint"
+
+
+class Checkpoint:
+    """
+        Progress of a long extraction saved as JSON lines, one record per processed item. If the process crashes, the
+        next run loads the records already saved and only processes the missing items.
+
+        - key: field of the records that identifies the item (e.g. 'id')
+        - error: field set in the records of the items that failed (e.g. the status code). They are saved, but they
+          are not done: the next run processes them again, and their last record is the one kept by `latest`
+        - params: what the records depend on (e.g. the locales requested), saved in the first line. A checkpoint saved
+          with other params is discarded, its items are processed again
+    """
+
+    def __init__(self, path, key="id", error="error", params=None):
+        self.path = path
+        self.key = key
+        self.error = error
+        self.params = params
+
+        if params is not None and os.path.exists(path) and self.header() != params:
+            self.clear()
+
+    def header(self):
+        with open(self.path, encoding="utf-8") as file:
+            try:
+                first = json.loads(file.readline())
+            except json.JSONDecodeError:
+                return None
+        return first.get(HEADER) if isinstance(first, dict) else None
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+
+        records = []
+        with open(self.path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break # Last line partially written before the crash
+                if HEADER not in record:
+                    records.append(record)
+        return records
+
+    def latest(self):
+        # Last record saved of every item (an item that failed and was processed again has several)
+        return {record[self.key]: record for record in self.load()}
+
+    def done(self):
+        return {key for key, record in self.latest().items() if not record.get(self.error)}
+
+    def save(self, records):
+        new = not os.path.exists(self.path)
+        with open(self.path, "a", encoding="utf-8") as file:
+            if new and self.params is not None:
+                file.write(json.dumps({HEADER: self.params}) + "\n")
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
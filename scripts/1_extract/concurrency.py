@@ -0,0 +1,56 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+
+
+class TokenBucket:
+    """
+        Thread-safe token bucket used to respect the request quota of an API. The bucket is refilled at `rate` tokens
+        per second up to `capacity` tokens (allowed burst). Every request has to call `acquire` before being sent, which
+        blocks until a token is available.
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("The rate of the token bucket must be greater than 0")
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self, tokens=1):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def fetch_in_order(fetch, items, max_workers=8, desc=None):
+    """
+        Calls `fetch(item)` for every item using a bounded thread pool, so at most `max_workers` requests are in flight
+        at the same time. The quota of the API is respected by its client (see the `limiter` of ApiClient), so calls
+        served from the cache are not throttled.
+
+        Results are returned in the same order as `items`, no matter the order in which the requests finish.
+    """
+
+    items = list(items)
+
+    if max_workers <= 1:
+        return [fetch(item) for item in tqdm(items, desc=desc, disable=desc is None)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Executor.map yields the results in the order of the input
+        return list(tqdm(executor.map(fetch, items), total=len(items), desc=desc, disable=desc is None))
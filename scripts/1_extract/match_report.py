@@ -0,0 +1,133 @@
+"""
+    Match-quality report of the OMDB enrichment, from the structured logs (logs/api_extraction.jsonl):
+
+    - searches of each type by outcome: accepted, low similarity (rejected) and not found
+    - histogram of the similarity between the searched titles and the titles found, by buckets of 0.1
+    - borderline examples from the sampled events: the accepted matches with the lowest similarity and the rejected
+      ones with the highest, to check the threshold
+
+    The counts come from the 'summary' events written during every run (periodically and at the end). The text logs of the older versions
+    (one line per search) can be read with `--legacy`.
+
+        python scripts/1_extract/match_report.py
+        python scripts/1_extract/match_report.py --all-runs
+        python scripts/1_extract/match_report.py --legacy logs/api_extraction.log
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.event_log import LOG_PATH, read_events
+
+OUTCOMES = ["accepted", "low_similarity", "not_found"]
+LEGACY_PATTERNS = [
+    ("accepted", re.compile(r"(?:OMDB API - )?Match acepted: '(.*)' vs '(.*)' \((\d\.\d\d)\)$")),
+    ("low_similarity", re.compile(r"(?:OMDB API - )?Low similarity: '(.*)' vs '(.*)' \((\d\.\d\d)\)$")),
+    ("not_found", re.compile(r"(?:OMDB API - )?No match found for: '(.*)' - '(.*)' - '.*'$"))
+]
+
+
+def bucket_of(similarity):
+    return f"{min(int(similarity * 10), 9) / 10:.1f}"
+
+
+def from_events(events, all_runs=False):
+    """
+        Counts ({(type, outcome, bucket): count}) and sampled matches of the last run with OMDB searches (or of all
+        the runs).
+    """
+    runs = {}
+    for event in events:
+        if event.get("logger") != "omdb":
+            continue
+        run = runs.setdefault(event.get("run"), {"counts": {}, "samples": []})
+        if event.get("event") == "summary":
+            for counter in event.get("counters", {}).get("omdb.match", []):
+                key = (counter.get("type"), counter.get("outcome"), counter.get("bucket"))
+                run["counts"][key] = run["counts"].get(key, 0) + counter["count"]
+        elif event.get("event") == "omdb.match":
+            run["samples"].append(event)
+
+    selected = list(runs.values()) if all_runs else list(runs.values())[-1:]
+    counts, samples = {}, []
+    for run in selected:
+        for key, count in run["counts"].items():
+            counts[key] = counts.get(key, 0) + count
+        samples += run["samples"]
+    return counts, samples
+
+
+def from_legacy(path):
+    # Every search has its line in the text logs (without the type of the matches): counts and samples are the same
+    counts, samples = {}, []
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            for outcome, pattern in LEGACY_PATTERNS:
+                match = pattern.search(line.strip())
+                if not match:
+                    continue
+                if outcome == "not_found":
+                    key = (None, outcome, None)
+                else:
+                    similarity = float(match.group(3))
+                    key = (None, outcome, bucket_of(similarity))
+                    samples.append({"outcome": outcome, "query": match.group(1), "result": match.group(2), "similarity": similarity})
+                counts[key] = counts.get(key, 0) + 1
+                break
+    return counts, samples
+
+
+def print_report(counts, samples, examples=10):
+    total = sum(counts.values())
+    if not total:
+        print("No OMDB searches found in the logs")
+        return
+
+    print(f"OMDB searches: {total}")
+    for data_type in sorted({key[0] for key in counts}, key=str):
+        by_outcome = {outcome: sum(count for key, count in counts.items() if key[0] == data_type and key[1] == outcome) for outcome in OUTCOMES}
+        type_total = sum(by_outcome.values())
+        print(f"\n{data_type or 'all types'} ({type_total})")
+        for outcome, count in by_outcome.items():
+            print(f"  {outcome:<15} {count:>8} {count / type_total:>7.1%}")
+
+    print("\nSimilarity of the titles found")
+    buckets = {}
+    for (_, outcome, bucket), count in counts.items():
+        if bucket is not None:
+            buckets.setdefault(bucket, {}).setdefault(outcome, 0)
+            buckets[bucket][outcome] += count
+    largest = max(sum(values.values()) for values in buckets.values()) if buckets else 1
+    for bucket in sorted(buckets):
+        values = buckets[bucket]
+        bucket_total = sum(values.values())
+        print(f"  {bucket}-{float(bucket) + 0.1:.1f} {bucket_total:>8} "
+              f"(accepted {values.get('accepted', 0)}, rejected {values.get('low_similarity', 0)}) {'#' * round(40 * bucket_total / largest)}")
+
+    accepted = sorted((sample for sample in samples if sample.get("outcome") == "accepted"), key=lambda sample: sample["similarity"])
+    rejected = sorted((sample for sample in samples if sample.get("outcome") == "low_similarity"), key=lambda sample: -sample["similarity"])
+    for label, matches in [("Accepted with the lowest similarity", accepted), ("Rejected with the highest similarity", rejected)]:
+        if matches:
+            print(f"\n{label} (sample)")
+            for sample in matches[:examples]:
+                print(f"  {sample['similarity']:.2f}  '{sample['query']}' vs '{sample['result']}'")
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Match-quality report of the OMDB enrichment from the logs")
+    parser.add_argument("--log", type=Path, default=LOG_PATH, help="Structured log file (its rotated files are read too)")
+    parser.add_argument("--all-runs", action="store_true", help="Report all the runs in the logs instead of the last one")
+    parser.add_argument("--legacy", type=Path, help="Read a text log of the older versions instead")
+    parser.add_argument("--examples", type=int, default=10, help="Borderline examples shown")
+    args = parser.parse_args()
+
+    if args.legacy:
+        counts, samples = from_legacy(args.legacy)
+    else:
+        counts, samples = from_events(read_events(args.log), args.all_runs)
+    print_report(counts, samples, args.examples)
@@ -0,0 +1,100 @@
+import sys
+from array import array
+
+import numpy as np
+import pyarrow as pa
+
+# Fields of the TMDB top rated endpoints used by the next stages (the rest of every record is discarded)
+MOVIES_FIELDS = pa.schema([
+    ("id", pa.int64()),
+    ("title", pa.string()),
+    ("overview", pa.string()),
+    ("release_date", pa.string()),
+    ("genre_ids", pa.list_(pa.int64())),
+    ("popularity", pa.float64()),
+    ("vote_average", pa.float64()),
+    ("vote_count", pa.int64())
+])
+
+SHOWS_FIELDS = pa.schema([
+    ("id", pa.int64()),
+    ("name", pa.string()),
+    ("overview", pa.string()),
+    ("first_air_date", pa.string()),
+    ("genre_ids", pa.list_(pa.int64())),
+    ("popularity", pa.float64()),
+    ("vote_average", pa.float64()),
+    ("vote_count", pa.int64())
+])
+
+# String fields with few distinct values, a single copy of each value is kept
+INTERNED = {"release_date", "first_air_date"}
+
+
+class PageCollector:
+    """
+        Accumulates the raw JSON `results` of every page requested to TMDB as columns, keeping only the given `fields`
+        (Arrow schema). The records of a page can be freed as soon as it is added, instead of keeping a dict per title
+        until the end:
+
+        - numbers in typed arrays (8 bytes per value instead of a Python object), with a validity mask for nulls
+        - strings in lists, the repeated ones interned
+        - lists of numbers flattened as values and offsets, the layout of Arrow lists
+
+        The columns are converted to an Arrow table (numbers and lists without copies) or a DataFrame once all pages
+        are collected.
+    """
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.rows = 0
+        self.columns = {}
+        self.valid = {}
+        for field in fields:
+            if pa.types.is_list(field.type):
+                self.columns[field.name] = (array("q"), array("q", [0]))
+            elif pa.types.is_string(field.type):
+                self.columns[field.name] = []
+            else:
+                self.columns[field.name] = array("d" if pa.types.is_floating(field.type) else "q")
+                self.valid[field.name] = bytearray()
+
+    def add(self, results):
+        # Column by column, each one extended with all the values of the page at once
+        for field in self.fields:
+            values = [record.get(field.name) for record in results]
+            column = self.columns[field.name]
+
+            if pa.types.is_list(field.type):
+                flat_values, offsets = column
+                for value in values:
+                    flat_values.extend(value or [])
+                    offsets.append(len(flat_values))
+            elif pa.types.is_string(field.type):
+                column.extend([sys.intern(value) if value is not None else None for value in values] if field.name in INTERNED else values)
+            else:
+                column.extend([value if value is not None else 0 for value in values])
+                self.valid[field.name].extend([value is not None for value in values])
+        self.rows += len(results)
+
+    def __len__(self):
+        return self.rows
+
+    def to_table(self):
+        arrays = []
+        for field in self.fields:
+            column = self.columns[field.name]
+            if pa.types.is_list(field.type):
+                values, offsets = column
+                arrays.append(pa.ListArray.from_arrays(pa.array(np.frombuffer(offsets, dtype=np.int64)).cast(pa.int32()),
+                                                       pa.array(np.frombuffer(values, dtype=np.int64)), type=field.type))
+            elif pa.types.is_string(field.type):
+                arrays.append(pa.array(column, type=field.type))
+            else:
+                numbers = np.frombuffer(column, dtype=np.float64 if column.typecode == "d" else np.int64)
+                valid = np.frombuffer(self.valid[field.name], dtype=bool)
+                arrays.append(pa.array(numbers, type=field.type, mask=None if valid.all() else ~valid))
+        return pa.Table.from_arrays(arrays, schema=self.fields)
+
+    def to_frame(self):
+        return self.to_table().to_pandas()
@@ -0,0 +1,78 @@
+import datetime
+import sqlite3
+import threading
+
+
+class QuotaExceeded(Exception):
+    """
+        The daily quota of the API is spent (in the ledger, or the API answered that the limit was reached).
+    """
+
+
+class QuotaLedger:
+    """
+        Requests made every day to an API with a daily quota (e.g. OMDB, 1000 requests per day for Free accounts). The
+        count is saved in SQLite after every request, so separate runs (or a crashed one) share the same budget, and a
+        new budget starts every day at midnight UTC.
+
+        Every request has to call `acquire` before being sent: it returns False once the quota of the day is spent
+        (`charge` raises QuotaExceeded instead, to be used as the `limiter` of ApiClient, so retries are charged too).
+        If the API answers that the limit was reached anyway (requests made from somewhere else), `exhaust` marks the
+        quota of the day as spent.
+    """
+
+    def __init__(self, path, api, limit):
+        self.api = api
+        self.limit = limit
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS quota (
+                api TEXT NOT NULL,
+                day TEXT NOT NULL,
+                used INTEGER NOT NULL,
+                PRIMARY KEY (api, day)
+            )
+        """)
+        self._connection.commit()
+
+    @staticmethod
+    def today():
+        return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+    def used(self):
+        with self._lock:
+            row = self._connection.execute("SELECT used FROM quota WHERE api = ? AND day = ?", (self.api, self.today())).fetchone()
+        return row[0] if row else 0
+
+    def remaining(self):
+        return max(self.limit - self.used(), 0)
+
+    def acquire(self):
+        with self._lock:
+            day = self.today()
+            self._connection.execute("INSERT OR IGNORE INTO quota VALUES (?, ?, 0)", (self.api, day))
+            cursor = self._connection.execute("UPDATE quota SET used = used + 1 WHERE api = ? AND day = ? AND used < ?",
+                                              (self.api, day, self.limit))
+            self._connection.commit()
+        return cursor.rowcount == 1
+
+    def charge(self):
+        if not self.acquire():
+            raise QuotaExceeded(f"Daily quota of {self.api} spent ({self.limit} requests)")
+
+    def exhaust(self):
+        with self._lock:
+            day = self.today()
+            self._connection.execute("INSERT OR IGNORE INTO quota VALUES (?, ?, 0)", (self.api, day))
+            self._connection.execute("UPDATE quota SET used = MAX(used, ?) WHERE api = ? AND day = ?", (self.limit, self.api, day))
+            self._connection.commit()
+
+    def seconds_to_reset(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        tomorrow = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), tzinfo=datetime.timezone.utc)
+        return (tomorrow - now).total_seconds()
+
+    def close(self):
+        self._connection.close()
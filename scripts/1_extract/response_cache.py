@@ -0,0 +1,188 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from fnmatch import fnmatch
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Params that identify the user and not the resource, they are not part of the key of the cache
+IGNORED_PARAMS = {"apikey", "api_key"}
+
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        url TEXT NOT NULL,
+        body BLOB NOT NULL,
+        headers TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        fetched_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access);
+
+    -- Total size of the bodies, updated in the same transaction as the responses
+    CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL);
+    INSERT OR IGNORE INTO cache_size SELECT 0, COALESCE(SUM(size), 0) FROM responses;
+    CREATE TRIGGER IF NOT EXISTS responses_inserted AFTER INSERT ON responses
+        BEGIN UPDATE cache_size SET bytes = bytes + NEW.size; END;
+    CREATE TRIGGER IF NOT EXISTS responses_updated AFTER UPDATE OF size ON responses
+        BEGIN UPDATE cache_size SET bytes = bytes + NEW.size - OLD.size; END;
+    CREATE TRIGGER IF NOT EXISTS responses_deleted AFTER DELETE ON responses
+        BEGIN UPDATE cache_size SET bytes = bytes - OLD.size; END;
+"""
+
+# Replacing a response has to fire the update trigger (INSERT OR REPLACE deletes the row without firing it)
+UPSERT = """
+    INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET url = excluded.url, body = excluded.body, headers = excluded.headers,
+        size = excluded.size, fetched_at = excluded.fetched_at, last_access = excluded.last_access
+"""
+
+
+class CachedEntry:
+    def __init__(self, key, url, body, headers, fetched_at, ttl):
+        self.key = key
+        self.url = url
+        self.body = body
+        self.headers = headers
+        self.fetched_at = fetched_at
+        self.ttl = ttl
+
+    @property
+    def fresh(self):
+        return time.time() - self.fetched_at < self.ttl
+
+    def validators(self):
+        """
+            Headers used to revalidate a stale entry: the server answers 304 (Not Modified) if it didn't change.
+        """
+        validators = {}
+        if self.headers.get("ETag"):
+            validators["If-None-Match"] = self.headers["ETag"]
+        if self.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = self.headers["Last-Modified"]
+        return validators
+
+    def to_response(self):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response._content = self.body
+        response.headers = CaseInsensitiveDict(self.headers)
+        return response
+
+
+class ResponseCache:
+    """
+        On-disk cache (SQLite) of successful API responses, keyed by URL and params.
+
+        - ttls: list of (URL pattern, seconds) pairs, the first pattern matching the URL (fnmatch) defines how long the
+          response is fresh. URLs matching no pattern use `default_ttl`.
+        - max_bytes: once the stored bodies exceed this size, the least recently used responses are evicted. The size
+          is kept by the database itself (triggers), so it is right when several caches share the file (TMDB and OMDB)
+
+        Stale entries are not deleted: if the response had an ETag/Last-Modified header, the client can revalidate
+        them with a conditional request.
+    """
+
+    def __init__(self, path, ttls=None, default_ttl=DAY, max_bytes=512 * 1024 ** 2):
+        self.path = path
+        self.ttls = ttls or []
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0, "evicted": 0}
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(url, params=None):
+        params = sorted((str(name), str(value)) for name, value in (params or {}).items()
+                        if value is not None and name not in IGNORED_PARAMS)
+        return hashlib.sha256(f"{url}?{urlencode(params)}".encode()).hexdigest()
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttls:
+            if fnmatch(url, pattern):
+                return ttl
+        return self.default_ttl
+
+    def get(self, url, params=None):
+        """
+            Returns the CachedEntry of the request (fresh or stale) or None if it was never stored.
+        """
+        key = self.make_key(url, params)
+        with self._lock:
+            row = self._connection.execute("SELECT body, headers, fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._connection.commit()
+
+        entry = CachedEntry(key, url, row[0], json.loads(row[1]), row[2], self.ttl_for(url))
+        self.stats["hits" if entry.fresh else "misses"] += 1
+        return entry
+
+    def is_fresh(self, url, params=None):
+        key = self.make_key(url, params)
+        with self._lock:
+            row = self._connection.execute("SELECT fetched_at FROM responses WHERE key = ?", (key,)).fetchone()
+        return row is not None and time.time() - row[0] < self.ttl_for(url)
+
+    def put(self, url, params, response):
+        key = self.make_key(url, params)
+        body = response.content
+        headers = {name: response.headers[name] for name in ("Content-Type", "ETag", "Last-Modified") if name in response.headers}
+        now = time.time()
+
+        with self._lock:
+            self._connection.execute(UPSERT, (key, url, body, json.dumps(headers), len(body), now, now))
+            self.stats["stored"] += 1
+            if self.size() > self.max_bytes:
+                self._evict()
+            self._connection.commit()
+
+    def size(self):
+        # Bytes of all the bodies stored in the file, whoever stored them
+        return self._connection.execute("SELECT bytes FROM cache_size").fetchone()[0]
+
+    def revalidated(self, entry):
+        """
+            Marks a stale entry as fresh again after the server answered 304 (Not Modified).
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute("UPDATE responses SET fetched_at = ?, last_access = ? WHERE key = ?", (now, now, entry.key))
+            self._connection.commit()
+        self.stats["revalidated"] += 1
+        entry.fetched_at = now
+
+    def _evict(self):
+        # Remove the least recently used responses until the cache is under 90% of its maximum size
+        target = self.max_bytes * 0.9
+        total = self.size()
+        rows = self._connection.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.stats["evicted"] += len(evicted)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
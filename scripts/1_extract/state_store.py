@@ -0,0 +1,88 @@
+import sqlite3
+import time
+import pandas as pd
+from common.storage import exists, read_layer, write_layer
+
+DAY = 24 * 60 * 60
+
+
+class StateStore:
+    """
+        Persists, for every entity (e.g. 'tmdb_providers_movie', 'omdb_movie'), the last seen state of each title: its
+        `vote_count`, `popularity` and when it was fetched. It is used by the incremental extraction to request again
+        only the titles that are new or that changed materially since the last run.
+
+        A title is considered changed when its `vote_count` or `popularity` moved more than the given relative
+        thresholds, or when it was fetched more than `max_age` seconds ago.
+    """
+
+    def __init__(self, path, vote_change=0.05, popularity_change=0.25, max_age=30 * DAY):
+        self.vote_change = vote_change
+        self.popularity_change = popularity_change
+        self.max_age = max_age
+
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS titles (
+                entity TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                vote_count INTEGER,
+                popularity REAL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (entity, id)
+            )
+        """)
+        self._connection.commit()
+
+    def load(self, entity):
+        return pd.read_sql_query("SELECT id, vote_count, popularity, fetched_at FROM titles WHERE entity = ?",
+                                 self._connection, params=(entity,))
+
+    def changed(self, entity, titles):
+        """
+            Returns a boolean mask over `titles` (DataFrame with 'id', 'vote_count' and 'popularity') that is True for
+            the titles that are new or changed materially.
+        """
+        previous = titles[["id"]].merge(self.load(entity), on="id", how="left")
+        previous.index = titles.index
+
+        def relative_change(current, last, threshold):
+            return (current - last).abs() > last.abs() * threshold
+
+        votes_changed = relative_change(titles["vote_count"], previous["vote_count"], self.vote_change)
+        popularity_changed = relative_change(titles["popularity"], previous["popularity"], self.popularity_change)
+        stale = previous["fetched_at"] < time.time() - self.max_age
+
+        return previous["fetched_at"].isna() | votes_changed | popularity_changed | stale
+
+    def update(self, entity, titles):
+        """
+            Saves the current state of the titles (DataFrame with 'id', 'vote_count' and 'popularity') as fetched now.
+        """
+        now = time.time()
+        rows = [(entity, int(row.id), int(row.vote_count), float(row.popularity), now)
+                for row in titles[["id", "vote_count", "popularity"]].itertuples(index=False)]
+        self._connection.executemany("INSERT OR REPLACE INTO titles VALUES (?, ?, ?, ?, ?)", rows)
+        self._connection.commit()
+
+    def close(self):
+        self._connection.close()
+
+
+def upsert_bronze(name, new_data, key="id"):
+    """
+        Updates a bronze dataset in place: rows of `new_data` replace the existing rows with the same `key` and new 
+        keys are appended. If the dataset doesn't exist yet it is created with `new_data`.
+        
+        - key: column or list of columns (e.g. ['id', 'locale'])
+    """
+    if exists("bronze", name):
+        existing = read_layer("bronze", name)
+        if isinstance(key, str):
+            existing = existing[~existing[key].isin(new_data[key])]
+        else:
+            existing = existing[~pd.MultiIndex.from_frame(existing[key]).isin(pd.MultiIndex.from_frame(new_data[key]))]
+        new_data = pd.concat([existing, new_data], ignore_index=True)
+
+    write_layer(new_data, "bronze", name)
+    return new_data
@@ -0,0 +1,105 @@
+import re
+import unicodedata
+import pandas as pd
+
+# Articles removed from the titles before comparing them ('The Godfather' = 'Godfather, The')
+ARTICLES = {"the", "a", "an", "el", "la", "los", "las", "un", "una", "le", "les", "l", "il", "der", "die", "das"}
+
+NGRAM_SIZE = 3
+
+
+def normalize_title(title):
+    """
+        Lower case title without accents, punctuation or articles.
+    """
+    title = unicodedata.normalize("NFKD", str(title).lower())
+    title = "".join(char for char in title if not unicodedata.combining(char))
+    words = re.sub(r"[^\w]+", " ", title).split()
+    return " ".join(word for word in words if word not in ARTICLES) or " ".join(words)
+
+
+def title_ngrams(normalized_title, size=NGRAM_SIZE):
+    padded = f" {normalized_title} "
+    return {padded[i:i + size] for i in range(max(len(padded) - size + 1, 1))}
+
+
+def title_similarity(title, other_title):
+    """
+        Similarity between 0 and 1 of two titles: Dice coefficient of the character n-grams of the normalized titles.
+    """
+    title, other_title = normalize_title(title), normalize_title(other_title)
+    if title == other_title:
+        return 1.0
+
+    ngrams, other_ngrams = title_ngrams(title), title_ngrams(other_title)
+    return 2 * len(ngrams & other_ngrams) / (len(ngrams) + len(other_ngrams))
+
+
+class TitleMatcher:
+    """
+        Resolves many titles at once against a set of candidate titles (e.g. TMDB `title_EN` against an IMDb catalogue).
+
+        The candidates are normalized and indexed by (year, n-gram) once. `match` computes the similarity of every query
+        with all the candidates of the same year (year is the blocking key) in a single vectorised pass, and returns the
+        best candidate of each query with its score and the reason of acceptance/rejection:
+
+        - 'match_accepted': best candidate with similarity >= threshold
+        - 'low_similarity': best candidate with similarity < threshold
+        - 'no_candidate': no candidate of the same year shares any n-gram with the title
+    """
+
+    def __init__(self, candidates, title_column="title", year_column="year", id_column="id", year_tolerance=0):
+        candidates = candidates[[id_column, title_column, year_column]].rename(
+            columns={id_column: "candidate_id", title_column: "candidate_title", year_column: "year"})
+        candidates = candidates.reset_index(drop=True)
+        candidates["candidate"] = candidates.index
+        candidates["normalized"] = candidates["candidate_title"].map(normalize_title)
+
+        self.candidates = candidates
+        self.index = self._build_index(candidates, "candidate", year_tolerance)
+
+    @staticmethod
+    def _build_index(frame, key, year_tolerance=0):
+        ngrams = frame[[key, "year"]].copy()
+        ngrams["ngram"] = frame["normalized"].map(lambda title: list(title_ngrams(title)))
+        ngrams["num_ngrams"] = ngrams["ngram"].str.len()
+
+        if year_tolerance:
+            offsets = pd.DataFrame({"offset": range(-year_tolerance, year_tolerance + 1)})
+            ngrams = ngrams.merge(offsets, how="cross")
+            ngrams["year"] = ngrams["year"] + ngrams.pop("offset")
+
+        return ngrams.explode("ngram")
+
+    def match(self, queries, title_column="title", year_column="year", threshold=0.6):
+        """
+            Returns a DataFrame with the same index as `queries` and the columns 'candidate_id', 'candidate_title',
+            'score', 'accepted' and 'reason'.
+        """
+        original_index = queries.index
+        queries = pd.DataFrame({"title": queries[title_column].values, "year": queries[year_column].values})
+        queries["query"] = range(len(queries))
+        queries["normalized"] = queries["title"].map(normalize_title)
+
+        query_ngrams = self._build_index(queries, "query")
+        shared = query_ngrams.merge(self.index, on=["year", "ngram"], suffixes=("_query", "_candidate"))
+        scores = shared.groupby(["query", "candidate", "num_ngrams_query", "num_ngrams_candidate"]).size().reset_index(name="shared")
+        scores["score"] = 2 * scores["shared"] / (scores["num_ngrams_query"] + scores["num_ngrams_candidate"])
+
+        # Identical normalized titles are always a perfect match
+        scores = scores.merge(queries[["query", "normalized"]], on="query")
+        scores = scores.merge(self.candidates[["candidate", "candidate_id", "candidate_title", "normalized"]],
+                              on="candidate", suffixes=("", "_candidate"))
+        scores.loc[scores["normalized"] == scores["normalized_candidate"], "score"] = 1.0
+
+        best = scores.sort_values(["query", "score"], ascending=[True, False]).drop_duplicates("query")
+        result = queries[["query"]].merge(best[["query", "candidate_id", "candidate_title", "score"]], on="query", how="left")
+
+        result["score"] = result["score"].fillna(0.0)
+        result["accepted"] = result["score"] >= threshold
+        result["reason"] = "low_similarity"
+        result.loc[result["accepted"], "reason"] = "match_accepted"
+        result.loc[result["candidate_id"].isna(), "reason"] = "no_candidate"
+
+        result.index = original_index
+        return result.drop(columns="query")
@@ -1,71 +1,118 @@
+import argparse
+import sys
+import numpy as np
 import pandas as pd
 from pathlib import Path
-import ast
-
-def parse_list(string_list):
-    # This is necesary since TMDB API sends strings of lists
-    try:
-        return ast.literal_eval(string_list)
-    except:
-        return []
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.storage import read_layer, write_layer, iter_layer, LayerWriter, BATCH_SIZE
+from common.metrics import METRICS
+
+@METRICS.timed()
+def resolve_genres(genre_ids, list_of_genres):
+    """
+        Replaces each list of genre ids by the list of genre names, in the same order as in `list_of_genres`. All the
+        rows are resolved at once: the lists are exploded, joined with the id -> position lookup and aggregated back.
+    """
+    genre_position = pd.Series(range(len(list_of_genres)), index=list_of_genres['id'].values)
+    genre_position = genre_position[~genre_position.index.duplicated()]
+    
+    exploded = pd.Series(genre_ids.values).explode().dropna()
+    positions = pd.DataFrame({"row": exploded.index, "position": exploded.map(genre_position).values}).dropna()
+    positions = positions.drop_duplicates().sort_values(["row", "position"])
+    
+    # Rows are sorted, so the names of each row are a contiguous slice
+    rows = positions["row"].to_numpy()
+    names = list_of_genres['name'].to_numpy()[positions["position"].to_numpy(dtype=int)]
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]) if len(rows) else np.array([], dtype=int)
+    
+    genres = [[] for _ in range(len(genre_ids))]
+    for row, row_names in zip(rows[starts], np.split(names, starts[1:])):
+        genres[row] = row_names.tolist()
     
-def get_genre(genre_ids, list_of_genres):
-    return list(list_of_genres[list_of_genres['id'].isin(genre_ids)]['name'])
+    return pd.Series(genres, index=genre_ids.index)
+
+
+# Columns of the TMDB files used in the silver layer
+MOVIES_COLUMNS = ["type", "id", "title_ES", "overview", "release_date", "genre_ids", "vote_average", "vote_count"]
+SHOWS_COLUMNS = ["type", "id", "title_ES", "overview", "first_air_date", "genre_ids", "vote_average", "vote_count"]
+
+
+def unify_titles(TMDB_titles, genres, IMBD_ratings, date_column):
+    """
+        Movies or shows (any subset of them, e.g. a batch) with their genre names and IMDb ratings, with the columns of
+        the silver base dataset.
+    """
+    # Add found IMDB ratings to TMDB data
+    final_result = TMDB_titles.merge(IMBD_ratings, how='left', left_on='id', right_on='tmdb_id')
+
+    # Create column 'genre' with real names instead of IDs
+    final_result['genre'] = resolve_genres(final_result['genre_ids'], genres)
 
+    # Select valuable columns
+    final_result = final_result[["type", "id", "title_ES", "overview", date_column, "genre", "vote_average", "vote_count", "imdb_rating", "imdb_votes"]]
+    return final_result.rename(columns={"title_ES":"title", date_column:"release_date", "vote_average":"tmdb_rating", "vote_count":"tmdb_count", "imdb_votes":"imdb_count"})
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-BRONZE_DIR = BASE_DIR / "data" / "1_bronze"
 
-# TMDB files
-movies_path = f"{BRONZE_DIR}\\TMDB_top_rated_movies.csv"
-shows_path = f"{BRONZE_DIR}\\TMDB_top_rated_shows.csv"
+@METRICS.timed()
+def unify_data(TMDB_movies, TMDB_shows, movies_genres, shows_genres, IMBD_rating_movies, IMBD_rating_shows):
+    """
+        Unifies the TMDB movies and shows with their genre names and IMDb ratings in a single dataset (silver base).
+    """
+    movies_final_result = unify_titles(TMDB_movies, movies_genres, IMBD_rating_movies, "release_date")
+    shows_final_result = unify_titles(TMDB_shows, shows_genres, IMBD_rating_shows, "first_air_date")
 
-TMDB_movies = pd.read_csv(movies_path, sep=';', index_col=0)
-TMDB_shows = pd.read_csv(shows_path, sep=';', index_col=0)
+    # Merge shows and movies (can be distiguished for 'type' column)
+    all_data = pd.concat([movies_final_result, shows_final_result], ignore_index=True)
+    METRICS.rows("unify_data", len(TMDB_movies) + len(TMDB_shows), len(all_data))
+    return all_data
 
-# TMDB movie-shows genres
-movies_genres_path = f"{BRONZE_DIR}\\TMDB_movies_genres.csv"
-shows_genres_path = f"{BRONZE_DIR}\\TMDB_shows_genres.csv"
 
-movies_genres = pd.read_csv(movies_genres_path, sep=';', index_col=0)
-shows_genres = pd.read_csv(shows_genres_path, sep=';', index_col=0)
+@METRICS.timed()
+def unify_data_in_batches(batch_size=BATCH_SIZE):
+    """
+        Same result as `unify_data`, but the TMDB files are read and the silver base file is written in batches of
+        `batch_size` titles, so the memory used doesn't grow with the size of the catalogue. Only genres and IMDb
+        ratings (small tables keyed by id) are kept in memory.
+    """
+    with LayerWriter("silver", "base_movies_and_shows") as writer:
+        for name, columns, date_column in [("movies", MOVIES_COLUMNS, "release_date"), ("shows", SHOWS_COLUMNS, "first_air_date")]:
+            genres = read_layer("bronze", f"TMDB_{name}_genres")
+            IMBD_ratings = read_layer("bronze", f"OMDB_imdb_rating_{name}")
 
-# IMDB files
-imbd_rating_movies_path = f"{BRONZE_DIR}\\OMDB_imdb_rating_movies.csv"
-imbd_rating_shows_path = f"{BRONZE_DIR}\\OMDB_imdb_rating_shows.csv"
+            for TMDB_titles in iter_layer("bronze", f"TMDB_top_rated_{name}", columns=columns, batch_size=batch_size):
+                final_result = unify_titles(TMDB_titles, genres, IMBD_ratings, date_column)
+                writer.write(final_result)
+                METRICS.rows("unify_data", len(TMDB_titles), len(final_result))
 
-IMBD_rating_movies = pd.read_csv(imbd_rating_movies_path, sep=';', index_col=0)
-IMBD_rating_shows = pd.read_csv(imbd_rating_shows_path, sep=';', index_col=0)
+    return writer.path
 
-# Add found IMDB ratings to TMDB data
-movies_final_result = TMDB_movies.merge(IMBD_rating_movies, how='left', left_on='id', right_on='tmdb_id')
-shows_final_result = TMDB_shows.merge(IMBD_rating_shows, how='left', left_on='id', right_on='tmdb_id')
 
-# Cast string-lists to lists (['[18, 80]'] -> [18, 80])
-movies_final_result['genre_ids'] = movies_final_result['genre_ids'].apply(parse_list)
-shows_final_result['genre_ids'] = shows_final_result['genre_ids'].apply(parse_list)
+if __name__ == '__main__':
 
-# Create column 'genre' with real names instead of IDs
-movies_final_result['genre'] = movies_final_result['genre_ids'].apply(lambda x: get_genre(x, movies_genres))
-shows_final_result['genre'] = shows_final_result['genre_ids'].apply(lambda x: get_genre(x, shows_genres))
+    parser = argparse.ArgumentParser(description="Unification of TMDB and OMDB bronze files in the silver base file")
+    parser.add_argument("--batch-size", type=int, help="Process the titles in batches of this size (memory-bounded)")
+    args = parser.parse_args()
 
-# Unify movies and shows in a single dataset
-## Select valuable columns from movies
-movies_final_result = movies_final_result[["type", "id", "title_ES", "overview", "release_date", "genre", "vote_average", "vote_count", "imdb_rating", "imdb_votes"]]
-movies_final_result.rename(columns={"title_ES":"title", "vote_average":"tmdb_rating", "vote_count":"tmdb_count", "imdb_votes":"imdb_count"}, inplace=True)
+    if args.batch_size:
+        unify_data_in_batches(args.batch_size)
+    else:
+        # TMDB files (only the columns needed)
+        TMDB_movies = read_layer("bronze", "TMDB_top_rated_movies", columns=MOVIES_COLUMNS)
+        TMDB_shows = read_layer("bronze", "TMDB_top_rated_shows", columns=SHOWS_COLUMNS)
 
-## Select valuable columns from shows
-shows_final_result = shows_final_result[["type", "id", "title_ES", "overview", "first_air_date", "genre", "vote_average", "vote_count", "imdb_rating", "imdb_votes"]]
-shows_final_result.rename(columns={"title_ES":"title", "first_air_date":"release_date", "vote_average":"tmdb_rating", "vote_count":"tmdb_count", "imdb_votes":"imdb_count"}, inplace=True)
+        # TMDB movie-shows genres
+        movies_genres = read_layer("bronze", "TMDB_movies_genres")
+        shows_genres = read_layer("bronze", "TMDB_shows_genres")
 
-# Merge shows and movies (can be distiguished for 'type' column)
-all_data = pd.concat([movies_final_result, shows_final_result], ignore_index=True)
+        # IMDB files
+        IMBD_rating_movies = read_layer("bronze", "OMDB_imdb_rating_movies")
+        IMBD_rating_shows = read_layer("bronze", "OMDB_imdb_rating_shows")
 
-# Save files
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-SILVER_DIR = BASE_DIR / "data" / "2_silver"
+        all_data = unify_data(TMDB_movies, TMDB_shows, movies_genres, shows_genres, IMBD_rating_movies, IMBD_rating_shows)
 
-# TMDB files
-all_data_path = f"{SILVER_DIR}\\base_movies_and_shows.csv"
+        # Save files
+        write_layer(all_data, "silver", "base_movies_and_shows")
 
-all_data.to_csv(all_data_path, sep=';')
\ No newline at end of file
+    METRICS.write_report("unify_data")
@@ -1,62 +1,93 @@
+import argparse
+import sys
 import pandas as pd
 from pathlib import Path
-import datetime
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.storage import read_layer, write_layer, iter_layer, LayerWriter, BATCH_SIZE
+from common.metrics import METRICS
 
 def is_popular(tmdb_count, imdb_votes):
-    return (tmdb_count > 10000) or (imdb_votes > 10000)
+    # Works on single values and on whole columns
+    return (tmdb_count > 10000) | (imdb_votes > 10000)
+
+def to_spanish_date(dates):
+    # String dates (YYYY-MM-dd) to Spanish format (dd/MM/YYYY)
+    return dates.str.replace(r"^(\d{4})-(\d{2})-(\d{2})$", r"\3/\2/\1", regex=True)
+
+@METRICS.timed()
+def enrich_data(all_data, movies_watch_providers, shows_watch_providers):
+    """
+        Cleans the silver base dataset (nulls, Spanish dates, popularity) and adds the watch providers of each title.
+    """
+    all_data = all_data.copy()
+    rows_in = len(all_data)
+
+    # Replace nulls in votes and ratings
+    all_data['imdb_count'] = all_data['imdb_count'].fillna(-1)
+    all_data['imdb_rating'] = all_data['imdb_rating'].fillna(-1)
+    all_data['tmdb_rating'] = all_data['tmdb_rating'].fillna(-1)
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-SILVER_DIR = BASE_DIR / "data" / "2_silver"
+    # Replace nulls and empty strings (unknown dates in TMDB) in release_date
+    all_data['release_date'] = all_data['release_date'].mask(all_data['release_date'] == "").fillna('1111-11-11')
 
-# TMDB files
-movies_path = f"{SILVER_DIR}\\base_movies_and_shows.csv"
+    # Transform String dates (YYYY-MM-dd) to Spanish format (dd/MM/YYYY)
+    all_data['release_date'] = to_spanish_date(all_data['release_date'])
 
-all_data = pd.read_csv(movies_path, sep=';', index_col=0)
+    # Create new column 'is_popular' based on the number of votes
+    all_data['is_popular'] = is_popular(all_data['tmdb_count'], all_data['imdb_count'])
 
-# Cast imdb_votes to integer from string with commas
-all_data['imdb_count'] = (all_data['imdb_count'].fillna(-1).astype(str).str.replace(",", "").astype(int))
+    # For simplicity, pick only records with 2 ratings available
+    all_data = all_data[(all_data['imdb_rating'] != -1) & (all_data['tmdb_rating'] != -1)]
 
-# Replace nulls in ratings
-all_data['imdb_rating'] = all_data['imdb_rating'].fillna(-1)
-all_data['tmdb_rating'] = all_data['tmdb_rating'].fillna(-1)
+    # Merge movies/shows with watch providers 
+    movies = all_data[all_data['type'] == 'movie'].copy()
+    shows = all_data[all_data['type'] == 'show'].copy()
 
-# Replace nulls in release_date
-all_data['release_date'] = all_data['release_date'].fillna('1111-11-11')
+    movies = movies.merge(movies_watch_providers, on=["id"], how="left")
+    shows = shows.merge(shows_watch_providers, on=["id"], how="left")
 
-# Convert String dates (YYYY-MM-dd) in Datetime and transform to Spanish format (dd/MM/YYYY)
-all_data['release_date'] = all_data['release_date'].apply(lambda x: datetime.datetime.strptime(x, '%Y-%m-%d').strftime('%d/%m/%Y'))
+    enriched_data = pd.concat([movies, shows], ignore_index=True)
+    METRICS.rows("enrich_data", rows_in, len(enriched_data))
+    return enriched_data
 
-# Create new column 'is_popular' based on the number of votes
-all_data['is_popular'] = all_data.apply(lambda row: is_popular(row['tmdb_count'], row['imdb_count']), axis=1)
 
-# For simplicity, pick only records with 2 ratings available
-all_data = all_data[(all_data['imdb_rating'] != -1) & (all_data['tmdb_rating'] != -1)]
+@METRICS.timed()
+def enrich_data_in_batches(batch_size=BATCH_SIZE):
+    """
+        Same result as `enrich_data`, but the silver base file is read and the enriched file is written in batches of
+        `batch_size` titles, so the memory used doesn't grow with the size of the catalogue. Only the watch providers
+        (keyed by id) are kept in memory.
+    """
+    movies_watch_providers = read_layer("bronze", "TMDB_watch_providers_movies")
+    shows_watch_providers = read_layer("bronze", "TMDB_watch_providers_shows")
 
-# Merge movies/shows with watch providers 
-movies = all_data[all_data['type'] == 'movie'].copy()
-shows = all_data[all_data['type'] == 'show'].copy()
+    with LayerWriter("silver", "enriched_result_movies_shows") as writer:
+        for all_data in iter_layer("silver", "base_movies_and_shows", batch_size=batch_size):
+            writer.write(enrich_data(all_data, movies_watch_providers, shows_watch_providers))
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-BRONZE_DIR = BASE_DIR / "data" / "1_bronze"
-movies_watch_providers_path = f"{BRONZE_DIR}\\TMDB_watch_providers_movies.csv"
-shows_watch_providers_path = f"{BRONZE_DIR}\\TMDB_watch_providers_shows.csv"
+    return writer.path
 
-movies_watch_providers = pd.read_csv(movies_watch_providers_path, sep=';', index_col=0)
-shows_watch_providers = pd.read_csv(shows_watch_providers_path, sep=';', index_col=0)
 
-# Modify list of values in 'genre' and 'watch_providers' to be more readable
-movies["genre"] = movies["genre"].apply(lambda row: row.replace("'", "").replace("[", "").replace("]", ""))
-movies_watch_providers["watch_providers"] = movies_watch_providers["watch_providers"].apply(lambda row: row.replace("'", "").replace("[", "").replace("]", ""))
+if __name__ == '__main__':
 
-shows["genre"] = shows["genre"].apply(lambda row: row.replace("'", "").replace("[", "").replace("]", ""))
-shows_watch_providers["watch_providers"] = shows_watch_providers["watch_providers"].apply(lambda row: row.replace("'", "").replace("[", "").replace("]", ""))
+    parser = argparse.ArgumentParser(description="Enrichment of the silver base file (dates, popularity, watch providers)")
+    parser.add_argument("--batch-size", type=int, help="Process the titles in batches of this size (memory-bounded)")
+    args = parser.parse_args()
 
+    if args.batch_size:
+        enrich_data_in_batches(args.batch_size)
+    else:
+        # Silver base file
+        all_data = read_layer("silver", "base_movies_and_shows")
 
-movies = movies.merge(movies_watch_providers, on=["id"], how="left")
-shows = shows.merge(shows_watch_providers, on=["id"], how="left")
+        movies_watch_providers = read_layer("bronze", "TMDB_watch_providers_movies")
+        shows_watch_providers = read_layer("bronze", "TMDB_watch_providers_shows")
 
-enriched_data = pd.concat([movies, shows], ignore_index=True)
+        enriched_data = enrich_data(all_data, movies_watch_providers, shows_watch_providers)
 
-# Save file
-enriched_data.to_csv(f"{SILVER_DIR}\\enriched_result_movies_shows.csv", sep=';')
+        # Save file ('genre' and 'watch_providers' are kept as lists, they are made readable in the gold layer)
+        write_layer(enriched_data, "silver", "enriched_result_movies_shows")
 
+    METRICS.write_report("data_enrichment")
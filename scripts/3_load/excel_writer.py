@@ -0,0 +1,24 @@
+"""
+    Excel writer of the gold layer. It is pure Python (it holds the GIL the whole time), so save_data_formats.py runs it
+    in a separate process while the other formats are written: it lives in its own module so the process can import it.
+"""
+
+
+def write_excel(data, path):
+    """
+        If xlsxwriter is installed, the rows are streamed to the file in constant memory mode (each row is flushed once
+        written), which is also much faster than openpyxl. Otherwise pandas default writer is used.
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        data.to_excel(path, index=False)
+        return
+
+    values = data.astype(object).where(data.notna(), None)
+    with xlsxwriter.Workbook(path, {"constant_memory": True}) as workbook:
+        worksheet = workbook.add_worksheet("Sheet1")
+        header_format = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+        worksheet.write_row(0, 0, data.columns, header_format)
+        for row_number, row in enumerate(values.itertuples(index=False, name=None), start=1):
+            worksheet.write_row(row_number, 0, row)
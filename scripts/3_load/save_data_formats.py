@@ -1,24 +1,176 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-SILVER_DIR = BASE_DIR / "data" / "2_silver"
-GOLD_DIR = BASE_DIR / "data" / "3_gold"
+sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-enriched_data_path = f"{SILVER_DIR}\\enriched_result_movies_shows.csv"
+from common.storage import read_layer, to_frame, LAYERS
+from common.metrics import METRICS
+from excel_writer import write_excel
+from sqlite_store import load_sqlite
 
-enriched_data = pd.read_csv(enriched_data_path, sep=';', index_col=0)
+FINAL_DATA_NAME = "movies_and_shows_result"
+FORMATS = ["csv", "parquet", "json", "xlsx", "sqlite"]
 
-final_data_name = f"{GOLD_DIR}\\movies_and_shows_result"
+# Fingerprint of the data used to write each format, to skip the formats that are already up to date
+MANIFEST_PATH = LAYERS["gold"] / ".export_manifest.json"
 
-# Save as CSV
-enriched_data.to_csv(f'{final_data_name}.csv', sep=';', index=False)
+# The formats are written at the same time: the writers that release the GIL (pyarrow, sqlite3) in threads, the pure
+# Python ones in a separate process
+PROCESS_FORMATS = {"xlsx"}
 
-# Save as parquet
-enriched_data.to_parquet(f'{final_data_name}.parquet', index=False)
+def readable_list(lists):
+    # Lists to comma separated values (['A', 'B'] -> A, B)
+    return lists.map(", ".join, na_action="ignore")
 
-# Save as json
-enriched_data.to_json(f'{final_data_name}.json', orient='records', lines=True)
+def write_csv(data, path):
+    # pyarrow writes the file without the GIL (pandas doesn't)
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    pa_csv.write_csv(table, path, pa_csv.WriteOptions(delimiter=';', quoting_style="needed"))
 
-# Save as xslx (excel)
-enriched_data.to_excel(f'{final_data_name}.xlsx', index=False)
\ No newline at end of file
+def write_parquet(data, path):
+    data.to_parquet(path, index=False)
+
+def write_json(data, path):
+    data.to_json(path, orient='records', lines=True)
+
+WRITERS = {
+    "csv": write_csv,
+    "parquet": write_parquet,
+    "json": write_json,
+    "xlsx": write_excel
+}
+
+def fingerprint(data):
+    return hashlib.sha256(pd.util.hash_pandas_object(data, index=False).values.tobytes()).hexdigest()
+
+def load_manifest():
+    if MANIFEST_PATH.exists():
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    return {}
+
+def save_manifest(manifest):
+    # Temporary file renamed at the end, the manifest is never left half-written
+    temporary_path = MANIFEST_PATH.with_name(f"{MANIFEST_PATH.name}.tmp")
+    temporary_path.write_text(json.dumps(manifest, indent=4), encoding="utf-8")
+    os.replace(temporary_path, MANIFEST_PATH)
+
+def write_atomic(data, file_format, final_path, processes=None):
+    """
+        Writes to a temporary file next to the final one and renames it at the end, so a failed or interrupted export
+        never leaves a half-written file in the gold layer. If `processes` (executor) is given the writer runs there.
+    """
+    start = time.perf_counter()
+    temporary_path = final_path.with_name(f"{final_path.stem}.tmp{final_path.suffix}")
+    try:
+        if processes is not None:
+            processes.submit(WRITERS[file_format], data, temporary_path).result()
+        else:
+            WRITERS[file_format](data, temporary_path)
+        os.replace(temporary_path, final_path)
+    finally:
+        if temporary_path.exists():
+            temporary_path.unlink()
+    
+    seconds = time.perf_counter() - start
+    METRICS.observe(f"write_{file_format}", seconds)
+    return seconds
+
+def load_database(data, final_path):
+    """
+        The database is updated in place (only the titles that changed, in one transaction) instead of rewritten, so it
+        doesn't go through write_atomic. `data` keeps the lists of genres and watch providers for the bridge tables.
+    """
+    start = time.perf_counter()
+    counts = load_sqlite(data, final_path)
+    for name, value in counts.items():
+        METRICS.count(f"sqlite.{name}", value)
+    
+    seconds = time.perf_counter() - start
+    METRICS.observe("write_sqlite", seconds)
+    return seconds
+
+@METRICS.timed()
+def export_gold(data, formats=FORMATS, force=False):
+    """
+        Saves the enriched data (DataFrame or Arrow table) in the gold layer in the selected formats, all of them at
+        the same time (see PROCESS_FORMATS), so the export takes about the time of the slowest format.
+        
+        Formats whose file was written from the same data (same fingerprint) are skipped unless `force` is True.
+        Returns the time in seconds spent writing each format (None if skipped).
+    """
+    if isinstance(data, pa.Table):
+        data = to_frame(data)
+    
+    # Modify list of values in 'genre' and 'watch_providers' to be more readable (the database keeps the lists)
+    list_data = data
+    data = data.copy()
+    data["genre"] = readable_list(data["genre"])
+    data["watch_providers"] = readable_list(data["watch_providers"])
+    
+    data_fingerprint = fingerprint(data)
+    manifest = load_manifest()
+    paths = {file_format: LAYERS["gold"] / f"{FINAL_DATA_NAME}.{file_format}" for file_format in formats}
+    
+    pending = [file_format for file_format in formats 
+               if force or manifest.get(file_format) != data_fingerprint or not paths[file_format].exists()]
+    timings = {file_format: None for file_format in formats}
+    
+    LAYERS["gold"].mkdir(parents=True, exist_ok=True)
+    processes = None
+    if PROCESS_FORMATS.intersection(pending):
+        # 'spawn' starts a clean interpreter, forking a process with running threads is not safe
+        processes = ProcessPoolExecutor(len(PROCESS_FORMATS.intersection(pending)), mp_context=multiprocessing.get_context("spawn"))
+    
+    errors = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as executor:
+            futures = {}
+            for file_format in pending:
+                if file_format == "sqlite":
+                    future = executor.submit(load_database, list_data, paths[file_format])
+                else:
+                    future = executor.submit(write_atomic, data, file_format, paths[file_format],
+                                             processes if file_format in PROCESS_FORMATS else None)
+                futures[future] = file_format
+            
+            for future in as_completed(futures):
+                file_format = futures[future]
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    continue
+                timings[file_format] = future.result()
+                # Saved after every format, so the formats written are skipped if another one fails
+                manifest[file_format] = data_fingerprint
+                save_manifest(manifest)
+    finally:
+        if processes is not None:
+            processes.shutdown()
+    
+    if errors:
+        raise errors[0]
+    return timings
+
+if __name__ == '__main__':
+    
+    parser = argparse.ArgumentParser(description="Export of the enriched data to the gold layer")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS, help="Formats to write (all by default)")
+    parser.add_argument("--force", action="store_true", help="Write the formats even if they are up to date")
+    args = parser.parse_args()
+    
+    enriched_data = read_layer("silver", "enriched_result_movies_shows")
+    
+    for file_format, seconds in export_gold(enriched_data, args.formats, args.force).items():
+        status = "up to date, skipped" if seconds is None else f"saved in {seconds:.2f} s"
+        print(f"Gold - {FINAL_DATA_NAME}.{file_format}: {status}")
+    
+    print(f"Gold - Metrics saved on: {METRICS.write_report('save_data_formats')}")
@@ -0,0 +1,174 @@
+"""
+    Loads the gold dataset into a local SQLite database, to query it with SQL without reading the exported files:
+
+    - titles: one row per title, primary key (type, id), indexes on the columns used to filter (ratings, release
+      date as YYYY-MM-dd, popularity)
+    - genres / providers: the names, with an integer id
+    - title_genre / title_provider: bridge tables (type, id, genre_id/provider_id) instead of comma separated values
+
+    Every title has a hash of its values, so later loads only write the titles that are new or changed and delete the
+    titles that are not in the dataset anymore (with their genres and providers). Everything happens in one transaction.
+
+        SELECT t.title, t.imdb_rating FROM titles t
+        JOIN title_genre tg USING (type, id) JOIN genres g USING (genre_id)
+        WHERE g.name = 'Drama' AND t.imdb_rating >= 8 ORDER BY t.imdb_rating DESC LIMIT 10
+"""
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.storage import LAYERS
+
+DATABASE_PATH = LAYERS["gold"] / "movies_and_shows_result.sqlite"
+
+TITLE_COLUMNS = ["type", "id", "title", "overview", "release_date", "tmdb_rating", "tmdb_count", "imdb_rating",
+                 "imdb_count", "is_popular", "row_hash"]
+BRIDGES = {
+    # column of the dataset: (names table, id column, bridge table)
+    "genre": ("genres", "genre_id", "title_genre"),
+    "watch_providers": ("providers", "provider_id", "title_provider")
+}
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS titles (
+        type TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        title TEXT,
+        overview TEXT,
+        release_date TEXT,
+        tmdb_rating REAL,
+        tmdb_count INTEGER,
+        imdb_rating REAL,
+        imdb_count INTEGER,
+        is_popular INTEGER,
+        row_hash INTEGER NOT NULL,
+        PRIMARY KEY (type, id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS titles_imdb_rating ON titles (imdb_rating);
+    CREATE INDEX IF NOT EXISTS titles_tmdb_rating ON titles (tmdb_rating);
+    CREATE INDEX IF NOT EXISTS titles_release_date ON titles (release_date);
+    CREATE INDEX IF NOT EXISTS titles_is_popular ON titles (is_popular);
+
+    CREATE TABLE IF NOT EXISTS genres (genre_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+    CREATE TABLE IF NOT EXISTS providers (provider_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+
+    CREATE TABLE IF NOT EXISTS title_genre (
+        type TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        genre_id INTEGER NOT NULL REFERENCES genres (genre_id),
+        PRIMARY KEY (type, id, genre_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS title_genre_genre ON title_genre (genre_id);
+
+    CREATE TABLE IF NOT EXISTS title_provider (
+        type TEXT NOT NULL,
+        id INTEGER NOT NULL,
+        provider_id INTEGER NOT NULL REFERENCES providers (provider_id),
+        PRIMARY KEY (type, id, provider_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS title_provider_provider ON title_provider (provider_id);
+"""
+
+UPSERT = f"""
+    INSERT INTO titles ({", ".join(TITLE_COLUMNS)}) VALUES ({", ".join("?" * len(TITLE_COLUMNS))})
+    ON CONFLICT (type, id) DO UPDATE SET
+        {", ".join(f"{column} = excluded.{column}" for column in TITLE_COLUMNS[2:])}
+    WHERE titles.row_hash != excluded.row_hash
+"""
+
+
+def names_of(value):
+    # List of genres/watch providers of a title (missing values are empty lists)
+    if value is None or isinstance(value, float):
+        return []
+    return [name for name in value if name]
+
+
+def iso_date(dates):
+    # 'dd/MM/YYYY' -> 'YYYY-MM-dd', so the dates can be compared and sorted in SQL (missing '11/11/1111' -> NULL)
+    parts = dates.where(dates != "11/11/1111").str.split("/", expand=True)
+    if parts.shape[1] < 3:
+        return pd.Series(None, index=dates.index, dtype=object)
+    return (parts[2] + "-" + parts[1] + "-" + parts[0]).astype(object).where(parts[0].notna(), None)
+
+
+def title_rows(data):
+    """
+        Rows of the 'titles' table: the values of each title and a hash of all of them (genres and providers included).
+    """
+    titles = data.drop(columns=list(BRIDGES))
+    titles["type"] = titles["type"].astype(str)
+    titles["release_date"] = iso_date(titles["release_date"].astype(object))
+    lists = data[list(BRIDGES)].map(lambda value: "|".join(names_of(value)))
+    hashes = pd.util.hash_pandas_object(pd.concat([titles, lists], axis=1), index=False).to_numpy()
+    titles["row_hash"] = hashes.view(np.int64) # SQLite integers are signed
+
+    titles = titles[TITLE_COLUMNS].astype(object).where(titles[TITLE_COLUMNS].notna(), None)
+    titles["is_popular"] = titles["is_popular"].map(lambda value: None if value is None else int(value))
+    return titles
+
+
+def name_ids(connection, table, id_column, names):
+    # Ids of the names, the new ones are inserted
+    connection.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(name,) for name in sorted(names)])
+    return dict(connection.execute(f"SELECT name, {id_column} FROM {table}").fetchall())
+
+
+def load_sqlite(data, path=DATABASE_PATH):
+    """
+        Loads the enriched data (DataFrame with lists in 'genre' and 'watch_providers') into the database in `path`,
+        writing only the titles that changed since the last load. Returns the number of titles inserted, updated,
+        deleted and unchanged.
+
+        A title repeated in the dataset (same type and id) is saved once, with the values of its last row.
+    """
+    data = data.drop_duplicates(subset=["type", "id"], keep="last")
+    titles = title_rows(data)
+    keys = list(zip(titles["type"], titles["id"]))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(SCHEMA)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+
+        stored = {(type, id): row_hash for type, id, row_hash in connection.execute("SELECT type, id, row_hash FROM titles")}
+        changed = np.array([stored.get(key) != row_hash for key, row_hash in zip(keys, titles["row_hash"])], dtype=bool)
+        removed = set(stored) - set(keys)
+        inserted = sum(1 for key in keys if key not in stored)
+        counts = {
+            "inserted": inserted,
+            "updated": int(changed.sum()) - inserted,
+            "deleted": len(removed),
+            "unchanged": int((~changed).sum())
+        }
+
+        with connection:
+            # Keys whose bridge rows are rewritten (changed titles) or deleted (removed titles)
+            connection.execute("CREATE TEMP TABLE IF NOT EXISTS stale_keys (type TEXT, id INTEGER, PRIMARY KEY (type, id))")
+            connection.execute("DELETE FROM stale_keys")
+            connection.executemany("INSERT INTO stale_keys VALUES (?, ?)",
+                                   [key for key, is_changed in zip(keys, changed) if is_changed and key in stored] + list(removed))
+            for _, _, bridge in BRIDGES.values():
+                connection.execute(f"DELETE FROM {bridge} WHERE (type, id) IN (SELECT type, id FROM stale_keys)")
+            connection.executemany("DELETE FROM titles WHERE type = ? AND id = ?", list(removed))
+
+            connection.executemany(UPSERT, titles[changed].itertuples(index=False, name=None))
+
+            changed_data = data[changed]
+            for column, (table, id_column, bridge) in BRIDGES.items():
+                lists = changed_data[column].map(names_of)
+                ids = name_ids(connection, table, id_column, {name for names in lists for name in names})
+                connection.executemany(
+                    f"INSERT OR IGNORE INTO {bridge} (type, id, {id_column}) VALUES (?, ?, ?)",
+                    ((str(type), int(id), ids[name]) for type, id, names in zip(changed_data["type"], changed_data["id"], lists) for name in names))
+    finally:
+        connection.close()
+    return counts
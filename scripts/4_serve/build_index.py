@@ -0,0 +1,166 @@
+"""
+    Builds the indexes used to query the gold dataset without loading it (see movie_index.py):
+
+    - titles.arrow: the gold table in Arrow IPC format, memory-mapped to read only the rows of the results
+    - columns: numeric columns as .npy arrays (type, ratings, counts, popularity, release date as YYYYMMDD)
+    - sorted orders: positions of the rows sorted by each rankable column (range filters and top-k)
+    - inverted indexes: for every genre and watch provider, the sorted positions of its titles (CSR: offsets + rows)
+    - title lookup: lower case titles sorted alphabetically with their positions, and (type, id) sorted
+
+    Every build is written to a new folder (index/v<timestamp>) and published at the end by replacing manifest.json,
+    which points to it. The files of a version are never modified, so a running server that has them memory-mapped
+    keeps reading a consistent index until it opens the new version. The older versions are removed (the previous one
+    is kept, it may still be in use).
+
+    Run from the root of the project (after the gold export):
+
+        python scripts/4_serve/build_index.py
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.storage import LAYERS
+from common.metrics import METRICS
+
+GOLD_PATH = LAYERS["gold"] / "movies_and_shows_result.parquet"
+INDEX_DIR = LAYERS["gold"] / "index"
+
+TYPES = ["movie", "show"]
+RANKABLE = ["imdb_rating", "tmdb_rating", "imdb_count", "tmdb_count", "release_date"]
+LISTS = ["genre", "watch_providers"]
+
+
+def gold_version(gold_path):
+    stat = gold_path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def date_number(dates):
+    # 'dd/MM/YYYY' -> YYYYMMDD (missing dates were saved as '11/11/1111', empty ones are taken as missing too)
+    parts = dates.mask(dates == "").fillna("11/11/1111").str.split("/", expand=True).astype(int)
+    return (parts[2] * 10000 + parts[1] * 100 + parts[0]).to_numpy(dtype=np.int32)
+
+
+def inverted_index(values):
+    """
+        CSR inverted index of a column of comma separated values: the names, the offsets of each name and the sorted
+        positions of the rows that contain it (rows of names[i] = rows[offsets[i]:offsets[i + 1]]).
+    """
+    postings = {}
+    for position, value in enumerate(values):
+        if not isinstance(value, str): # Missing values
+            continue
+        for name in value.split(","):
+            name = name.strip()
+            if name:
+                postings.setdefault(name, []).append(position)
+
+    names = sorted(postings)
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[name]) for name in names])
+    rows = np.array([position for name in names for position in postings[name]], dtype=np.int64)
+    return names, offsets, rows
+
+
+@METRICS.timed()
+def build_index(gold_path=GOLD_PATH, index_dir=INDEX_DIR):
+    """
+        Builds all the index files in a new version folder of `index_dir` from the gold Parquet file and publishes it.
+        Returns the number of titles indexed.
+    """
+    table = pq.read_table(gold_path)
+    data = table.to_pandas()
+    version = f"v{time.time_ns()}"
+    previous = read_manifest(index_dir)
+    version_dir = index_dir / version
+    version_dir.mkdir(parents=True)
+
+    # Rows of the gold table, read with memory mapping by the queries
+    with pa.OSFile(str(version_dir / "titles.arrow"), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+    columns = {
+        "type": data["type"].map(TYPES.index).to_numpy(dtype=np.int8),
+        "id": data["id"].to_numpy(dtype=np.int64),
+        "imdb_rating": data["imdb_rating"].to_numpy(dtype=np.float64),
+        "tmdb_rating": data["tmdb_rating"].to_numpy(dtype=np.float64),
+        "imdb_count": data["imdb_count"].to_numpy(dtype=np.int64),
+        "tmdb_count": data["tmdb_count"].to_numpy(dtype=np.int64),
+        "is_popular": data["is_popular"].to_numpy(dtype=bool),
+        "release_date": date_number(data["release_date"])
+    }
+    for name, values in columns.items():
+        np.save(version_dir / f"{name}.npy", values)
+
+    # Ascending orders (the positions of the top-k are read from the end)
+    for name in RANKABLE:
+        order = np.argsort(columns[name], kind="stable")
+        np.save(version_dir / f"order_{name}.npy", order)
+        np.save(version_dir / f"sorted_{name}.npy", columns[name][order])
+
+    names = {}
+    for column in LISTS:
+        names[column], offsets, rows = inverted_index(data[column].tolist())
+        np.save(version_dir / f"{column}_offsets.npy", offsets)
+        np.save(version_dir / f"{column}_rows.npy", rows)
+
+    # Title lookup: exact or prefix search with binary search over the sorted titles
+    titles = np.asarray(data["title"].fillna("").str.lower(), dtype=str)
+    title_order = np.argsort(titles, kind="stable")
+    np.save(version_dir / "sorted_title.npy", titles[title_order])
+    np.save(version_dir / "order_title.npy", title_order)
+
+    # (type, id) lookup
+    keys = columns["type"].astype(np.int64) * 10 ** 12 + columns["id"]
+    key_order = np.argsort(keys, kind="stable")
+    np.save(version_dir / "sorted_key.npy", keys[key_order])
+    np.save(version_dir / "order_key.npy", key_order)
+
+    # Publish the new version: the manifest is replaced in a single step
+    manifest = {"version": version, "gold": gold_version(gold_path), "rows": len(data), "names": names}
+    temporary_path = index_dir / "manifest.json.tmp"
+    temporary_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=4), encoding="utf-8")
+    os.replace(temporary_path, index_dir / "manifest.json")
+
+    remove_old_versions(index_dir, keep={version, (previous or {}).get("version")})
+    return len(data)
+
+
+def read_manifest(index_dir=INDEX_DIR):
+    # Manifest of the published version (None if there is none)
+    manifest_path = index_dir / "manifest.json"
+    if not manifest_path.exists():
+        return None
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+
+def remove_old_versions(index_dir, keep):
+    for path in index_dir.iterdir():
+        if path.is_dir() and path.name.startswith("v") and path.name not in keep:
+            shutil.rmtree(path, ignore_errors=True) # Memory-mapped files can't be removed on Windows, next time
+        elif path.suffix in (".npy", ".arrow"):
+            path.unlink() # Files of the indexes built before the versions
+
+
+def is_stale(gold_path=GOLD_PATH, index_dir=INDEX_DIR):
+    # The index is rebuilt when the gold file changed since it was built
+    manifest = read_manifest(index_dir)
+    return manifest is None or "version" not in manifest or manifest["gold"] != gold_version(gold_path)
+
+
+if __name__ == '__main__':
+
+    rows = build_index()
+    print(f"Serve - Index of {rows} titles saved on: {INDEX_DIR / read_manifest()['version']}")
@@ -0,0 +1,147 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from common.metrics import METRICS
+from build_index import GOLD_PATH, INDEX_DIR, TYPES, RANKABLE, LISTS, build_index, is_stale, read_manifest
+
+
+class MovieIndex:
+    """
+        Queries over the gold dataset using the indexes of build_index.py. All the files are memory-mapped, so opening
+        the index is immediate and only the pages touched by a query are read from disk.
+
+        An instance reads the version published when it was opened. `is_outdated` tells if a newer one was published
+        since then (see build_index.py), a long running process opens it to see the new data.
+
+        index = MovieIndex.open()
+        index.query(genres=["Drama"], providers=["Netflix"], min_imdb_rating=8, popular=True, k=10)
+    """
+
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self.manifest_mtime = (index_dir / "manifest.json").stat().st_mtime_ns
+        manifest = read_manifest(index_dir)
+        self.version = manifest["version"]
+        self.rows = manifest["rows"]
+        self.names = {column: {name: position for position, name in enumerate(names)} for column, names in manifest["names"].items()}
+
+        version_dir = index_dir / self.version
+        load = lambda name: np.load(version_dir / f"{name}.npy", mmap_mode="r")
+        self.columns = {name: load(name) for name in ["type", "id", "imdb_rating", "tmdb_rating", "imdb_count", "tmdb_count", "is_popular", "release_date"]}
+        self.orders = {name: load(f"order_{name}") for name in RANKABLE + ["title", "key"]}
+        self.sorted = {name: load(f"sorted_{name}") for name in RANKABLE + ["title", "key"]}
+        self.postings = {column: (load(f"{column}_offsets"), load(f"{column}_rows")) for column in LISTS}
+
+        self.titles = pa.ipc.open_file(pa.memory_map(str(version_dir / "titles.arrow"))).read_all()
+
+    @classmethod
+    def open(cls, gold_path=GOLD_PATH, index_dir=INDEX_DIR):
+        # Builds the index first if it doesn't exist or the gold file changed
+        if is_stale(gold_path, index_dir):
+            build_index(gold_path, index_dir)
+        return cls(index_dir)
+
+    def is_outdated(self):
+        # Only a stat of the manifest while it doesn't change
+        try:
+            if (self.index_dir / "manifest.json").stat().st_mtime_ns == self.manifest_mtime:
+                return False
+            return read_manifest(self.index_dir)["version"] != self.version
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def rows_of(self, column, name):
+        # Sorted positions of the titles with the given genre/watch provider
+        position = self.names[column].get(name)
+        if position is None:
+            return np.array([], dtype=np.int64)
+        offsets, rows = self.postings[column]
+        return np.asarray(rows[offsets[position]:offsets[position + 1]])
+
+    def rows_between(self, column, minimum=None, maximum=None):
+        # Positions (sorted) of the titles with minimum <= value <= maximum, binary search over the sorted values
+        values = self.sorted[column]
+        start = 0 if minimum is None else np.searchsorted(values, minimum, side="left")
+        end = len(values) if maximum is None else np.searchsorted(values, maximum, side="right")
+        return np.sort(self.orders[column][start:end])
+
+    def records(self, positions):
+        return self.titles.take(pa.array(positions, type=pa.int64())).to_pylist()
+
+    @METRICS.timed("serve query")
+    def query(self, genres=None, providers=None, type=None, min_imdb_rating=None, min_tmdb_rating=None, popular=None,
+              released_after=None, released_before=None, sort_by="imdb_rating", k=10):
+        """
+            Top `k` titles sorted by `sort_by` (descending) that match all the filters:
+
+            - genres: list of genres, the title must have all of them
+            - providers: list of watch providers, the title must be in at least one of them
+            - type: 'movie' or 'show'
+            - min_imdb_rating / min_tmdb_rating: minimum ratings
+            - popular: True/False to filter by 'is_popular'
+            - released_after / released_before: dates as 'YYYY-MM-dd' (inclusive)
+        """
+        candidates = None
+
+        def intersect(rows):
+            return rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+
+        for genre in genres or []:
+            candidates = intersect(self.rows_of("genre", genre))
+        if providers:
+            candidates = intersect(np.unique(np.concatenate([self.rows_of("watch_providers", provider) for provider in providers])))
+        if min_imdb_rating is not None:
+            candidates = intersect(self.rows_between("imdb_rating", minimum=min_imdb_rating))
+        if min_tmdb_rating is not None:
+            candidates = intersect(self.rows_between("tmdb_rating", minimum=min_tmdb_rating))
+        if released_after is not None or released_before is not None:
+            to_number = lambda date: int(date.replace("-", "")) if date is not None else None
+            candidates = intersect(self.rows_between("release_date", to_number(released_after), to_number(released_before)))
+
+        if candidates is None:
+            candidates = np.arange(self.rows)
+
+        # Filters on low cardinality columns, applied to the remaining candidates only
+        if type is not None:
+            candidates = candidates[self.columns["type"][candidates] == TYPES.index(type)]
+        if popular is not None:
+            candidates = candidates[self.columns["is_popular"][candidates] == popular]
+
+        # Top-k: partial sort of the candidates, only the k best are sorted (ties by position)
+        values = np.asarray(self.columns[sort_by][candidates])
+        top = np.arange(len(candidates))
+        if len(candidates) > k:
+            kth_value = -np.partition(-values, k - 1)[k - 1]
+            top = np.flatnonzero(values >= kth_value)
+        top = top[np.lexsort((candidates[top], -values[top]))][:k]
+        return self.records(candidates[top])
+
+    @METRICS.timed("serve get")
+    def get(self, id, type=None):
+        """
+            Title with the given TMDB id (movies and shows can share ids, `type` chooses one of them).
+        """
+        for type_position, type_name in enumerate(TYPES):
+            if type is not None and type != type_name:
+                continue
+            key = type_position * 10 ** 12 + int(id)
+            position = np.searchsorted(self.sorted["key"], key)
+            if position < self.rows and self.sorted["key"][position] == key:
+                return self.records([self.orders["key"][position]])[0]
+        return None
+
+    @METRICS.timed("serve search")
+    def search(self, text, k=10):
+        """
+            Titles that start with `text` (case insensitive), in alphabetical order.
+        """
+        text = text.lower()
+        titles = self.sorted["title"]
+        start = np.searchsorted(titles, text, side="left")
+        end = np.searchsorted(titles, text + "\uffff", side="left")
+        return self.records(self.orders["title"][start:min(end, start + k)])
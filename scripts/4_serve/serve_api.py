@@ -0,0 +1,98 @@
+"""
+    Small local HTTP endpoint over the movie index (JSON responses):
+
+    - /titles?genre=Drama&provider=Netflix&min_imdb_rating=8&popular=true&type=movie&sort_by=imdb_rating&k=10
+      (genre and provider can be repeated, dates with released_after/released_before as YYYY-MM-dd)
+    - /titles/<type>/<id>
+    - /search?q=el padrino&k=10
+
+    When build_index.py publishes a new version of the index, the next request opens it (no restart needed).
+
+    Run from the root of the project:
+
+        python scripts/4_serve/serve_api.py --port 8000
+"""
+
+import argparse
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from movie_index import MovieIndex
+
+FLOAT_PARAMS = ["min_imdb_rating", "min_tmdb_rating"]
+TEXT_PARAMS = ["type", "released_after", "released_before", "sort_by"]
+
+
+def query_arguments(params):
+    """
+        Arguments of MovieIndex.query from the parameters of the URL (raises ValueError if one is not valid).
+    """
+    arguments = {
+        "genres": params.get("genre"),
+        "providers": params.get("provider"),
+        "k": int(params.get("k", ["10"])[0])
+    }
+    for name in FLOAT_PARAMS:
+        if name in params:
+            arguments[name] = float(params[name][0])
+    for name in TEXT_PARAMS:
+        if name in params:
+            arguments[name] = params[name][0]
+    if "popular" in params:
+        arguments["popular"] = params["popular"][0].lower() in ("true", "1", "yes")
+    return arguments
+
+
+class IndexHandler(BaseHTTPRequestHandler):
+    index = None
+    reload_lock = threading.Lock()
+
+    @classmethod
+    def current_index(cls):
+        # The requests in progress keep the index they started with, its files are not modified
+        with cls.reload_lock:
+            if cls.index.is_outdated():
+                cls.index = MovieIndex(cls.index.index_dir)
+            return cls.index
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        parts = [part for part in url.path.split("/") if part]
+        index = self.current_index()
+
+        try:
+            if parts == ["titles"]:
+                self.send_json(200, index.query(**query_arguments(params)))
+            elif len(parts) == 3 and parts[0] == "titles":
+                title = index.get(int(parts[2]), type=parts[1])
+                self.send_json(200 if title else 404, title or {"error": "Title not found"})
+            elif parts == ["search"]:
+                self.send_json(200, index.search(params.get("q", [""])[0], int(params.get("k", ["10"])[0])))
+            else:
+                self.send_json(404, {"error": "Not found"})
+        except (ValueError, KeyError) as error:
+            self.send_json(400, {"error": f"Invalid parameter: {error}"})
+
+    def send_json(self, status, body):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Local HTTP endpoint to query the gold dataset")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    IndexHandler.index = MovieIndex.open()
+    server = ThreadingHTTPServer((args.host, args.port), IndexHandler)
+    print(f"Serve - Listening on http://{args.host}:{args.port}")
+    server.serve_forever()
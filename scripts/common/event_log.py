@@ -0,0 +1,164 @@
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+LOGS_DIR = Path(os.getenv("LOGS_DIR", BASE_DIR / "logs"))
+LOG_PATH = LOGS_DIR / "api_extraction.jsonl"
+
+# Rotation of the log file: size of each file and number of old files kept ('.1', '.2'...)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 ** 2))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+
+# Fraction of the repetitive per-title events written to the log (all of them are counted)
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", 0.05))
+
+# Seconds between the summaries of the counters, so a long run (or one that is killed) doesn't lose them
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 60))
+
+# Identifies the events of the same run (several runs share the log file)
+RUN_ID = f"{datetime.datetime.now(datetime.timezone.utc):%Y%m%dT%H%M%S}-{os.getpid()}"
+
+_listener = None
+_setup_lock = threading.Lock()
+_event_logs = [] # EventLogs of the process, flushed at exit
+
+
+class JsonFormatter(logging.Formatter):
+    """
+        One JSON object per line: time, level, logger, run, event name (the message) and the fields of the event.
+    """
+
+    def format(self, record):
+        event = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "run": RUN_ID,
+            "event": record.getMessage()
+        }
+        event.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            event["exception"] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def setup_logging(path=LOG_PATH):
+    """
+        Sends the logs of the process to a JSON lines file rotated by size. The threads that log only put the records
+        in a queue (no formatting nor disk writes), a background thread formats and writes them. The queue is flushed
+        when the process exits (see `_shutdown`). Calling it again does nothing.
+
+        Called by the entry points (the scripts run from the command line), importing a module never changes the
+        logging of the process.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                                            encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+
+        records = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+        _listener.start()
+
+        root = logging.getLogger()
+        root.setLevel(logging.INFO)
+        root.addHandler(logging.handlers.QueueHandler(records))
+
+
+def _shutdown():
+    # Single exit hook, so the order doesn't depend on when the EventLogs and the logging were set up: the last
+    # summaries are queued before the listener writes the pending records and stops
+    with _setup_lock:
+        event_logs = list(_event_logs)
+    for event_log in event_logs:
+        event_log.flush()
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_shutdown)
+
+
+class EventLog:
+    """
+        Structured events of an extraction, sent to the logging module (to the JSON lines file if the entry point called
+        `setup_logging`):
+
+        - event: written every time, for the rare ones (errors, quota reached...)
+        - count: only counted, for events repeated for many titles whose details don't matter (e.g. no providers)
+        - sample: counted every time and written only for a fraction of the calls (`LOG_SAMPLE_RATE`), for per-title
+          events whose details are useful as examples (e.g. the matches of OMDB)
+
+        The counts are written as 'summary' events with the counts since the previous one, every `flush_interval`
+        seconds and when the process exits (or on `flush`), so the size of the log doesn't grow with the number of
+        titles. The counts of a run are the sum of its summaries. Safe to use from several threads.
+    """
+
+    def __init__(self, name, sample_rate=LOG_SAMPLE_RATE, flush_interval=LOG_FLUSH_INTERVAL):
+        self.logger = logging.getLogger(name)
+        self.sample_rate = sample_rate
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.last_flush = time.monotonic()
+        with _setup_lock:
+            _event_logs.append(self)
+
+    def event(self, name, level=logging.INFO, **fields):
+        self.logger.log(level, name, extra={"fields": fields})
+
+    def count(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            due = time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def sample(self, name, labels, rate=None, **fields):
+        # `labels` are counted, `fields` (e.g. the titles) only appear in the sampled events
+        rate = self.sample_rate if rate is None else rate
+        self.count(name, **labels)
+        if random.random() < rate:
+            self.event(name, sampled=rate, **labels, **fields)
+
+    def flush(self):
+        with self.lock:
+            counters, self.counters = self.counters, {}
+            self.last_flush = time.monotonic()
+        if counters:
+            summary = {}
+            for (name, labels), count in sorted(counters.items(), key=lambda item: repr(item[0])):
+                summary.setdefault(name, []).append({**dict(labels), "count": count})
+            self.event("summary", counters=summary)
+
+
+def read_events(path=LOG_PATH):
+    """
+        Events of the log and its rotated files, the oldest first. Lines that are not JSON (e.g. the text logs of the
+        older versions) are skipped.
+    """
+    paths = [Path(f"{path}.{number}") for number in range(LOG_BACKUP_COUNT, 0, -1)] + [Path(path)]
+    for file_path in paths:
+        if not file_path.exists():
+            continue
+        with open(file_path, encoding="utf-8", errors="replace") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
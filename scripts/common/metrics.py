@@ -0,0 +1,209 @@
+import bisect
+import cProfile
+import datetime
+import functools
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    import resource # Not available on Windows
+except ImportError:
+    resource = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+REPORTS_DIR = Path(os.getenv("METRICS_DIR", BASE_DIR / "logs" / "metrics"))
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float("inf")]
+
+# Percentiles are computed from log-scale buckets, each one 5% wider than the previous, starting at 1 microsecond:
+# they are at most 5% above the real value, whatever the number of observations
+PERCENTILE_GROWTH = 1.05
+PERCENTILE_MIN = 1e-6
+
+
+def peak_memory_mb():
+    """
+        Peak resident memory of the process (None if it can't be known on this platform). On Linux it is read from
+        /proc (VmHWM), because `ru_maxrss` keeps the peak of the parent process when started as a subprocess.
+    """
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024 # KB
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024 # Bytes on macOS, KB on Linux
+
+
+def endpoint_name(url):
+    # '/tv/1396/watch/providers' -> 'api.themoviedb.org/tv/{id}/watch/providers'
+    parts = urlsplit(url)
+    return parts.netloc + re.sub(r"/\d+(?=/|$)", "/{id}", parts.path)
+
+
+class Histogram:
+    """
+        Durations of an operation, summarised as count, total, percentiles and the number of calls in each bucket.
+        Only counts are kept (no list of values), so the memory used doesn't grow with the number of calls.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.counts = [0] * len(BUCKETS)
+        self.fine_counts = {} # Log-scale bucket -> calls, for the percentiles
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        fine_bucket = math.ceil(math.log(max(seconds, PERCENTILE_MIN) / PERCENTILE_MIN, PERCENTILE_GROWTH))
+        self.fine_counts[fine_bucket] = self.fine_counts.get(fine_bucket, 0) + 1
+
+    def percentile(self, percent):
+        # Upper bound of the bucket of the value at the rank of the percentile (never above the maximum)
+        rank = min(int(self.count * percent / 100), self.count - 1)
+        seen = 0
+        for fine_bucket in sorted(self.fine_counts):
+            seen += self.fine_counts[fine_bucket]
+            if seen > rank:
+                return min(PERCENTILE_MIN * PERCENTILE_GROWTH ** fine_bucket, self.max)
+
+    def summary(self):
+        if not self.count:
+            return {"count": 0}
+
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "buckets": {f"<={bound}": count for bound, count in zip(BUCKETS, self.counts) if count}
+        }
+
+
+class Metrics:
+    """
+        Performance measures of a run, shared by all the scripts through `METRICS`. Safe to use from several threads.
+
+        - timers: latency histograms of stages, functions and API endpoints (`timer`, `timed`)
+        - counters: requests, status codes, retries, cache hits... (`count`)
+        - rows: rows in and out of each stage (`rows`)
+        - memory: peak memory of the process at the end of each stage (`memory`)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.timers = {}
+        self.counters = {}
+        self.row_counts = {}
+        self.memory_mb = {}
+
+    def observe(self, name, seconds):
+        with self.lock:
+            self.timers.setdefault(name, Histogram()).observe(seconds)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def rows(self, name, rows_in=None, rows_out=None):
+        # Added up over the calls, e.g. for a stage processed in batches
+        with self.lock:
+            counts = self.row_counts.setdefault(name, {"in": None, "out": None})
+            for key, value in [("in", rows_in), ("out", rows_out)]:
+                if value is not None:
+                    counts[key] = (counts[key] or 0) + value
+
+    def memory(self, name):
+        with self.lock:
+            self.memory_mb[name] = peak_memory_mb()
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name=None):
+        """
+            Decorator that records the duration of every call of the function (named after the function by default).
+        """
+        def decorator(function):
+            timer_name = name or function.__name__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.timer(timer_name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self):
+        with self.lock:
+            return {
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "elapsed": time.perf_counter() - self.started,
+                "peak_memory_mb": peak_memory_mb(),
+                "timers": {name: histogram.summary() for name, histogram in sorted(self.timers.items())},
+                "counters": dict(sorted(self.counters.items())),
+                "rows": dict(self.row_counts),
+                "memory_mb": dict(self.memory_mb)
+            }
+
+    def write_report(self, run_name, path=None):
+        """
+            Saves the report as JSON, by default in logs/metrics/<run_name>_<date>.json. Returns the path.
+        """
+        if path is None:
+            path = REPORTS_DIR / f"{run_name}_{datetime.datetime.now():%Y%m%d_%H%M%S}.json"
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), indent=4), encoding="utf-8")
+        return path
+
+
+@contextmanager
+def profile(path=None):
+    """
+        Runs the block under cProfile and saves the stats in `path` (open them with `python -m pstats` or snakeviz).
+        Only the calling thread is profiled, the work of the thread pools shows up as waits. Does nothing if no path
+        is given.
+    """
+    if path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
+
+
+METRICS = Metrics()
@@ -0,0 +1,319 @@
+import ast
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+# Can be moved with the environment variable DATA_DIR (e.g. to run the benchmarks without touching the real data)
+DATA_DIR = Path(os.getenv("DATA_DIR", BASE_DIR / "data"))
+
+# Rows per batch when a dataset is processed in chunks
+BATCH_SIZE = 50_000
+
+LAYERS = {
+    "bronze": DATA_DIR / "1_bronze",
+    "silver": DATA_DIR / "2_silver",
+    "gold": DATA_DIR / "3_gold"
+}
+
+# Date columns, TMDB sends an empty string when the date is unknown: saved as null
+DATE_COLUMNS = {"release_date", "first_air_date"}
+
+# 'movie'/'show' stored as a categorical (dictionary encoded) column
+TYPE = pa.dictionary(pa.int8(), pa.string())
+
+# Only the fields of the top rated endpoints used by the next stages (see page_collector.py)
+TMDB_MOVIES_SCHEMA = pa.schema([
+    ("genre_ids", pa.list_(pa.int64())),
+    ("id", pa.int64()),
+    ("overview", pa.string()),
+    ("popularity", pa.float64()),
+    ("release_date", pa.string()),
+    ("title_ES", pa.string()),
+    ("vote_average", pa.float64()),
+    ("vote_count", pa.int64()),
+    ("type", TYPE),
+    ("title_EN", pa.string())
+])
+
+TMDB_SHOWS_SCHEMA = pa.schema([
+    ("genre_ids", pa.list_(pa.int64())),
+    ("id", pa.int64()),
+    ("overview", pa.string()),
+    ("popularity", pa.float64()),
+    ("first_air_date", pa.string()),
+    ("title_ES", pa.string()),
+    ("vote_average", pa.float64()),
+    ("vote_count", pa.int64()),
+    ("type", TYPE),
+    ("title_EN", pa.string())
+])
+
+GENRES_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("name", pa.string())
+])
+
+WATCH_PROVIDERS_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("watch_providers", pa.list_(pa.string()))
+])
+
+# Values of a title that depend on the locale (language-region), one row per title and locale
+TMDB_LOCALES_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("locale", pa.string()),
+    ("title", pa.string()),
+    ("overview", pa.string()),
+    ("watch_providers", pa.list_(pa.string()))
+])
+
+EXTERNAL_IDS_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("imdb_id", pa.string())
+])
+
+IMDB_RATING_SCHEMA = pa.schema([
+    ("tmdb_id", pa.int64()),
+    ("imdb_rating", pa.float64()),
+    ("imdb_votes", pa.int64())
+])
+
+BASE_MOVIES_AND_SHOWS_SCHEMA = pa.schema([
+    ("type", TYPE),
+    ("id", pa.int64()),
+    ("title", pa.string()),
+    ("overview", pa.string()),
+    ("release_date", pa.string()),
+    ("genre", pa.list_(pa.string())),
+    ("tmdb_rating", pa.float64()),
+    ("tmdb_count", pa.int64()),
+    ("imdb_rating", pa.float64()),
+    ("imdb_count", pa.int64())
+])
+
+ENRICHED_MOVIES_AND_SHOWS_SCHEMA = pa.schema([
+    ("type", TYPE),
+    ("id", pa.int64()),
+    ("title", pa.string()),
+    ("overview", pa.string()),
+    ("release_date", pa.string()),
+    ("genre", pa.list_(pa.string())),
+    ("tmdb_rating", pa.float64()),
+    ("tmdb_count", pa.int64()),
+    ("imdb_rating", pa.float64()),
+    ("imdb_count", pa.int64()),
+    ("is_popular", pa.bool_()),
+    ("watch_providers", pa.list_(pa.string()))
+])
+
+SCHEMAS = {
+    ("bronze", "TMDB_top_rated_movies"): TMDB_MOVIES_SCHEMA,
+    ("bronze", "TMDB_top_rated_shows"): TMDB_SHOWS_SCHEMA,
+    ("bronze", "TMDB_movies_genres"): GENRES_SCHEMA,
+    ("bronze", "TMDB_shows_genres"): GENRES_SCHEMA,
+    ("bronze", "TMDB_watch_providers_movies"): WATCH_PROVIDERS_SCHEMA,
+    ("bronze", "TMDB_watch_providers_shows"): WATCH_PROVIDERS_SCHEMA,
+    ("bronze", "TMDB_locales_movies"): TMDB_LOCALES_SCHEMA,
+    ("bronze", "TMDB_locales_shows"): TMDB_LOCALES_SCHEMA,
+    ("bronze", "TMDB_external_ids_movies"): EXTERNAL_IDS_SCHEMA,
+    ("bronze", "TMDB_external_ids_shows"): EXTERNAL_IDS_SCHEMA,
+    ("bronze", "OMDB_imdb_rating_movies"): IMDB_RATING_SCHEMA,
+    ("bronze", "OMDB_imdb_rating_shows"): IMDB_RATING_SCHEMA,
+    ("silver", "base_movies_and_shows"): BASE_MOVIES_AND_SHOWS_SCHEMA,
+    ("silver", "enriched_result_movies_shows"): ENRICHED_MOVIES_AND_SHOWS_SCHEMA
+}
+
+# Datasets saved as a folder with a file per value of a column (e.g. TMDB_locales_movies/locale=en-US/part-0.parquet),
+# so a single locale can be read without the others
+PARTITIONS = {
+    ("bronze", "TMDB_locales_movies"): "locale",
+    ("bronze", "TMDB_locales_shows"): "locale"
+}
+
+
+def layer_path(layer, name, extension="parquet"):
+    if (layer, name) in PARTITIONS and extension == "parquet":
+        return LAYERS[layer] / name
+    return LAYERS[layer] / f"{name}.{extension}"
+
+
+def exists(layer, name):
+    return layer_path(layer, name).exists() or layer_path(layer, name, "csv").exists()
+
+
+def to_table(data, schema):
+    """
+        Converts a DataFrame to an Arrow table with the declared schema. Integer columns with nulls (floats in pandas)
+        are cast to nullable integers first, empty dates are saved as nulls, columns not declared in the schema are 
+        dropped.
+    """
+    data = data.copy()
+    for field in schema:
+        if pa.types.is_integer(field.type) and data[field.name].dtype.kind == "f":
+            data[field.name] = data[field.name].astype("Int64")
+        elif field.name in DATE_COLUMNS:
+            data[field.name] = data[field.name].mask(data[field.name] == "")
+    return pa.Table.from_pandas(data[schema.names], schema=schema, preserve_index=False)
+
+
+def to_frame(table):
+    # Integer columns are read as nullable integers, so missing values don't turn them into floats
+    return table.to_pandas(types_mapper=lambda arrow_type: pd.Int64Dtype() if pa.types.is_integer(arrow_type) else None)
+
+
+def write_layer(data, layer, name):
+    """
+        Saves a DataFrame as Parquet in the given layer ('bronze', 'silver'), with the schema declared for it.
+    """
+    path = layer_path(layer, name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    table = to_table(data, SCHEMAS[(layer, name)])
+    if (layer, name) in PARTITIONS:
+        write_partitions(table, path, PARTITIONS[(layer, name)])
+        return path
+
+    temporary_path = f"{path}.tmp"
+    pq.write_table(table, temporary_path)
+    os.replace(temporary_path, path)
+    return path
+
+
+def write_partitions(table, path, column):
+    """
+        Saves a file per value of `column` (without the column, its value is in the name of the folder). Every file is
+        replaced atomically, and the partitions of values that are not in the table anymore are removed.
+    """
+    values = pc.unique(table[column]).to_pylist()
+    rest = table.drop_columns([column])
+    for value in values:
+        partition_path = path / f"{column}={value}"
+        partition_path.mkdir(parents=True, exist_ok=True)
+
+        temporary_path = partition_path / "part-0.parquet.tmp"
+        pq.write_table(rest.filter(pc.equal(table[column], value)), temporary_path)
+        os.replace(temporary_path, partition_path / "part-0.parquet")
+
+    for partition_path in path.glob(f"{column}=*"):
+        if partition_path.name.split("=", 1)[1] not in values:
+            shutil.rmtree(partition_path)
+
+
+def read_partitions(layer, name, columns=None, values=None):
+    """
+        Reads a partitioned dataset, only the partitions of the given `values` (e.g. ['en-US']) if given.
+    """
+    schema = SCHEMAS[(layer, name)]
+    column = PARTITIONS[(layer, name)]
+    partitioning = ds.partitioning(pa.schema([schema.field(column)]), flavor="hive")
+    dataset = ds.dataset(layer_path(layer, name), format="parquet", partitioning=partitioning)
+
+    filter = ds.field(column).isin(values) if values is not None else None
+    return dataset.to_table(columns=columns or schema.names, filter=filter)
+
+
+def read_layer(layer, name, columns=None):
+    """
+        Reads a dataset of the given layer, only the requested `columns` if given.
+
+        Files written before the migration to Parquet (semicolon CSV with string-lists) are still supported: they are
+        parsed and converted to the declared schema, so the result is the same in both cases.
+    """
+    path = layer_path(layer, name)
+    if (layer, name) in PARTITIONS:
+        return to_frame(read_partitions(layer, name, columns))
+    if path.exists():
+        return to_frame(pq.read_table(path, columns=columns))
+
+    return to_frame(read_legacy_csv(layer, name, columns))
+
+
+def iter_layer(layer, name, columns=None, batch_size=BATCH_SIZE):
+    """
+        Reads a dataset of the given layer in DataFrames of at most `batch_size` rows, so the whole dataset never has
+        to fit in memory. Legacy CSV files (small, written before the migration) are read at once and then sliced.
+    """
+    path = layer_path(layer, name)
+    if path.exists():
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            yield to_frame(pa.Table.from_batches([batch]))
+        return
+
+    table = read_legacy_csv(layer, name, columns)
+    for offset in range(0, table.num_rows, batch_size):
+        yield to_frame(table.slice(offset, batch_size))
+
+
+class LayerWriter:
+    """
+        Writes a dataset of the given layer batch by batch (one Parquet row group per batch), with the schema declared
+        for it. The file is written next to the final one and only replaces it when the writer is closed without
+        errors.
+
+        with LayerWriter("silver", "base_movies_and_shows") as writer:
+            for batch in batches:
+                writer.write(batch)
+    """
+
+    def __init__(self, layer, name):
+        self.path = layer_path(layer, name)
+        self.schema = SCHEMAS[(layer, name)]
+        self.temporary_path = f"{self.path}.tmp"
+        self.rows = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.writer = pq.ParquetWriter(self.temporary_path, self.schema)
+
+    def write(self, data):
+        self.writer.write_table(to_table(data, self.schema))
+        self.rows += len(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.writer.close()
+        if exception_type is None:
+            os.replace(self.temporary_path, self.path)
+        else:
+            os.remove(self.temporary_path)
+
+
+def read_legacy_csv(layer, name, columns=None):
+    schema = SCHEMAS[(layer, name)]
+    if columns is not None:
+        schema = pa.schema([schema.field(column) for column in columns])
+
+    data = pd.read_csv(layer_path(layer, name, "csv"), sep=';', index_col=0, usecols=lambda column: column in schema.names or column.startswith("Unnamed"))
+
+    for field in schema:
+        column = data[field.name]
+        if pa.types.is_list(field.type):
+            data[field.name] = column.apply(parse_list)
+        elif pa.types.is_integer(field.type) and not pd.api.types.is_numeric_dtype(column):
+            # Numbers saved with thousands separators ('3,042,120')
+            data[field.name] = pd.to_numeric(column.str.replace(",", ""), errors="coerce")
+
+    return to_table(data, schema)
+
+
+def parse_list(string_list):
+    """
+        Lists were saved as strings in the CSV files: as Python lists in bronze ('[18, 80]' -> [18, 80]) and as comma
+        separated values in the enriched silver file ('Crimen, Drama' -> ['Crimen', 'Drama']).
+    """
+    if not isinstance(string_list, str):
+        return None
+    if not string_list.startswith("["):
+        return string_list.split(", ")
+    try:
+        return list(ast.literal_eval(string_list))
+    except (ValueError, SyntaxError):
+        return []
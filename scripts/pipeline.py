@@ -0,0 +1,368 @@
+"""
+    Runs the whole pipeline (extract -> transform -> load) in a single process, passing the DataFrames from one stage to
+    the next in memory instead of writing and reading the bronze/silver files between scripts.
+
+    - The stages form a DAG, independent branches (movies/shows, TMDB/OMDB...) run concurrently.
+    - The output of each stage is cached with a fingerprint of its code, parameters and inputs, a stage whose
+      fingerprint didn't change is loaded from the cache instead of running again.
+    - The bronze/silver files are only written with --materialize.
+
+    Run from the root of the project:
+
+        python scripts/pipeline.py                 # Extraction from the APIs
+        python scripts/pipeline.py --from-bronze   # Transform and load the bronze files already saved
+"""
+
+import argparse
+import datetime
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+sys.path.append(str(SCRIPTS_DIR))
+sys.path.append(str(SCRIPTS_DIR / "1_extract"))
+sys.path.append(str(SCRIPTS_DIR / "3_load"))
+
+from common.event_log import setup_logging
+from common.metrics import METRICS, profile
+from common.storage import DATA_DIR, IMDB_RATING_SCHEMA, SCHEMAS, layer_path, read_layer, write_layer, to_frame, to_table
+
+CACHE_DIR = DATA_DIR / "cache" / "pipeline"
+MANIFEST_PATH = CACHE_DIR / "manifest.json"
+
+# Ratings of movies and shows requested together (split into their bronze datasets by the next stages)
+IMDB_RATINGS_SCHEMA = IMDB_RATING_SCHEMA.append(pa.field("data_type", pa.string()))
+
+FORMATS = ["csv", "parquet", "json", "xlsx", "sqlite"]
+
+# Stages using the same API don't run at the same time (OMDB counts the requests per day, TMDB shares a rate limiter)
+RESOURCE_LOCKS = {"omdb": threading.Lock()}
+
+_modules = {}
+_modules_lock = threading.Lock()
+
+
+def load_script(relative_path):
+    """
+        Imports a script of the pipeline from its path (folders and some scripts start with a digit, they can't be
+        imported by name). Each script is loaded only once.
+    """
+    with _modules_lock:
+        if relative_path not in _modules:
+            path = SCRIPTS_DIR / relative_path
+            spec = importlib.util.spec_from_file_location(path.stem.lstrip("0123456789_"), path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            _modules[relative_path] = module
+        return _modules[relative_path]
+
+
+class Stage:
+    """
+        Node of the pipeline: `function` receives the outputs of the `inputs` stages (in the same order) and returns a
+        DataFrame.
+
+        - scripts: files with the code of the stage, part of its fingerprint
+        - layer/layer_name: dataset produced by the stage, its output has the schema declared for it in the storage
+        - materialize: False if the dataset must not be saved with --materialize (e.g. it was read from that file)
+        - resource: API used by the stage, stages with the same resource run one after the other
+        - params: values that change the output of the stage, part of its fingerprint
+        - schema: of the output of a stage without dataset, so it is cached too
+
+        Only the outputs of stages with a dataset (layer/layer_name) are cached, the gold export always runs (it skips
+        the formats that are up to date on its own).
+    """
+
+    def __init__(self, name, function, inputs=(), scripts=(), layer=None, layer_name=None, materialize=True, resource=None, params=None,
+                 schema=None):
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.scripts = list(scripts)
+        self.layer = layer
+        self.layer_name = layer_name
+        self.materialize = materialize
+        self.resource = resource
+        self.params = params or {}
+        self._schema = schema
+
+    @property
+    def schema(self):
+        return self._schema or SCHEMAS.get((self.layer, self.layer_name))
+
+
+def bronze_version(name):
+    # Size and modification time of the bronze file (Parquet or legacy CSV)
+    for extension in ["parquet", "csv"]:
+        path = layer_path("bronze", name, extension)
+        if path.exists():
+            stat = path.stat()
+            return f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}"
+    return None
+
+
+def source_stage(name, layer_name, extract, scripts, resource, from_bronze, inputs=()):
+    """
+        Extraction stage: reads the bronze file with --from-bronze, calls the API otherwise. Data from the APIs is
+        reused for the rest of the day (or until the locales to extract change).
+    """
+    if from_bronze:
+        return Stage(name, lambda: read_layer("bronze", layer_name), layer="bronze", layer_name=layer_name, materialize=False,
+                     params={"bronze": bronze_version(layer_name)})
+
+    return Stage(name, extract, inputs=inputs, scripts=scripts, layer="bronze", layer_name=layer_name, resource=resource,
+                 params={"day": datetime.date.today().isoformat(), "locales": os.getenv("TMDB_LOCALES")})
+
+
+def build_stages(from_bronze=False, formats=FORMATS, force=False):
+    TMDB_SCRIPT = "1_extract/TMDB_api.py"
+    OMDB_SCRIPT = "1_extract/OMDB_api.py"
+    UNIFY_SCRIPT = "2_transform/1_unify_data.py"
+    ENRICH_SCRIPT = "2_transform/2_data_enrichment.py"
+    LOAD_SCRIPT = "3_load/save_data_formats.py"
+
+    def tmdb():
+        return load_script(TMDB_SCRIPT)
+
+    def omdb():
+        tmdb()
+        return load_script(OMDB_SCRIPT)
+
+    def top_rated_pages(type):
+        def extract():
+            module = tmdb()
+            get_top_rated = module.get_top_rated_movies if type == 'movie' else module.get_top_rated_shows
+            result, errors = get_top_rated(module.HEADERS, language=module.MAIN_LOCALE)
+            if errors:
+                print(f"TMDB - Errors during the extraction of {type}s: ", errors)
+            return result
+        return extract
+
+    def locales(type, checkpoint_name):
+        def extract(titles):
+            module = tmdb()
+            module.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            checkpoint_path = module.CACHE_DIR / checkpoint_name
+            result = module.enrich_locales(module.HEADERS, titles["id"].tolist(), type, checkpoint_path)
+            module.Checkpoint(checkpoint_path).clear()
+            return result
+        return extract
+
+    def top_rated(type):
+        def extract(titles, locales_data):
+            return tmdb().add_title_EN(titles, locales_data, type)
+        return extract
+
+    def watch_providers(locales_data):
+        return tmdb().locale_view(locales_data, tmdb().MAIN_LOCALE, ["watch_providers"])
+
+    def imdb_ratings(movies, shows):
+        return omdb().get_imdb_ratings(movies, shows)
+
+    def ratings_of(data_type):
+        def extract(ratings):
+            return ratings[ratings["data_type"] == data_type].drop(columns="data_type")
+        return extract
+
+    def unify(*frames):
+        module = load_script(UNIFY_SCRIPT)
+        movies, shows, movies_genres, shows_genres, imdb_movies, imdb_shows = frames
+        return module.unify_data(movies[module.MOVIES_COLUMNS], shows[module.SHOWS_COLUMNS], movies_genres, shows_genres,
+                                 imdb_movies, imdb_shows)
+
+    def enrich(*frames):
+        return load_script(ENRICH_SCRIPT).enrich_data(*frames)
+
+    def export(enriched_data):
+        return load_script(LOAD_SCRIPT).export_gold(enriched_data, formats, force)
+
+    # Top rated pages (requested once, in the main locale) and locales of every title (one request per title) are
+    # only needed to extract from the APIs, the rest of the bronze files are built from them
+    api_stages = [] if from_bronze else [
+        Stage("top_rated_movies", top_rated_pages('movie'), scripts=[TMDB_SCRIPT], params={"day": datetime.date.today().isoformat()}),
+        Stage("top_rated_shows", top_rated_pages('show'), scripts=[TMDB_SCRIPT], params={"day": datetime.date.today().isoformat()}),
+        source_stage("locales_movies", "TMDB_locales_movies", locales('movie', "checkpoint_locales_movies.jsonl"), [TMDB_SCRIPT], None,
+                     from_bronze, inputs=["top_rated_movies"]),
+        source_stage("locales_shows", "TMDB_locales_shows", locales('tv', "checkpoint_locales_shows.jsonl"), [TMDB_SCRIPT], None,
+                     from_bronze, inputs=["top_rated_shows"]),
+        # Movies and shows share the daily quota of OMDB: a single queue in priority order, as in OMDB_api.py
+        Stage("imdb_ratings", imdb_ratings, inputs=["tmdb_movies", "tmdb_shows"], scripts=[OMDB_SCRIPT], resource="omdb",
+              params={"day": datetime.date.today().isoformat()}, schema=IMDB_RATINGS_SCHEMA)
+    ]
+
+    return api_stages + [
+        source_stage("tmdb_movies", "TMDB_top_rated_movies", top_rated('movie'), [TMDB_SCRIPT], None, from_bronze,
+                     inputs=["top_rated_movies", "locales_movies"]),
+        source_stage("tmdb_shows", "TMDB_top_rated_shows", top_rated('show'), [TMDB_SCRIPT], None, from_bronze,
+                     inputs=["top_rated_shows", "locales_shows"]),
+        source_stage("movies_genres", "TMDB_movies_genres", lambda: tmdb().get_movie_genres(tmdb().HEADERS), [TMDB_SCRIPT], None, from_bronze),
+        source_stage("shows_genres", "TMDB_shows_genres", lambda: tmdb().get_shows_genres(tmdb().HEADERS), [TMDB_SCRIPT], None, from_bronze),
+        source_stage("watch_providers_movies", "TMDB_watch_providers_movies", watch_providers, [TMDB_SCRIPT], None, from_bronze,
+                     inputs=["locales_movies"]),
+        source_stage("watch_providers_shows", "TMDB_watch_providers_shows", watch_providers, [TMDB_SCRIPT], None, from_bronze,
+                     inputs=["locales_shows"]),
+        source_stage("imdb_movies", "OMDB_imdb_rating_movies", ratings_of("movie"), [OMDB_SCRIPT], None, from_bronze,
+                     inputs=["imdb_ratings"]),
+        source_stage("imdb_shows", "OMDB_imdb_rating_shows", ratings_of("series"), [OMDB_SCRIPT], None, from_bronze,
+                     inputs=["imdb_ratings"]),
+        Stage("base", unify, inputs=["tmdb_movies", "tmdb_shows", "movies_genres", "shows_genres", "imdb_movies", "imdb_shows"],
+              scripts=[UNIFY_SCRIPT], layer="silver", layer_name="base_movies_and_shows"),
+        Stage("enriched", enrich, inputs=["base", "watch_providers_movies", "watch_providers_shows"],
+              scripts=[ENRICH_SCRIPT], layer="silver", layer_name="enriched_result_movies_shows"),
+        Stage("gold", export, inputs=["enriched"], scripts=[LOAD_SCRIPT, "3_load/sqlite_store.py"], params={"formats": formats, "force": force})
+    ]
+
+
+def fingerprint(stage, input_fingerprints):
+    """
+        Hash of everything that determines the output of a stage: its code (and the shared storage code), parameters
+        and the fingerprints of its inputs.
+    """
+    digest = hashlib.sha256(stage.name.encode())
+    for script in stage.scripts + ["common/storage.py", "pipeline.py"]:
+        digest.update((SCRIPTS_DIR / script).read_bytes())
+    digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+    for input_fingerprint in input_fingerprints:
+        digest.update(input_fingerprint.encode())
+    return digest.hexdigest()
+
+
+def load_manifest():
+    if MANIFEST_PATH.exists():
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    return {}
+
+
+def save_cached(stage, table):
+    path = CACHE_DIR / f"{stage.name}.parquet"
+    temporary_path = f"{path}.tmp"
+    pq.write_table(table, temporary_path)
+    os.replace(temporary_path, path)
+
+
+def load_cached(stage):
+    return to_frame(pq.read_table(CACHE_DIR / f"{stage.name}.parquet"))
+
+
+def run_stage(stage, frames, cached, materialize):
+    """
+        Runs a stage (or loads it from the cache). Returns its output, the seconds spent and whether it came from the
+        cache.
+    """
+    start = time.perf_counter()
+
+    if cached:
+        data = load_cached(stage)
+        METRICS.rows(stage.name, rows_out=len(data))
+        return data, time.perf_counter() - start, cached
+
+    if stage.resource is not None:
+        with RESOURCE_LOCKS[stage.resource]:
+            data = stage.function(*frames)
+    else:
+        data = stage.function(*frames)
+
+    # Same types as if the dataset was saved and read again by the next script
+    if stage.schema is not None:
+        table = to_table(data, stage.schema)
+        data = to_frame(table)
+        save_cached(stage, table)
+
+    if materialize and stage.materialize and stage.layer is not None:
+        write_layer(data, stage.layer, stage.layer_name)
+
+    if stage.schema is not None:
+        METRICS.rows(stage.name, sum(len(frame) for frame in frames), len(data))
+    METRICS.memory(stage.name)
+    return data, time.perf_counter() - start, cached
+
+
+def run_pipeline(stages, materialize=False, use_cache=True, max_workers=4):
+    """
+        Runs the stages as soon as all their inputs are available, at most `max_workers` at the same time.
+        Returns the outputs of all the stages by name.
+    """
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+
+    stages = {stage.name: stage for stage in stages}
+    outputs = {}
+    fingerprints = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while len(outputs) < len(stages):
+
+            # Submit every stage whose inputs are ready
+            for stage in stages.values():
+                if stage.name in outputs or stage.name in running.values():
+                    continue
+                if not all(name in outputs for name in stage.inputs):
+                    continue
+
+                stage_fingerprint = fingerprint(stage, [fingerprints[name] for name in stage.inputs])
+                fingerprints[stage.name] = stage_fingerprint
+                cached = (use_cache and stage.schema is not None and manifest.get(stage.name) == stage_fingerprint
+                          and (CACHE_DIR / f"{stage.name}.parquet").exists())
+
+                frames = [outputs[name] for name in stage.inputs]
+                future = executor.submit(run_stage, stage, frames, cached, materialize)
+                running[future] = stage.name
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                outputs[name], seconds, cached = future.result()
+
+                if stages[name].schema is not None and not cached:
+                    manifest[name] = fingerprints[name]
+                    MANIFEST_PATH.write_text(json.dumps(manifest, indent=4), encoding="utf-8")
+
+                status = "cached" if cached else "done"
+                METRICS.observe(f"stage {name}", seconds)
+                METRICS.count(f"stages.{status}")
+                print(f"Pipeline - {name}: {status} in {seconds:.2f} s")
+
+    return outputs
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description="Runs extraction, transformation and load in a single process")
+    parser.add_argument("--from-bronze", action="store_true", help="Read the bronze files instead of calling the APIs")
+    parser.add_argument("--materialize", action="store_true", help="Save the bronze and silver files of each stage")
+    parser.add_argument("--no-cache", action="store_true", help="Run all the stages even if their inputs didn't change")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=FORMATS, help="Gold formats to write (all by default)")
+    parser.add_argument("--force", action="store_true", help="Write the gold formats even if they are up to date")
+    parser.add_argument("--max-workers", type=int, default=4, help="Stages running at the same time")
+    parser.add_argument("--metrics", help="Path of the JSON metrics report (logs/metrics/pipeline_<date>.json by default)")
+    parser.add_argument("--profile", help="Save a cProfile dump of the run in this path")
+    args = parser.parse_args()
+    setup_logging()
+
+    if not args.from_bronze:
+        TMDB_api = load_script("1_extract/TMDB_api.py")
+        OMDB_api = load_script("1_extract/OMDB_api.py")
+        if not (TMDB_api.check_authentication(TMDB_api.HEADERS) and OMDB_api.check_authentication()):
+            sys.exit('ERROR: Connection to API failed')
+
+    start = time.perf_counter()
+    stages = build_stages(args.from_bronze, args.formats, args.force)
+    with profile(args.profile):
+        outputs = run_pipeline(stages, args.materialize, not args.no_cache, args.max_workers)
+
+    for file_format, seconds in outputs["gold"].items():
+        status = "up to date, skipped" if seconds is None else f"saved in {seconds:.2f} s"
+        print(f"Gold - {load_script('3_load/save_data_formats.py').FINAL_DATA_NAME}.{file_format}: {status}")
+    print(f"Pipeline - Total: {time.perf_counter() - start:.2f} s")
+    print(f"Pipeline - Metrics saved on: {METRICS.write_report('pipeline', args.metrics)}")
@@ -0,0 +1,72 @@
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+sys.path.append(str(SCRIPTS_DIR))
+sys.path.append(str(SCRIPTS_DIR / "1_extract"))
+sys.path.append(str(SCRIPTS_DIR / "2_transform"))
+sys.path.append(str(SCRIPTS_DIR / "3_load"))
+sys.path.append(str(SCRIPTS_DIR / "4_serve"))
+
+# The scripts imported by the tests write their data in a temporary folder, without the on-disk HTTP cache
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="movie-rating-tests-")
+os.environ["API_CACHE"] = "0"
+
+
+class ItemHandler(BaseHTTPRequestHandler):
+    # GET /<anything>: JSON body with an ETag, 304 if the request sends the same ETag in If-None-Match
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            throttled = server.throttled > 0
+            server.throttled -= throttled
+        if throttled:
+            self.send_response(429)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        etag = f'"{server.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = f'{{"path": "{self.path}", "version": {server.version}}}'.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """
+        Local HTTP server: `server.url` is its address, `server.requests` the paths requested and `server.version`
+        the version of the responses (change it to make the ETag change). The next `server.throttled` requests are
+        answered with 429.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ItemHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.version = 1
+    server.throttled = 0
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
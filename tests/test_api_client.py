@@ -0,0 +1,29 @@
+from api_client import ApiClient
+from response_cache import ResponseCache
+
+
+def test_client_limiter_not_called_on_cache_hits(http_server, tmp_path):
+    calls = []
+    client = ApiClient(cache=ResponseCache(tmp_path / "cache.sqlite"), limiter=lambda: calls.append(1))
+    try:
+        for _ in range(3):
+            assert client.get(f"{http_server.url}/movie/1").json()["path"] == "/movie/1"
+        client.get(f"{http_server.url}/movie/2")
+    finally:
+        client.close()
+
+    assert len(http_server.requests) == 2
+    assert len(calls) == 2
+
+
+def test_client_limiter_called_on_retries(http_server):
+    calls = []
+    http_server.throttled = 2
+    client = ApiClient(backoff_factor=0, limiter=lambda: calls.append(1))
+    try:
+        assert client.get(f"{http_server.url}/movie/1").status_code == 200
+    finally:
+        client.close()
+
+    assert len(http_server.requests) == 3
+    assert len(calls) == 3
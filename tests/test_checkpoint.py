@@ -0,0 +1,57 @@
+from checkpoint import Checkpoint
+
+
+def test_resume_after_a_crash(tmp_path):
+    path = tmp_path / "locales.jsonl"
+    Checkpoint(path).save([{"id": 1, "title": "A"}, {"id": 2, "title": "B"}])
+    with open(path, "a", encoding="utf-8") as file:
+        file.write('{"id": 3, "tit') # Line partially written when the process crashed
+
+    checkpoint = Checkpoint(path)
+    assert [record["id"] for record in checkpoint.load()] == [1, 2]
+    assert checkpoint.done() == {1, 2}
+
+
+def test_failed_items_are_not_done(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "locales.jsonl")
+    checkpoint.save([{"id": 1, "title": "A"}, {"id": 2, "error": 429}, {"id": 3, "error": None}])
+    assert checkpoint.done() == {1, 3}
+
+    # Processed again in the next run: the last record is the one kept
+    checkpoint.save([{"id": 2, "title": "B"}])
+    assert checkpoint.done() == {1, 2, 3}
+    assert checkpoint.latest()[2] == {"id": 2, "title": "B"}
+
+
+def test_item_failing_again_stays_pending(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "ratings.jsonl", key="imdb_id", error="failed")
+    checkpoint.save([{"imdb_id": "tt1", "rating": 7.5}, {"imdb_id": "tt1", "failed": True}])
+    assert checkpoint.done() == set()
+
+
+def test_clear(tmp_path):
+    checkpoint = Checkpoint(tmp_path / "locales.jsonl")
+    checkpoint.clear() # Nothing saved yet
+    checkpoint.save([{"id": 1}])
+    checkpoint.clear()
+    assert checkpoint.load() == [] and checkpoint.done() == set()
+
+
+def test_checkpoint_saved_with_other_params_is_discarded(tmp_path):
+    path = tmp_path / "locales.jsonl"
+    Checkpoint(path, params={"locales": ["es-ES"]}).save([{"id": 1}, {"id": 2}])
+
+    assert Checkpoint(path, params={"locales": ["es-ES"]}).done() == {1, 2}
+    assert Checkpoint(path).load() == [{"id": 1}, {"id": 2}] # The header is not a record
+
+    checkpoint = Checkpoint(path, params={"locales": ["es-ES", "en-US"]})
+    assert checkpoint.done() == set()
+    checkpoint.save([{"id": 3}])
+    assert Checkpoint(path, params={"locales": ["es-ES", "en-US"]}).done() == {3}
+
+
+def test_checkpoint_without_params_is_discarded(tmp_path):
+    # Saved by a version without the header: it is not known what the records depend on
+    path = tmp_path / "locales.jsonl"
+    Checkpoint(path).save([{"id": 1}])
+    assert Checkpoint(path, params={"locales": ["es-ES"]}).done() == set()
@@ -0,0 +1,56 @@
+import threading
+import time
+
+import pytest
+
+from concurrency import TokenBucket, fetch_in_order
+
+
+def test_token_bucket_rejects_invalid_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_token_bucket_allows_burst_then_throttles():
+    bucket = TokenBucket(rate=20, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+    # 10 more tokens at 20 per second
+    for _ in range(10):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.45
+
+
+def test_token_bucket_rate_with_several_threads():
+    bucket = TokenBucket(rate=50, capacity=1)
+    times = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(10):
+            bucket.acquire()
+            with lock:
+                times.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 40 tokens, the first one available at once: at least 39 / 50 seconds between the first and the last
+    times.sort()
+    assert len(times) == 40
+    assert times[-1] - times[0] >= 39 / 50 * 0.95
+
+
+def test_fetch_in_order_keeps_the_order_of_the_items():
+    def fetch(item):
+        time.sleep(0.01 * (item % 3))
+        return item * 2
+
+    assert fetch_in_order(fetch, range(20), max_workers=4) == [item * 2 for item in range(20)]
+    assert fetch_in_order(fetch, range(5), max_workers=1) == [0, 2, 4, 6, 8]
@@ -0,0 +1,44 @@
+import logging
+import os
+import subprocess
+import sys
+import textwrap
+
+from common import event_log
+from conftest import SCRIPTS_DIR
+
+# Same order as the extraction scripts: EventLog created when the module is imported, logging set up in main
+SCRIPT = textwrap.dedent("""
+    from common.event_log import EventLog, setup_logging
+
+    EVENTS = EventLog("omdb", sample_rate=0)
+
+    if __name__ == '__main__':
+        setup_logging()
+        EVENTS.event("omdb.quota_reached")
+        for number in range(5):
+            EVENTS.count("omdb.match", outcome="accepted" if number % 2 else "not_found")
+""")
+
+
+def run_script(tmp_path):
+    env = dict(os.environ, LOGS_DIR=str(tmp_path), PYTHONPATH=str(SCRIPTS_DIR))
+    subprocess.run([sys.executable, "-c", SCRIPT], env=env, check=True)
+    return list(event_log.read_events(tmp_path / "api_extraction.jsonl"))
+
+
+def test_counts_are_written_at_exit(tmp_path):
+    events = run_script(tmp_path)
+    assert [event["event"] for event in events] == ["omdb.quota_reached", "summary"]
+    counters = {counter["outcome"]: counter["count"] for counter in events[-1]["counters"]["omdb.match"]}
+    assert counters == {"accepted": 2, "not_found": 3}
+
+
+def test_counters_are_flushed_periodically(caplog):
+    log = event_log.EventLog("test", flush_interval=0)
+    event_log._event_logs.remove(log) # Not flushed at the exit of pytest
+    with caplog.at_level(logging.INFO, logger="test"):
+        log.count("test.event")
+        log.count("test.event")
+
+    assert [record.fields["counters"]["test.event"][0]["count"] for record in caplog.records] == [1, 1]
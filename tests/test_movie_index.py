@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+import build_index
+from movie_index import MovieIndex
+
+
+def gold_data():
+    # Same layout as the gold export: lists joined with ', ' and dates as 'dd/MM/YYYY' ('11/11/1111' if missing)
+    return pd.DataFrame({
+        "type": ["movie", "movie", "show", "movie", "show"],
+        "id": [1, 2, 1, 3, 4],
+        "title": ["The Godfather", "Amélie", "Breaking Bad", "The Gold Rush", "Dark"],
+        "overview": ["", "", "", "", ""],
+        "release_date": ["14/03/1972", "25/04/2001", "20/01/2008", "11/11/1111", "01/12/2017"],
+        "genre": ["Crimen, Drama", "Comedia, Romance", "Crimen, Drama", "Comedia", "Drama, Misterio"],
+        "tmdb_rating": [8.7, 7.9, 8.9, 7.8, 8.4],
+        "tmdb_count": [20000, 11000, 15000, 2000, 7000],
+        "imdb_rating": [9.2, 8.3, 9.5, 8.1, 8.7],
+        "imdb_count": [2000000, 800000, 2300000, 120000, 500000],
+        "is_popular": [True, False, True, False, True],
+        "watch_providers": ["Movistar Plus+", "Filmin, Netflix", "Netflix", None, "Netflix"]
+    })
+
+
+@pytest.fixture
+def index(tmp_path):
+    gold_path = tmp_path / "movies_and_shows_result.parquet"
+    gold_data().to_parquet(gold_path, index=False)
+    return MovieIndex.open(gold_path, tmp_path / "index")
+
+
+def titles(records):
+    return [record["title"] for record in records]
+
+
+def test_query_filters_and_order(index):
+    assert titles(index.query(k=3)) == ["Breaking Bad", "The Godfather", "Dark"]
+    assert titles(index.query(genres=["Crimen", "Drama"])) == ["Breaking Bad", "The Godfather"]
+    assert titles(index.query(providers=["Filmin", "Movistar Plus+"])) == ["The Godfather", "Amélie"]
+    assert titles(index.query(genres=["Drama"], providers=["Netflix"], min_imdb_rating=9, popular=True)) == ["Breaking Bad"]
+    assert titles(index.query(type="movie", popular=False, sort_by="tmdb_count")) == ["Amélie", "The Gold Rush"]
+    assert titles(index.query(released_after="2001-04-25", released_before="2008-01-20")) == ["Breaking Bad", "Amélie"]
+    assert index.query(genres=["Western"]) == []
+
+
+def test_get_by_type_and_id(index):
+    assert index.get(1)["title"] == "The Godfather"
+    assert index.get(1, type="show")["title"] == "Breaking Bad"
+    assert index.get(4, type="movie") is None
+
+
+def test_search_by_prefix(index):
+    assert titles(index.search("the g")) == ["The Godfather", "The Gold Rush"]
+    assert titles(index.search("AMÉ")) == ["Amélie"]
+    assert index.search("x") == []
+
+
+def test_index_is_rebuilt_when_gold_changes(tmp_path, index):
+    gold_path = tmp_path / "movies_and_shows_result.parquet"
+    assert not build_index.is_stale(gold_path, tmp_path / "index")
+
+    gold_data().iloc[:2].to_parquet(gold_path, index=False)
+    assert build_index.is_stale(gold_path, tmp_path / "index")
+    rebuilt = MovieIndex.open(gold_path, tmp_path / "index")
+    assert rebuilt.rows == 2 and rebuilt.version != index.version and index.is_outdated()
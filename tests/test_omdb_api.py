@@ -0,0 +1,26 @@
+import pandas as pd
+
+import OMDB_api
+
+
+def tmdb_titles(date_column, ids, vote_counts):
+    return pd.DataFrame({"id": ids, "title_EN": [f"Title {data_id}" for data_id in ids], date_column: "2001-05-04",
+                         "vote_count": vote_counts, "popularity": 1.0})
+
+
+def test_movies_and_shows_share_one_queue(monkeypatch):
+    queues = []
+
+    def request_ratings(queue):
+        queues.append(queue)
+        return OMDB_api.ratings_frame([])
+
+    monkeypatch.setattr(OMDB_api, "request_ratings", request_ratings)
+    movies = tmdb_titles("release_date", [1, 2, 3], [100, 90, 10])
+    shows = tmdb_titles("first_air_date", [1, 2], [95, 5])
+    OMDB_api.get_imdb_ratings(movies, shows)
+
+    # A single queue, the most voted first whatever their type
+    assert len(queues) == 1
+    assert list(zip(queues[0]["data_type"], queues[0]["id"])) == [("movie", 1), ("series", 1), ("movie", 2), ("movie", 3), ("series", 2)]
+    assert (queues[0]["year"] == 2001).all()
@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from page_collector import MOVIES_FIELDS, SHOWS_FIELDS, PageCollector
+
+
+def movie(number):
+    # Raw record of the TMDB top rated endpoint, with fields that are not collected
+    rng = random.Random(number)
+    return {"adult": False, "backdrop_path": f"/{number}.jpg", "id": number, "title": f"Movie {number}",
+            "overview": "" if number % 5 else None, "release_date": f"20{number % 25:02d}-01-01",
+            "genre_ids": rng.sample([18, 80, 35, 10749, 53], number % 4), "popularity": number / 7,
+            "vote_average": round(rng.uniform(5, 9), 1), "vote_count": rng.randint(0, 30000)}
+
+
+def expected(records, fields):
+    # Missing values are kept as nulls, except missing lists that are collected empty
+    return [{field.name: record.get(field.name) if field.name != "genre_ids" else record.get("genre_ids") or []
+             for field in fields} for record in records]
+
+
+@pytest.mark.parametrize("page_size", [1, 20])
+def test_pages_round_trip(page_size):
+    records = [movie(number) for number in range(1, 101)]
+    collector = PageCollector(MOVIES_FIELDS)
+    for start in range(0, len(records), page_size):
+        collector.add(records[start:start + page_size])
+
+    assert len(collector) == 100
+    table = collector.to_table()
+    assert table.schema == MOVIES_FIELDS
+    assert table.to_pylist() == expected(records, MOVIES_FIELDS)
+
+
+def test_missing_values_are_nulls():
+    records = [{"id": 1, "name": "Dark", "genre_ids": None, "vote_count": None},
+               {"id": 2, "name": None, "first_air_date": "2017-12-01", "popularity": 12.5, "vote_average": 8.4, "vote_count": 7000}]
+    collector = PageCollector(SHOWS_FIELDS)
+    collector.add(records)
+
+    assert collector.to_table().to_pylist() == expected(records, SHOWS_FIELDS)
+    shows = collector.to_frame()
+    assert list(shows.columns) == SHOWS_FIELDS.names
+    assert shows["vote_count"].isna().tolist() == [True, False] and shows["popularity"].isna().tolist() == [True, False]
+
+
+def test_empty_collector():
+    table = PageCollector(MOVIES_FIELDS).to_table()
+    assert table.num_rows == 0 and table.schema == MOVIES_FIELDS
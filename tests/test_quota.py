@@ -0,0 +1,56 @@
+import pytest
+
+from api_client import ApiClient
+from quota import QuotaExceeded, QuotaLedger
+
+
+def test_quota_is_shared_between_runs(tmp_path):
+    path = tmp_path / "quota.sqlite"
+    first = QuotaLedger(path, "omdb", limit=5)
+    assert all(first.acquire() for _ in range(3))
+    first.close()
+
+    # Next run (or after a crash): only the rest of the day's quota is left
+    second = QuotaLedger(path, "omdb", limit=5)
+    assert second.used() == 3 and second.remaining() == 2
+    assert [second.acquire() for _ in range(3)] == [True, True, False]
+    assert second.used() == 5
+    assert QuotaLedger(path, "tmdb", limit=5).remaining() == 5 # Every API has its own quota
+    second.close()
+
+
+def test_new_day_starts_a_new_quota(tmp_path, monkeypatch):
+    ledger = QuotaLedger(tmp_path / "quota.sqlite", "omdb", limit=2)
+    monkeypatch.setattr(QuotaLedger, "today", staticmethod(lambda: "2026-01-01"))
+    ledger.exhaust()
+    assert ledger.remaining() == 0 and not ledger.acquire()
+
+    monkeypatch.setattr(QuotaLedger, "today", staticmethod(lambda: "2026-01-02"))
+    assert ledger.remaining() == 2
+    ledger.close()
+
+
+def test_charge_raises_when_the_quota_is_spent(tmp_path):
+    ledger = QuotaLedger(tmp_path / "quota.sqlite", "omdb", limit=1)
+    ledger.charge()
+    with pytest.raises(QuotaExceeded):
+        ledger.charge()
+    ledger.close()
+
+
+def test_every_attempt_is_charged(http_server, tmp_path):
+    ledger = QuotaLedger(tmp_path / "quota.sqlite", "omdb", limit=4)
+    client = ApiClient(backoff_factor=0, limiter=ledger.charge)
+    http_server.throttled = 2
+    try:
+        assert client.get(f"{http_server.url}/?t=Heat").status_code == 200
+        assert ledger.used() == 3
+
+        # The quota runs out during the retries: the request stops there
+        http_server.throttled = 2
+        with pytest.raises(QuotaExceeded):
+            client.get(f"{http_server.url}/?t=Alien")
+        assert ledger.used() == 4 and len(http_server.requests) == 4
+    finally:
+        client.close()
+        ledger.close()
@@ -0,0 +1,91 @@
+import time
+
+import requests
+
+from api_client import ApiClient
+from response_cache import ResponseCache
+
+URL = "https://api.example.com/3/movie/1"
+
+
+def make_response(body, etag=None):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.headers["Content-Type"] = "application/json"
+    if etag:
+        response.headers["ETag"] = etag
+    return response
+
+
+def test_key_ignores_api_keys_and_param_order():
+    assert ResponseCache.make_key(URL, {"language": "es-ES", "apikey": "a"}) == ResponseCache.make_key(URL, {"language": "es-ES", "apikey": "b"})
+    assert ResponseCache.make_key(URL, {"a": 1, "b": 2}) == ResponseCache.make_key(URL, {"b": 2, "a": 1})
+    assert ResponseCache.make_key(URL, {"language": "es-ES"}) != ResponseCache.make_key(URL, {"language": "en-US"})
+
+
+def test_entries_expire_after_their_ttl(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttls=[("*/movie/*", 0.2)], default_ttl=3600)
+    cache.put(URL, None, make_response(b"movie"))
+    cache.put("https://api.example.com/3/genre/list", None, make_response(b"genres"))
+
+    assert cache.get(URL).fresh and cache.is_fresh(URL)
+    time.sleep(0.3)
+    entry = cache.get(URL)
+    assert entry.body == b"movie" and not entry.fresh # Stale entries are kept to revalidate them
+    assert not cache.is_fresh(URL)
+    assert cache.is_fresh("https://api.example.com/3/genre/list")
+    assert cache.get(URL, {"language": "es-ES"}) is None
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", max_bytes=1000)
+    for number in range(10):
+        cache.put(f"{URL}{number}", None, make_response(b"x" * 100))
+        time.sleep(0.01)
+    cache.get(f"{URL}0") # The oldest one is used again
+
+    cache.put(f"{URL}10", None, make_response(b"x" * 100))
+
+    assert cache.size() <= 900
+    assert cache.stats["evicted"] == 2
+    assert cache.get(f"{URL}0") is not None
+    assert cache.get(f"{URL}1") is None and cache.get(f"{URL}2") is None
+    assert cache.get(f"{URL}10") is not None
+    cache.close()
+
+
+def test_size_is_shared_between_caches_of_the_same_file(tmp_path):
+    first = ResponseCache(tmp_path / "cache.sqlite")
+    second = ResponseCache(tmp_path / "cache.sqlite")
+    first.put(URL, None, make_response(b"x" * 100))
+    second.put(f"{URL}0", None, make_response(b"x" * 50))
+    second.put(URL, None, make_response(b"x" * 10)) # Replaced
+
+    assert first.size() == second.size() == 60
+    first.close()
+    second.close()
+    assert ResponseCache(tmp_path / "cache.sqlite").size() == 60
+
+
+def test_stale_entries_are_revalidated_with_their_etag(http_server, tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite", default_ttl=0.2)
+    client = ApiClient(cache=cache)
+    url = f"{http_server.url}/movie/1"
+    try:
+        assert client.get(url).json()["version"] == 1
+        assert client.get(url).json()["version"] == 1 # Fresh, not requested
+        assert len(http_server.requests) == 1
+
+        time.sleep(0.3)
+        assert client.get(url).json()["version"] == 1 # 304, the cached body is used
+        assert cache.stats["revalidated"] == 1 and cache.is_fresh(url)
+
+        time.sleep(0.3)
+        http_server.version = 2
+        assert client.get(url).json()["version"] == 2 # Changed, the new body is stored
+        assert cache.get(url).body == client.get(url).content
+        assert len(http_server.requests) == 3
+    finally:
+        client.close()
@@ -0,0 +1,65 @@
+import json
+
+import pandas as pd
+import pytest
+
+import save_data_formats
+from common import storage
+
+
+@pytest.fixture
+def gold_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(storage.LAYERS, "gold", tmp_path)
+    monkeypatch.setattr(save_data_formats, "MANIFEST_PATH", tmp_path / ".export_manifest.json")
+    return tmp_path
+
+
+def enriched_data():
+    return pd.DataFrame({
+        "type": ["movie", "show"],
+        "id": [1, 2],
+        "title": ["A; B", None],
+        "overview": ["a", "b"],
+        "release_date": ["01/02/2000", "11/11/1111"],
+        "genre": [["Drama", "Comedy"], []],
+        "tmdb_rating": [8.1, 7.2],
+        "tmdb_count": [100, 200],
+        "imdb_rating": [8.0, None],
+        "imdb_count": [1000, None],
+        "is_popular": [True, False],
+        "watch_providers": [["Netflix"], None]
+    })
+
+
+def test_all_formats_are_written(gold_dir):
+    timings = save_data_formats.export_gold(enriched_data(), ["csv", "json", "parquet", "xlsx"])
+    assert set(timings) == {"csv", "json", "parquet", "xlsx"} and all(seconds is not None for seconds in timings.values())
+    assert sorted(path.name for path in gold_dir.iterdir()) == [
+        ".export_manifest.json", "movies_and_shows_result.csv", "movies_and_shows_result.json",
+        "movies_and_shows_result.parquet", "movies_and_shows_result.xlsx"]
+
+    csv = pd.read_csv(gold_dir / "movies_and_shows_result.csv", sep=";")
+    assert csv["title"].tolist()[0] == "A; B" and csv["genre"].tolist()[0] == "Drama, Comedy"
+    assert pd.read_excel(gold_dir / "movies_and_shows_result.xlsx")["id"].tolist() == [1, 2]
+    assert set(json.loads((gold_dir / ".export_manifest.json").read_text())) == {"csv", "json", "parquet", "xlsx"}
+
+
+def test_formats_up_to_date_are_skipped(gold_dir):
+    save_data_formats.export_gold(enriched_data(), ["csv", "parquet"])
+    assert save_data_formats.export_gold(enriched_data(), ["csv", "parquet"]) == {"csv": None, "parquet": None}
+
+    changed = enriched_data().assign(tmdb_rating=[9.0, 7.2])
+    assert all(seconds is not None for seconds in save_data_formats.export_gold(changed, ["csv", "parquet"]).values())
+
+
+def test_failed_format_keeps_the_others(gold_dir, monkeypatch):
+    def fail(data, path):
+        raise OSError("disk full")
+
+    monkeypatch.setitem(save_data_formats.WRITERS, "json", fail)
+    with pytest.raises(OSError):
+        save_data_formats.export_gold(enriched_data(), ["csv", "json"])
+
+    assert set(json.loads((gold_dir / ".export_manifest.json").read_text())) == {"csv"}
+    assert not (gold_dir / "movies_and_shows_result.json").exists()
+    assert save_data_formats.export_gold(enriched_data(), ["csv"]) == {"csv": None}
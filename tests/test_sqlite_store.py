@@ -0,0 +1,73 @@
+import sqlite3
+
+import pandas as pd
+
+from sqlite_store import load_sqlite
+
+
+def make_data():
+    return pd.DataFrame({
+        "type": ["movie", "movie", "show"],
+        "id": [1, 2, 1],
+        "title": ["A", "B", "C"],
+        "overview": ["a", "b", None],
+        "release_date": ["01/02/2000", "11/11/1111", "03/04/2010"],
+        "tmdb_rating": [8.1, 7.2, 6.3],
+        "tmdb_count": [100, 200, 300],
+        "imdb_rating": [8.0, None, 6.5],
+        "imdb_count": [1000, None, 3000],
+        "is_popular": [True, False, None],
+        "genre": [["Drama"], ["Comedy", "Drama"], []],
+        "watch_providers": [["Netflix"], None, ["HBO Max"]]
+    })
+
+
+def query(path, sql):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+def test_first_load_inserts_everything(tmp_path):
+    path = tmp_path / "titles.sqlite"
+    assert load_sqlite(make_data(), path) == {"inserted": 3, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    assert query(path, "SELECT type, id, release_date, is_popular FROM titles ORDER BY type, id") == [
+        ("movie", 1, "2000-02-01", 1), ("movie", 2, None, 0), ("show", 1, "2010-04-03", None)]
+    assert query(path, """SELECT g.name FROM title_genre JOIN genres g USING (genre_id)
+                          WHERE type = 'movie' AND id = 2 ORDER BY g.name""") == [("Comedy",), ("Drama",)]
+
+
+def test_load_without_changes_writes_nothing(tmp_path):
+    path = tmp_path / "titles.sqlite"
+    load_sqlite(make_data(), path)
+    assert load_sqlite(make_data(), path) == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 3}
+
+
+def test_only_changed_titles_are_written(tmp_path):
+    path = tmp_path / "titles.sqlite"
+    load_sqlite(make_data(), path)
+
+    data = make_data()
+    data.loc[0, "imdb_rating"] = 8.5
+    data.at[1, "genre"] = ["Comedy"] # Only the list changes
+    data = pd.concat([data.iloc[:2], pd.DataFrame({"type": ["show"], "id": [2], "title": ["D"], "genre": [["Drama"]],
+                                                   "watch_providers": [[]], "release_date": ["11/11/1111"]})], ignore_index=True)
+
+    assert load_sqlite(data, path) == {"inserted": 1, "updated": 2, "deleted": 1, "unchanged": 0}
+    assert query(path, "SELECT type, id, title FROM titles ORDER BY type, id") == [("movie", 1, "A"), ("movie", 2, "B"), ("show", 2, "D")]
+    assert query(path, "SELECT imdb_rating FROM titles WHERE type = 'movie' AND id = 1") == [(8.5,)]
+    assert query(path, "SELECT COUNT(*) FROM title_genre WHERE type = 'movie' AND id = 2") == [(1,)]
+    # The bridge rows of the deleted title are deleted with it
+    assert query(path, "SELECT COUNT(*) FROM title_provider WHERE type = 'show' AND id = 1") == [(0,)]
+    assert load_sqlite(data, path) == {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 3}
+
+
+def test_repeated_titles_keep_their_last_row(tmp_path):
+    path = tmp_path / "titles.sqlite"
+    data = make_data()
+    data = pd.concat([data, data.iloc[[0]].assign(title="A2")], ignore_index=True)
+    assert load_sqlite(data, path)["inserted"] == 3
+    assert query(path, "SELECT title FROM titles WHERE type = 'movie' AND id = 1") == [("A2",)]
@@ -0,0 +1,71 @@
+import time
+
+import pandas as pd
+import pytest
+
+from common import storage
+from state_store import DAY, StateStore, upsert_bronze
+
+
+@pytest.fixture
+def bronze_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(storage.LAYERS, "bronze", tmp_path / "1_bronze")
+    return tmp_path / "1_bronze"
+
+
+def titles(vote_counts, popularities):
+    return pd.DataFrame({"id": range(1, len(vote_counts) + 1), "vote_count": vote_counts, "popularity": popularities})
+
+
+def test_new_titles_are_changed(tmp_path):
+    state = StateStore(tmp_path / "state.sqlite")
+    assert state.changed("omdb_movie", titles([100, 200], [10.0, 20.0])).tolist() == [True, True]
+
+    state.update("omdb_movie", titles([100], [10.0]))
+    assert state.changed("omdb_movie", titles([100, 200], [10.0, 20.0])).tolist() == [False, True]
+    assert state.changed("omdb_show", titles([100], [10.0])).tolist() == [True] # Every entity has its own state
+    state.close()
+
+
+def test_titles_changed_beyond_the_thresholds(tmp_path):
+    state = StateStore(tmp_path / "state.sqlite", vote_change=0.05, popularity_change=0.25)
+    state.update("omdb_movie", titles([100, 100, 100, 100], [10.0, 10.0, 10.0, 10.0]))
+
+    current = titles([104, 106, 100, 100], [10.0, 10.0, 12.0, 13.0])
+    current.index = [10, 11, 12, 13] # The mask keeps the index of the titles
+    changed = state.changed("omdb_movie", current)
+    assert changed.index.tolist() == [10, 11, 12, 13]
+    assert changed.tolist() == [False, True, False, True]
+    state.close()
+
+
+def test_old_titles_are_fetched_again(tmp_path):
+    state = StateStore(tmp_path / "state.sqlite", max_age=30 * DAY)
+    state.update("omdb_movie", titles([100, 100], [10.0, 10.0]))
+    state._connection.execute("UPDATE titles SET fetched_at = ? WHERE id = 1", (time.time() - 31 * DAY,))
+
+    assert state.changed("omdb_movie", titles([100, 100], [10.0, 10.0])).tolist() == [True, False]
+    state.close()
+
+
+def test_upsert_replaces_rows_with_the_same_key(bronze_dir):
+    upsert_bronze("TMDB_external_ids_movies", pd.DataFrame({"id": [1, 2], "imdb_id": ["tt1", "tt2"]}))
+    result = upsert_bronze("TMDB_external_ids_movies", pd.DataFrame({"id": [2, 3], "imdb_id": ["tt2b", "tt3"]}))
+
+    assert result.sort_values("id")["imdb_id"].tolist() == ["tt1", "tt2b", "tt3"]
+    saved = storage.read_layer("bronze", "TMDB_external_ids_movies")
+    assert sorted(zip(saved["id"], saved["imdb_id"])) == [(1, "tt1"), (2, "tt2b"), (3, "tt3")]
+
+
+def test_upsert_with_a_composite_key(bronze_dir):
+    def locales(rows):
+        return pd.DataFrame(rows, columns=["id", "locale", "title", "overview", "watch_providers"])
+
+    upsert_bronze("TMDB_locales_movies", locales([(1, "es-ES", "Uno", "", ["Netflix"]), (1, "en-US", "One", "", []),
+                                                  (2, "es-ES", "Dos", "", [])]), key=["id", "locale"])
+    # Same id with another locale and same locale with another id are kept
+    upsert_bronze("TMDB_locales_movies", locales([(1, "es-ES", "Uno bis", "", []), (3, "en-US", "Three", "", [])]), key=["id", "locale"])
+
+    saved = storage.read_layer("bronze", "TMDB_locales_movies")
+    assert sorted(zip(saved["id"], saved["locale"], saved["title"])) == [
+        (1, "en-US", "One"), (1, "es-ES", "Uno bis"), (2, "es-ES", "Dos"), (3, "en-US", "Three")]
@@ -0,0 +1,51 @@
+import pytest
+
+from common import storage
+
+# Written before the migration to Parquet: pandas index, lists as Python strings and votes with thousands separators
+SHOWS_CSV = """;adult;genre_ids;id;origin_country;overview;popularity;first_air_date;title_ES;vote_average;vote_count;type;title_EN
+0;False;[18, 80];1396;['US'];"Walter White; un profesor";120.5;2008-01-20;Breaking Bad;8.9;15000;show;Breaking Bad
+1;False;[];219246;['KR'];;30.0;;Si la vida te da mandarinas;9.3;200;show;
+"""
+
+RATINGS_CSV = """;tmdb_id;imdb_rating;imdb_votes
+0;278;9.3;3,042,120
+1;238;9.2;2,121,667
+2;1;;
+"""
+
+
+@pytest.fixture
+def bronze_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(storage.LAYERS, "bronze", tmp_path)
+    return tmp_path
+
+
+def test_legacy_csv_is_read_with_the_declared_schema(bronze_dir):
+    (bronze_dir / "TMDB_top_rated_shows.csv").write_text(SHOWS_CSV, encoding="utf-8")
+    shows = storage.read_layer("bronze", "TMDB_top_rated_shows")
+
+    assert list(shows.columns) == storage.TMDB_SHOWS_SCHEMA.names # Columns not declared (adult, origin_country) are dropped
+    assert str(shows["id"].dtype) == "Int64" and shows["id"].tolist() == [1396, 219246]
+    assert [list(genres) for genres in shows["genre_ids"]] == [[18, 80], []]
+    assert shows["overview"].tolist()[0] == "Walter White; un profesor"
+    assert shows["first_air_date"].isna().tolist() == [False, True]
+
+
+def test_legacy_csv_numbers_with_thousands_separators(bronze_dir):
+    (bronze_dir / "OMDB_imdb_rating_movies.csv").write_text(RATINGS_CSV, encoding="utf-8")
+    ratings = storage.read_layer("bronze", "OMDB_imdb_rating_movies", columns=["tmdb_id", "imdb_votes"])
+
+    assert list(ratings.columns) == ["tmdb_id", "imdb_votes"]
+    assert ratings["imdb_votes"].tolist()[:2] == [3042120, 2121667] and ratings["imdb_votes"].isna().tolist()[2]
+    # Same result once the file is migrated to Parquet
+    storage.write_layer(storage.read_layer("bronze", "OMDB_imdb_rating_movies"), "bronze", "OMDB_imdb_rating_movies")
+    assert storage.read_layer("bronze", "OMDB_imdb_rating_movies", columns=["tmdb_id", "imdb_votes"]).equals(ratings)
+
+
+def test_parse_list():
+    assert storage.parse_list("[18, 80]") == [18, 80]
+    assert storage.parse_list("['Netflix', 'Max']") == ["Netflix", "Max"]
+    assert storage.parse_list("Crimen, Drama") == ["Crimen", "Drama"]
+    assert storage.parse_list("[18, 80") == []
+    assert storage.parse_list(float("nan")) is None
@@ -0,0 +1,49 @@
+import requests
+
+import TMDB_api
+from response_cache import DAY, ResponseCache
+
+
+class RecordingClient:
+    # Client that records the URLs requested and answers 404
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, params=None, headers=None, use_cache=True):
+        self.urls.append(url)
+        response = requests.Response()
+        response.status_code = 404
+        return response
+
+
+def test_providers_are_cached_for_a_week(monkeypatch, tmp_path):
+    client = RecordingClient()
+    monkeypatch.setattr(TMDB_api, "CLIENT", client)
+    record = TMDB_api.get_locales(TMDB_api.HEADERS, 10, "movie", ["es-ES", "en-US"], with_details=True)
+    assert record["error"] == 404
+
+    cache = ResponseCache(tmp_path / "cache.sqlite", ttls=TMDB_api.TMDB_CACHE_TTLS)
+    assert "append_to_response" in client.urls[0]
+    assert cache.ttl_for(client.urls[0]) == 7 * DAY
+    assert cache.ttl_for(f"{TMDB_api.TMDB_URL}/movie/top_rated?language=es-ES&page=2") == DAY
+    cache.close()
+
+
+def test_locales_checkpoint_is_not_reused_with_other_options(monkeypatch, tmp_path):
+    requested = []
+
+    def get_locales(headers, data_id, type, locales, with_details):
+        requested.append(data_id)
+        values = {"title": f"Title {data_id}", "overview": "", "watch_providers": []}
+        return {"id": data_id, "locales": {locale: values for locale in locales}, "imdb_id": "tt1" if with_details else None}
+
+    monkeypatch.setattr(TMDB_api, "get_locales", get_locales)
+    path = tmp_path / "checkpoint_locales_movies.jsonl"
+
+    TMDB_api.enrich_locales({}, [1, 2], "movie", path, ["es-ES", "en-US"], max_workers=1)
+    TMDB_api.enrich_locales({}, [1, 2, 3], "movie", path, ["es-ES", "en-US"], max_workers=1)
+    assert requested == [1, 2, 3] # Resumed
+
+    result = TMDB_api.enrich_locales({}, [1, 2, 3], "movie", path, ["es-ES", "en-US", "es-MX"], with_details=True, max_workers=1)
+    assert requested == [1, 2, 3, 1, 2, 3]
+    assert len(result) == 9 and result["title"].notna().all() and (result["imdb_id"] == "tt1").all()
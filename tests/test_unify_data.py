@@ -0,0 +1,33 @@
+import importlib
+import random
+
+import numpy as np
+import pandas as pd
+
+# The name of the script starts with a digit, it can't be imported with an import statement
+unify_data = importlib.import_module("1_unify_data")
+
+GENRES = pd.DataFrame({"id": [28, 12, 16, 35, 80, 18, 10751], "name": ["Acción", "Aventura", "Animación", "Comedia",
+                                                                      "Crimen", "Drama", "Familia"]})
+
+
+def get_genre(genre_ids, list_of_genres):
+    # Resolution of the genres before it was vectorised (one filter per row)
+    return list(list_of_genres[list_of_genres['id'].isin(genre_ids)]['name'])
+
+
+def test_same_genres_as_the_row_by_row_resolution():
+    random_generator = random.Random(0)
+    ids = GENRES["id"].tolist() + [99, 10770] # Ids without a name are left out
+    genre_ids = pd.Series([random_generator.sample(ids, random_generator.randint(0, 4)) for _ in range(500)],
+                          index=range(1000, 1500))
+
+    resolved = unify_data.resolve_genres(genre_ids, GENRES)
+    assert resolved.index.equals(genre_ids.index)
+    assert resolved.tolist() == [get_genre(row, GENRES) for row in genre_ids]
+
+
+def test_genre_ids_read_from_parquet_and_missing():
+    # Lists read from Parquet are numpy arrays, titles without genres can be missing
+    genre_ids = pd.Series([np.array([18, 28]), None, np.array([], dtype=int), np.array([18, 18])])
+    assert unify_data.resolve_genres(genre_ids, GENRES).tolist() == [["Acción", "Drama"], [], [], ["Drama"]]